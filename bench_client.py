@@ -0,0 +1,110 @@
+"""
+Client for the CLI's daemon mode (`./bin/cli -daemon`).
+
+The daemon loads the BPF programs, attaches the perf events and opens the
+cgroups and output CSVs once, then runs benchmarks on request. Requests and
+responses are newline-delimited JSON over a Unix socket; the request fields
+mirror the CLI's per-run flags. Runs are always cold starts; warm starts
+from a preloaded zygote are only in benchmarks/benchmark.py.
+"""
+
+import json
+import socket
+import subprocess
+import sys
+import time
+
+DEFAULT_SOCKET = "/run/faas-bench.sock"
+
+
+class DaemonError(RuntimeError):
+    """The daemon could not start or could not carry out a run"""
+
+
+class BenchClient:
+    """One connection to the daemon; not thread-safe, so use one per thread"""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET):
+        self.socket_path = socket_path
+        self.sock = None
+        self.stream = None
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.stream = sock.makefile("rw", encoding="utf-8")
+
+    def close(self):
+        if self.sock is not None:
+            self.stream.close()
+            self.sock.close()
+            self.sock = self.stream = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, benchmark_file: str, cgroup_name: str, cpuset: str, cpu_freq: int,
+            proc_output_file: str, hardware_output_file: str = "", memory: str = "256M") -> dict:
+        """Run one benchmark and return the daemon's response (pid, latency_ns, energy, exit_code, elapsed_ns)"""
+        if self.sock is None:
+            self.connect()
+        request = {
+            "cgroup_name": cgroup_name,
+            "cpuset": str(cpuset),
+            "cpu_freq": int(cpu_freq),
+            "memory": memory,
+            "benchmark_file": benchmark_file,
+            "proc_output_file": proc_output_file,
+            "hardware_output_file": hardware_output_file,
+        }
+        self.stream.write(json.dumps(request) + "\n")
+        self.stream.flush()
+        line = self.stream.readline()
+        if not line:
+            self.close()
+            raise DaemonError("daemon closed the connection")
+        response = json.loads(line)
+        if not response["ok"]:
+            raise DaemonError(response["error"])
+        return response
+
+
+def start_daemon(cli: str = "./bin/cli", socket_path: str = DEFAULT_SOCKET, sudo: bool = True,
+                 timeout: float = 30.0, python: str = sys.executable) -> subprocess.Popen:
+    """Launch the daemon and wait until its socket accepts connections
+
+    Benchmarks run under python, by default this interpreter, which sudo's
+    PATH would not find if it lives in a virtualenv.
+    """
+    command = (["sudo"] if sudo else []) + [cli, "-daemon", "-socket", socket_path, "-python", python]
+    proc = subprocess.Popen(command)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise DaemonError(f"daemon exited with code {proc.returncode} during startup")
+        try:
+            with BenchClient(socket_path) as probe:
+                probe.connect()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise DaemonError(f"daemon did not open {socket_path} within {timeout}s")
+
+
+def stop_daemon(proc: subprocess.Popen, timeout: float = 10.0):
+    """SIGTERM the daemon (sudo relays it) and wait for it to release the BPF objects"""
+    proc.terminate()
+    try:
+        proc.wait(timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
@@ -1,7 +1,13 @@
 import os
 import sys
+import json
+import runpy
+import random
+import socket
 import ctypes
 import ctypes.util
+import importlib
+import traceback
 from ctypes import c_int, c_uint64, c_size_t, c_void_p, POINTER, Structure
 import subprocess
 import time
@@ -11,6 +17,9 @@ CLONE_NEWCGROUP = 0x02000000
 CLONE_INTO_CGROUP = 0x200000000
 CSIGNAL = 0x000000FF
 
+# Modules the zygote imports once, so warm starts skip loading them
+ZYGOTE_PRELOAD = ("numpy", "scipy.linalg", "scipy.ndimage", "PIL.Image", "multiprocessing")
+
 
 class clone_args(Structure):
     _fields_ = [
@@ -96,11 +105,15 @@ class Clone3Runner:
         self.libc.syscall.argtypes = [c_int, c_void_p, c_size_t]
         self.libc.syscall.restype = c_int
 
-    def clone3_into_cgroup(self, cgroup_fd: int, command: list) -> int:
+    def _clone_args(self, cgroup_fd: int) -> clone_args:
         args = clone_args()
         args.flags = CLONE_INTO_CGROUP
         args.exit_signal = 17  # SIGCHLD
         args.cgroup = cgroup_fd
+        return args
+
+    def clone3_into_cgroup(self, cgroup_fd: int, command: list) -> int:
+        args = self._clone_args(cgroup_fd)
 
         # Fork using clone3
         pid = self.libc.syscall(
@@ -119,15 +132,154 @@ class Clone3Runner:
         return pid
 
 
+
+def join_cgroup(cgroup_fd: int):
+    """Move the calling process into the cgroup whose directory is open as cgroup_fd"""
+    fd = os.open("cgroup.procs", os.O_WRONLY, dir_fd=cgroup_fd)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+    finally:
+        os.close(fd)
+
+
+def _run_warm(argv: list):
+    """Zygote child: run argv[0] as __main__, as `python3 script args...` would, then exit"""
+    sys.argv = list(argv)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(argv[0])))
+    # Every child would otherwise inherit the zygote's RNG state
+    random.seed()
+    if "numpy" in sys.modules:
+        sys.modules["numpy"].random.seed()
+
+    exit_code = 0
+    try:
+        runpy.run_path(argv[0], run_name="__main__")
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            exit_code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    os._exit(exit_code)
+
+
+class Zygote:
+    """Long-lived Python process with heavy modules preimported that clones warm workers
+
+    The zygote stays in the runner's cgroup. Each request passes a cgroup fd
+    over a Unix socket; the worker is os.fork()ed and moves itself into that
+    cgroup before running anything, so warm starts skip interpreter startup
+    and the preloaded imports. A plain fork (not a raw clone3) runs glibc's
+    and the preloaded libraries' atfork handlers, e.g. OpenBLAS resetting
+    its thread pool, so the worker's threaded BLAS calls don't hang.
+
+    Warm starts exist only in this runner. The Go CLI and its daemon always
+    start cold: their BPF proc monitor times a run from its execve, which a
+    forked worker never calls, so it would get no latency or counters.
+    """
+
+    def __init__(self, preload=ZYGOTE_PRELOAD):
+        self.preload = tuple(preload)
+        self.sock = None
+        self.pid = None
+
+    def start(self):
+        """Fork the zygote and wait until its imports are done"""
+        # SEQPACKET keeps one request or reply per message
+        parent_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        pid = os.fork()
+        if pid == 0:
+            parent_sock.close()
+            try:
+                self._serve(child_sock)
+            finally:
+                os._exit(0)
+
+        child_sock.close()
+        self.sock, self.pid = parent_sock, pid
+        ready = self._recv()
+        print(f"[Zygote] Ready with PID {pid}, preloaded: {', '.join(ready['preloaded'])}")
+
+    def _serve(self, sock):
+        preloaded = []
+        for name in self.preload:
+            try:
+                importlib.import_module(name)
+                preloaded.append(name)
+            except ImportError:
+                pass
+        sock.send(json.dumps({"preloaded": preloaded}).encode())
+
+        while True:
+            msg, fds, _, _ = socket.recv_fds(sock, 65536, 1)
+            if not msg:
+                return  # Runner closed its end
+            argv = json.loads(msg)["argv"]
+            try:
+                pid = os.fork()
+            except OSError as e:
+                os.close(fds[0])
+                sock.send(json.dumps({"error": str(e)}).encode())
+                continue
+
+            if pid == 0:
+                sock.close()
+                try:
+                    join_cgroup(fds[0])
+                except OSError as e:
+                    print(f"[Zygote] Could not join the benchmark cgroup: {e}", file=sys.stderr)
+                    os._exit(1)
+                os.close(fds[0])
+                _run_warm(argv)
+
+            os.close(fds[0])
+            sock.send(json.dumps({"pid": pid}).encode())
+            _, status = os.waitpid(pid, 0)
+            sock.send(json.dumps({"pid": pid, "exit_code": os.waitstatus_to_exitcode(status)}).encode())
+
+    def _recv(self) -> dict:
+        msg = self.sock.recv(65536)
+        if not msg:
+            raise RuntimeError("zygote exited")
+        return json.loads(msg)
+
+    def launch(self, cgroup_fd: int, argv: list) -> int:
+        """Start a warm worker running argv in the cgroup; returns its PID"""
+        socket.send_fds(self.sock, [json.dumps({"argv": argv}).encode()], [cgroup_fd])
+        reply = self._recv()
+        if "error" in reply:
+            raise OSError(reply["error"])
+        return reply["pid"]
+
+    def wait(self) -> int:
+        """Wait for the last launched worker; returns its exit code"""
+        return self._recv()["exit_code"]
+
+    def stop(self):
+        if self.sock is not None:
+            self.sock.close()
+            os.waitpid(self.pid, 0)
+            self.sock = None
+
+
 def run_benchmark_in_cgroup(
     benchmark_script: str,
     cgroup_name: str,
     cpuset: str,
     memory_limit: str,
     duration: float = 60.0,
+    start_mode: str = "cold",
+    preload=ZYGOTE_PRELOAD,
 ):
     cgroup_manager = CgroupManager(cgroup_name=cgroup_name)
     cgroup_path = cgroup_manager.create_cgroup()
+    zygote = None
 
     try:
         cgroup_manager.set_cpuset(cpuset)
@@ -137,13 +289,20 @@ def run_benchmark_in_cgroup(
 
         print("Cgroup ID (inode):", cgroup_manager.get_cgroup_id())
 
-        command = [sys.executable, benchmark_script]
-        print(f"[Runner] Running command: {' '.join(command)}")
+        command = [sys.executable, benchmark_script, "--duration", str(duration)]
+        if start_mode == "warm":
+            # Preloading happens before the benchmark is started, not during it
+            zygote = Zygote(preload)
+            zygote.start()
+        print(f"[Runner] Running command ({start_mode} start): {' '.join(command)}")
         print("Waiting for input to start benchmark...")
         input()
 
-        runner = Clone3Runner()
-        child_pid = runner.clone3_into_cgroup(cgroup_fd=cgroup_fd, command=command)
+        if zygote is not None:
+            child_pid = zygote.launch(cgroup_fd, command[1:])
+        else:
+            runner = Clone3Runner()
+            child_pid = runner.clone3_into_cgroup(cgroup_fd=cgroup_fd, command=command)
 
         print(f"[Runner] Child process started with PID: {child_pid}")
 
@@ -157,10 +316,13 @@ def run_benchmark_in_cgroup(
         print("Benchmark running... Press Ctrl+C to stop early.")
         # Wait for child process
         start_time = time.time()
-        pid, status = os.waitpid(child_pid, 0)
+        if zygote is not None:
+            pid, exit_code = child_pid, zygote.wait()
+        else:
+            pid, status = os.waitpid(child_pid, 0)
+            exit_code = os.WEXITSTATUS(status)
         elapsed = time.time() - start_time
 
-        exit_code = os.WEXITSTATUS(status)
         print(f"\n[Runner] Process {pid} exited with code {exit_code}")
         print(f"[Runner] Total execution time: {elapsed:.2f}s")
 
@@ -173,6 +335,65 @@ def run_benchmark_in_cgroup(
         traceback.print_exc()
     finally:
         # Cleanup
+        if zygote is not None:
+            zygote.stop()
+        time.sleep(0.5)  # Give time for cgroup to settle
+        cgroup_manager.cleanup()
+
+
+def compare_start_latency(
+    benchmark_script: str,
+    cgroup_name: str,
+    cpuset: str,
+    memory_limit: str,
+    duration: float = 1.0,
+    repeats: int = 5,
+    preload=ZYGOTE_PRELOAD,
+):
+    """Run the benchmark cold (clone3 + exec) and warm (zygote) in turn; report each latency
+
+    Latency is launch to exit. The benchmarks run for a fixed duration, so
+    the cold - warm difference is the startup time the zygote saves.
+    """
+    cgroup_manager = CgroupManager(cgroup_name=cgroup_name)
+    cgroup_manager.create_cgroup()
+    zygote = Zygote(preload)
+    latencies = {"cold": [], "warm": []}
+
+    try:
+        cgroup_manager.set_cpuset(cpuset)
+        cgroup_manager.set_memory_limit(memory_limit)
+        zygote.start()
+        runner = Clone3Runner()
+        command = [sys.executable, benchmark_script, "--duration", str(duration)]
+
+        # Alternate the modes so drift affects both alike
+        for i in range(repeats):
+            for mode in latencies:
+                cgroup_fd = cgroup_manager.get_cgroup_fd()
+                start = time.perf_counter_ns()
+                if mode == "warm":
+                    child_pid = zygote.launch(cgroup_fd, command[1:])
+                    os.close(cgroup_fd)
+                    exit_code = zygote.wait()
+                else:
+                    child_pid = runner.clone3_into_cgroup(cgroup_fd=cgroup_fd, command=command)
+                    os.close(cgroup_fd)
+                    _, status = os.waitpid(child_pid, 0)
+                    exit_code = os.WEXITSTATUS(status)
+                elapsed = time.perf_counter_ns() - start
+                latencies[mode].append(elapsed)
+                print(f"[Runner] Run {i + 1}/{repeats} {mode} start: PID {child_pid} exited "
+                      f"with code {exit_code} after {elapsed / 1e9:.3f}s")
+
+        for mode, values in latencies.items():
+            print(f"[Runner] {mode.capitalize()} start latency: mean {sum(values) / len(values) / 1e9:.3f}s, "
+                  f"min {min(values) / 1e9:.3f}s, max {max(values) / 1e9:.3f}s")
+        saved = (sum(latencies["cold"]) - sum(latencies["warm"])) / repeats
+        print(f"[Runner] Startup saved by the zygote: {saved / 1e9:.3f}s per invocation")
+        return latencies
+    finally:
+        zygote.stop()
         time.sleep(0.5)  # Give time for cgroup to settle
         cgroup_manager.cleanup()
 
@@ -197,13 +418,38 @@ if __name__ == "__main__":
     parser.add_argument(
         "--duration", type=float, default=60.0, help="Benchmark duration in seconds"
     )
+    parser.add_argument(
+        "--start-mode", default="cold", choices=("cold", "warm"),
+        help="Exec a fresh interpreter (cold) or clone a preloaded zygote (warm)"
+    )
+    parser.add_argument(
+        "--preload", nargs="*", default=list(ZYGOTE_PRELOAD),
+        help="Modules the zygote imports ahead of warm starts"
+    )
+    parser.add_argument(
+        "--compare-starts", type=int, default=0, metavar="N",
+        help="Instead of one interactive run, time N cold and N warm runs"
+    )
 
     args = parser.parse_args()
 
-    run_benchmark_in_cgroup(
-        benchmark_script=args.benchmark_script,
-        cgroup_name=args.cgroup_name,
-        cpuset=args.cpuset,
-        memory_limit=args.memory,
-        duration=args.duration
-    )
+    if args.compare_starts:
+        compare_start_latency(
+            benchmark_script=args.benchmark_script,
+            cgroup_name=args.cgroup_name,
+            cpuset=args.cpuset,
+            memory_limit=args.memory,
+            duration=args.duration,
+            repeats=args.compare_starts,
+            preload=args.preload,
+        )
+    else:
+        run_benchmark_in_cgroup(
+            benchmark_script=args.benchmark_script,
+            cgroup_name=args.cgroup_name,
+            cpuset=args.cpuset,
+            memory_limit=args.memory,
+            duration=args.duration,
+            start_mode=args.start_mode,
+            preload=args.preload,
+        )
@@ -11,6 +11,8 @@ import base64
 from datetime import datetime
 from typing import Dict, Any
 import sys
+import argparse
+import kernels
 
 
 # ============================================================================
@@ -19,9 +21,47 @@ import sys
 class ImgPr:
     """Simulates image processing with matrix operations"""
     
-    def __init__(self, image_size: tuple = (256, 256)):
+    # 5x5 box blur and Sobel operator, each as a pair of 1-D passes
+    BOX = np.ones(5) / 5
+    SOBEL_SMOOTH = np.array([1, 2, 1])
+    SOBEL_DERIV = np.array([-1, 0, 1])
+    GRAY_WEIGHTS = (0.299, 0.587, 0.114)
+    
+    def __init__(self, image_size: tuple = (256, 256), precision: str = "float32"):
+        if precision not in kernels.PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', "
+                             f"expected one of {kernels.PRECISIONS}")
         self.image_size = image_size
+        self.precision = precision
         self.processed_count = 0
+        
+        # Working buffers: float32 throughout, or uint16 pixels and int16 gradients
+        if precision == "fixed":
+            pixel_dtype, gradient_dtype = np.uint16, np.int16
+        else:
+            pixel_dtype = gradient_dtype = np.float32
+        self._blurred = np.empty((*image_size, 3), dtype=pixel_dtype)
+        self._blur_tmp = np.empty_like(self._blurred)
+        self._gray = np.empty(image_size, dtype=pixel_dtype)
+        self._gray_tmp = np.empty_like(self._gray)
+        self._gradient_x = np.empty(image_size, dtype=gradient_dtype)
+        self._gradient_y = np.empty_like(self._gradient_x)
+        self._gradient_tmp = np.empty_like(self._gradient_x)
+        self._magnitude = np.empty_like(self._gradient_x)
+    
+    def grayscale(self, image: np.ndarray) -> np.ndarray:
+        """Weighted channel sum, in fixed point (Q8) on the integer path"""
+        gray, tmp = self._gray, self._gray_tmp
+        if self.precision == "fixed":
+            weights, shift = kernels.fixed_point(self.GRAY_WEIGHTS)
+        else:
+            weights, shift = np.array(self.GRAY_WEIGHTS, dtype=np.float32), 0
+        np.multiply(image[:, :, 0], weights[0], out=gray, dtype=gray.dtype, casting='unsafe')
+        for channel in (1, 2):
+            np.multiply(image[:, :, channel], weights[channel], out=tmp,
+                        dtype=gray.dtype, casting='unsafe')
+            gray += tmp
+        return kernels.descale(gray, shift)
     
     def process_image(self) -> Dict[str, Any]:
         """Simulate image processing operations"""
@@ -32,29 +72,34 @@ class ImgPr:
         
         # Apply filters (convolution simulation)
         # Gaussian blur approximation
-        kernel_size = 5
-        kernel = np.ones((kernel_size, kernel_size)) / (kernel_size ** 2)
-        
-        # Edge detection (Sobel-like)
-        sobel_x = np.array([[-1, 0, 1], [-2, 0, 2], [-1, 0, 1]])
-        sobel_y = np.array([[-1, -2, -1], [0, 0, 0], [1, 2, 1]])
-        
-        # Compute gradients
-        gradient_x = np.abs(image[:, :, 0].astype(float))
-        gradient_y = np.abs(image[:, :, 0].astype(float))
-        magnitude = np.sqrt(gradient_x**2 + gradient_y**2)
+        blurred = kernels.separable(image, self.BOX, self.BOX,
+                                    out=self._blurred, tmp=self._blur_tmp)
         
         # Color space conversion (RGB to Grayscale)
-        grayscale = 0.299 * image[:, :, 0] + 0.587 * image[:, :, 1] + 0.114 * image[:, :, 2]
+        grayscale = self.grayscale(blurred)
+        
+        # Edge detection (Sobel): smooth across, differentiate along each axis
+        gradient_x = kernels.separable(grayscale, self.SOBEL_SMOOTH, self.SOBEL_DERIV,
+                                       out=self._gradient_x, tmp=self._gradient_tmp)
+        gradient_y = kernels.separable(grayscale, self.SOBEL_DERIV, self.SOBEL_SMOOTH,
+                                       out=self._gradient_y, tmp=self._gradient_tmp)
+        if self.precision == "fixed":
+            # L1 magnitude keeps the integer path in int16
+            magnitude = np.abs(gradient_x, out=self._magnitude)
+            magnitude += np.abs(gradient_y, out=gradient_y)
+        else:
+            magnitude = np.hypot(gradient_x, gradient_y, out=self._magnitude)
         
         # Histogram calculation
-        histogram, _ = np.histogram(grayscale.flatten(), bins=256, range=(0, 256))
+        histogram, _ = np.histogram(grayscale, bins=256, range=(0, 256))
         
         return {
             "processed_id": self.processed_count,
             "mean_intensity": float(np.mean(grayscale)),
             "std_intensity": float(np.std(grayscale)),
-            "edge_density": float(np.mean(magnitude))
+            "edge_density": float(np.mean(magnitude)),
+            "precision": self.precision,
+            "kernel_backend": kernels.BACKEND
         }
     
     def run_continuous(self, duration: float = 60.0):
@@ -78,5 +123,12 @@ class ImgPr:
     
 
 if __name__ == '__main__':
-    imageproc = ImgPr(image_size=(512, 512))
-    imageproc.run_continuous(duration=60)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Image processing benchmark")
+    parser.add_argument("--duration", type=float, default=60.0,
+                        help="Benchmark duration in seconds")
+    parser.add_argument("--precision", default="float32", choices=kernels.PRECISIONS,
+                        help="float32 filters or uint8/int16 fixed-point filters")
+    args = parser.parse_args()
+    
+    imageproc = ImgPr(image_size=(512, 512), precision=args.precision)
+    imageproc.run_continuous(duration=args.duration)
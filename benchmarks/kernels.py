@@ -0,0 +1,98 @@
+"""
+Vectorized correlation kernels shared by the image and video benchmarks.
+
+scipy.ndimage does the work when it is installed; otherwise every filter
+falls back to shift-and-accumulate over strided views of a reflect-padded
+input, with identical boundary handling. The output array's dtype picks the
+arithmetic: float outputs use float32 weights, integer outputs use
+fixed-point weights (see fixed_point) and accumulate in the output dtype, so
+the caller chooses a uint8/int16/uint16 working format that cannot overflow.
+"""
+
+import itertools
+import numpy as np
+
+try:
+    from scipy import ndimage
+except ImportError:
+    ndimage = None
+
+BACKEND = "scipy" if ndimage is not None else "numpy"
+PRECISIONS = ("float32", "fixed")
+
+
+def fixed_point(weights, frac_bits: int = 8):
+    """(integer weights, right shift) approximating weights; integral weights need no shift"""
+    weights = np.asarray(weights, dtype=np.float64)
+    if np.array_equal(weights, np.round(weights)):
+        return weights.astype(np.int16), 0
+    return np.round(weights * (1 << frac_bits)).astype(np.int16), frac_bits
+
+
+def _prepare(weights, out):
+    """Weights in the arithmetic implied by out's dtype, plus the fixed-point shift"""
+    if np.issubdtype(out.dtype, np.floating):
+        return np.asarray(weights, dtype=np.float32), 0
+    return fixed_point(weights)
+
+
+def descale(out, shift):
+    """Round and undo the fixed-point scaling in place"""
+    if shift:
+        out += 1 << (shift - 1)
+        np.right_shift(out, shift, out=out)
+    return out
+
+
+def _accumulate(padded, weights, out):
+    """out = sum over kernel offsets of weight * shifted view of padded"""
+    tmp = None
+    for offset in itertools.product(*(range(n) for n in weights.shape)):
+        w = weights[offset]
+        if w == 0:
+            continue
+        view = padded[tuple(slice(o, o + n) for o, n in zip(offset, out.shape))]
+        if tmp is None:
+            np.multiply(view, w, out=out, dtype=out.dtype, casting='unsafe')
+            tmp = np.empty_like(out)
+        else:
+            np.multiply(view, w, out=tmp, dtype=out.dtype, casting='unsafe')
+            out += tmp
+    if tmp is None:
+        out[...] = 0
+    return out
+
+
+def _pad(image, weights):
+    """Reflect-pad image so a len-n kernel is centred at n // 2, as scipy does"""
+    widths = [(n // 2, n - 1 - n // 2) for n in weights.shape]
+    return np.pad(image, widths, mode='symmetric')
+
+
+def correlate1d(image, weights, axis: int, out):
+    """1-D correlation of image along axis into out"""
+    weights, shift = _prepare(weights, out)
+    if ndimage is not None:
+        ndimage.correlate1d(image, weights, axis=axis, output=out, mode='reflect')
+        return descale(out, shift)
+    shape = [1] * image.ndim
+    shape[axis] = len(weights)
+    weights = weights.reshape(shape)
+    return descale(_accumulate(_pad(image, weights), weights, out), shift)
+
+
+def correlate(image, kernel, out):
+    """N-D correlation of image with a kernel of the same rank into out"""
+    kernel, shift = _prepare(kernel, out)
+    if kernel.ndim != image.ndim:
+        raise ValueError(f"kernel rank {kernel.ndim} does not match image rank {image.ndim}")
+    if ndimage is not None:
+        ndimage.correlate(image, kernel, output=out, mode='reflect')
+        return descale(out, shift)
+    return descale(_accumulate(_pad(image, kernel), kernel, out), shift)
+
+
+def separable(image, weights0, weights1, out, tmp, axes=(0, 1)):
+    """Separable 2-D filter: weights0 along axes[0] into tmp, then weights1 along axes[1]"""
+    correlate1d(image, weights0, axes[0], out=tmp)
+    return correlate1d(tmp, weights1, axes[1], out=out)
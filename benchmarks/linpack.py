@@ -1,88 +1,217 @@
 import time
+import os
+import csv
 import numpy as np
+import scipy.linalg
 import json
 import hashlib
 import base64
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List
 import sys
+import argparse
+
+
+def current_cpu_khz():
+    """scaling_cur_freq of the CPU this process last ran on, or None without cpufreq"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 39 (processor); the comm field may contain spaces, so split after ')'
+            cpu = int(f.read().rsplit(")", 1)[1].split()[36])
+        with open(f"/sys/devices/system/cpu/cpu{cpu}/cpufreq/scaling_cur_freq") as f:
+            return int(f.read())
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def blocked_lu(A: np.ndarray, block_size: int, update: np.ndarray = None):
+    """In-place right-looking LU with partial pivoting, HPL style
+
+    Each step factors an (n-k, nb) panel with LAPACK, swaps the rest of the
+    pivot rows, solves for the U block row and applies a rank-nb GEMM update
+    to the trailing matrix. update is n x n scratch for the GEMM product
+    (allocated here if not given). Returns (A, piv) in scipy.linalg.lu_factor form.
+    """
+    n = A.shape[0]
+    piv = np.empty(n, dtype=np.int32)
+    if update is None:
+        update = np.empty((n, n), dtype=A.dtype, order='F')
+    for k in range(0, n, block_size):
+        kb = min(block_size, n - k)
+        end = k + kb
+        panel, panel_piv = scipy.linalg.lu_factor(A[k:, k:end], check_finite=False)
+        A[k:, k:end] = panel
+        piv[k:end] = panel_piv + k
+
+        # LAPACK pivots are sequential row swaps; apply them as one permutation
+        perm = np.arange(n - k)
+        for i, p in enumerate(panel_piv):
+            perm[i], perm[p] = perm[p], perm[i]
+        A[k:, :k] = A[k:, :k][perm]
+        A[k:, end:] = A[k:, end:][perm]
+        if end == n:
+            break
+
+        A[k:end, end:] = scipy.linalg.solve_triangular(
+            A[k:end, k:end], A[k:end, end:], lower=True, unit_diagonal=True, check_finite=False)
+        trailing = update[:n - end, :n - end]
+        np.matmul(A[end:, k:end], A[k:end, end:], out=trailing)
+        A[end:, end:] -= trailing
+    return A, piv
+
 
 class Linpack:
     """LINPACK-style benchmark for linear algebra operations"""
-    
-    def __init__(self, matrix_size: int = 500):
+
+    # Operation counts used for every GFLOPS figure
+    FLOPS = {
+        "lu": lambda n: (2.0 / 3.0) * n ** 3,
+        "solve": lambda n: 2.0 * n ** 2,
+        "gemm": lambda n: 2.0 * n ** 3,
+        # Tridiagonal reduction dominates eigenvalues-only eigvalsh
+        "eig": lambda n: (4.0 / 3.0) * n ** 3,
+    }
+
+    def __init__(self, matrix_size: int = 500, sizes: List[int] = None, block_sizes: List[int] = (0,)):
+        self.sizes = list(sizes) if sizes else [matrix_size]
+        # 0 leaves blocking to LAPACK's getrf
+        self.block_sizes = list(block_sizes)
         self.matrix_size = matrix_size
         self.benchmark_count = 0
-    
-    def run_benchmark(self) -> Dict[str, Any]:
-        """Run LINPACK-style benchmark"""
-        self.benchmark_count += 1
-        
-        # Generate random matrix and vector
-        A = np.random.randn(self.matrix_size, self.matrix_size)
-        b = np.random.randn(self.matrix_size)
-        
-        # Time the solve operation
-        start = time.time()
-        
-        # LU decomposition and solve
-        x = np.linalg.solve(A, b)
-        
-        solve_time = time.time() - start
-        
-        # Verify solution
-        residual = np.linalg.norm(np.dot(A, x) - b)
-        
-        # Additional operations
+        self.rng = np.random.default_rng()
+        self._buffers = {}
+
+    def buffers(self, n: int) -> Dict[str, np.ndarray]:
+        """Inputs for size n plus the work arrays every run overwrites, allocated once"""
+        if n not in self._buffers:
+            A = self.rng.standard_normal((n, n))
+            self._buffers[n] = {
+                "A": A,
+                "b": self.rng.standard_normal(n),
+                "sym": (A + A.T) / 2,
+                # Fortran order so LAPACK can factor and solve in place
+                "lu": np.empty((n, n), order='F'),
+                "x": np.empty(n),
+                "gemm": np.empty((n, n)),
+                "eig": np.empty((n, n), order='F'),
+                # Trailing-update scratch for blocked_lu
+                "update": np.empty((n, n), order='F'),
+            }
+        return self._buffers[n]
+
+    def measure(self, n: int, block_size: int) -> Dict[str, Any]:
+        """Time LU, solve, GEMM and eigvalsh at size n; copies into the work arrays are untimed"""
+        buf = self.buffers(n)
+        # Restore the inputs the previous run overwrote
+        np.copyto(buf["lu"], buf["A"])
+        np.copyto(buf["x"], buf["b"])
+        np.copyto(buf["eig"], buf["sym"])
+        times = {}
+
+        # LU factorization, in place in the work array
+        start = time.perf_counter_ns()
+        if 0 < block_size < n:
+            factors = blocked_lu(buf["lu"], block_size, buf["update"])
+        else:
+            factors = scipy.linalg.lu_factor(buf["lu"], overwrite_a=True, check_finite=False)
+        times["lu"] = time.perf_counter_ns() - start
+
+        # Forward and back substitution with the factors
+        start = time.perf_counter_ns()
+        x = scipy.linalg.lu_solve(factors, buf["x"], overwrite_b=True, check_finite=False)
+        times["solve"] = time.perf_counter_ns() - start
+
         # Matrix multiplication
-        mm_start = time.time()
-        C = np.dot(A, A.T)
-        mm_time = time.time() - mm_start
-        
-        # Eigenvalue computation (subset)
-        eigen_start = time.time()
-        eigenvalues = np.linalg.eigvalsh(A[:100, :100])
-        eigen_time = time.time() - eigen_start
-        
-        # Calculate FLOPS estimate
-        # Solve: ~(2/3) * n^3 operations
-        flops_solve = (2.0 / 3.0) * (self.matrix_size ** 3)
-        gflops_solve = (flops_solve / solve_time) / 1e9
-        
-        return {
-            "benchmark_id": self.benchmark_count,
-            "matrix_size": self.matrix_size,
-            "solve_time": solve_time,
-            "mm_time": mm_time,
-            "eigen_time": eigen_time,
-            "gflops": gflops_solve,
-            "residual": float(residual)
-        }
-    
-    def run_continuous(self, duration: float = 60.0):
+        start = time.perf_counter_ns()
+        np.matmul(buf["A"], buf["A"].T, out=buf["gemm"])
+        times["gemm"] = time.perf_counter_ns() - start
+
+        # Symmetric eigenvalues
+        start = time.perf_counter_ns()
+        scipy.linalg.eigvalsh(buf["eig"], overwrite_a=True, check_finite=False)
+        times["eig"] = time.perf_counter_ns() - start
+
+        # Verify solution: HPL's scaled residual; O(1) for a backward-stable solve
+        A, b = buf["A"], buf["b"]
+        residual = np.linalg.norm(A @ x - b, np.inf) / (
+            np.finfo(A.dtype).eps * n * (np.linalg.norm(A, np.inf) * np.linalg.norm(x, np.inf)
+                                         + np.linalg.norm(b, np.inf)))
+
+        # Calculate FLOPS per operation
+        point = {"matrix_size": n, "block_size": block_size, "cpu_khz": current_cpu_khz()}
+        for op, elapsed in times.items():
+            point[f"{op}_ns"] = elapsed
+            point[f"{op}_gflops"] = self.FLOPS[op](n) / elapsed
+        # HPL's headline figure: factor plus solve
+        point["gflops"] = ((self.FLOPS["lu"](n) + self.FLOPS["solve"](n))
+                           / (times["lu"] + times["solve"]))
+        point["residual"] = float(residual)
+        return point
+
+    def run_benchmark(self) -> List[Dict[str, Any]]:
+        """Run LINPACK-style benchmark over every (size, block size) pair"""
+        self.benchmark_count += 1
+        return [self.measure(n, nb) for n in self.sizes for nb in self.block_sizes]
+
+    def write_curve(self, path: str, curve: Dict[tuple, List[Dict[str, Any]]]):
+        """Append mean GFLOPS per (CPU frequency, size, block size) to a CSV file"""
+        fields = ["cpu_khz", "matrix_size", "block_size", "runs", "gflops"]
+        fields += [f"{op}_gflops" for op in self.FLOPS] + ["residual"]
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            if new_file:
+                writer.writeheader()
+            for (khz, n, nb), points in sorted(curve.items(), key=lambda item: item[0][1:]):
+                row = {"cpu_khz": khz, "matrix_size": n, "block_size": nb, "runs": len(points)}
+                for field in fields[4:]:
+                    row[field] = float(np.mean([p[field] for p in points]))
+                writer.writerow(row)
+
+    def run_continuous(self, duration: float = 60.0, csv_path: str = None):
         """Run continuously for specified duration"""
-        print(f"[Linpack] Starting continuous execution for {duration}s")
+        print(f"[Linpack] Starting continuous execution for {duration}s "
+              f"(sizes {self.sizes}, block sizes {self.block_sizes})")
         start_time = time.time()
         iterations = 0
-        total_gflops = 0.0
-        
+        # Points grouped by the CPU frequency they were measured at
+        curve = {}
+
         while time.time() - start_time < duration:
-            result = self.run_benchmark()
+            for point in self.run_benchmark():
+                key = (point["cpu_khz"], point["matrix_size"], point["block_size"])
+                curve.setdefault(key, []).append(point)
             iterations += 1
-            total_gflops += result["gflops"]
-            
+
             if iterations % 5 == 0:
                 elapsed = time.time() - start_time
-                avg_gflops = total_gflops / iterations
-                print(f"[Linpack] Completed {iterations} benchmarks in {elapsed:.2f}s "
-                      f"(Avg: {avg_gflops:.2f} GFLOPS)")
-        
+                print(f"[Linpack] Completed {iterations} sweeps in {elapsed:.2f}s")
+
         total_time = time.time() - start_time
-        avg_gflops = total_gflops / iterations
-        print(f"[Linpack] Completed {iterations} iterations in {total_time:.2f}s "
-              f"(Average: {avg_gflops:.2f} GFLOPS)")
+        print(f"[Linpack] Completed {iterations} iterations in {total_time:.2f}s")
+        for (khz, n, nb), points in sorted(curve.items(), key=lambda item: item[0][1:]):
+            mean = {op: np.mean([p[f"{op}_gflops"] for p in points]) for op in self.FLOPS}
+            freq = f"{khz / 1e6:.2f} GHz" if khz else "unknown freq"
+            print(f"[Linpack] n={n:5d} nb={nb:4d} @ {freq}: "
+                  f"HPL {np.mean([p['gflops'] for p in points]):.2f} GFLOPS "
+                  f"(LU {mean['lu']:.2f}, solve {mean['solve']:.2f}, "
+                  f"GEMM {mean['gemm']:.2f}, eig {mean['eig']:.2f})")
+        if csv_path:
+            self.write_curve(csv_path, curve)
         return iterations
-    
+
+
 if __name__ == '__main__':
-    linpk = Linpack(matrix_size=500)
-    linpk.run_continuous(duration=60)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="LINPACK-style benchmark")
+    parser.add_argument("--duration", type=float, default=60.0,
+                        help="Benchmark duration in seconds")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500],
+                        help="Matrix orders to sweep")
+    parser.add_argument("--block-sizes", type=int, nargs="+", default=[0],
+                        help="LU panel widths to sweep (0 = LAPACK getrf)")
+    parser.add_argument("--csv", default=None,
+                        help="Append the size-vs-GFLOPS curve to this CSV file")
+    args = parser.parse_args()
+
+    linpk = Linpack(sizes=args.sizes, block_sizes=args.block_sizes)
+    linpk.run_continuous(duration=args.duration, csv_path=args.csv)
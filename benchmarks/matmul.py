@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import ctypes
+import subprocess
+import tempfile
+import argparse
+import numpy as np
+from typing import Dict, Any
+
+# c/ sits next to this file's directory; `make native` builds the library there
+C_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "c"))
+LIB_PATH = os.path.join(C_DIR, "libmatmul.so")
+SOURCE_PATH = os.path.join(C_DIR, "matrix_mul.c")
+
+
+def build(path: str):
+    """Compile the kernels to a temporary file and rename it into place
+
+    Concurrent sweep workers may all find the library missing; the rename is
+    atomic, so none of them can load a partly written file.
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix=".so", dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    try:
+        subprocess.run([os.environ.get("CC", "cc"), "-O2", "-shared", "-fPIC",
+                        SOURCE_PATH, "-o", tmp_path], check=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_library(path: str = None) -> ctypes.CDLL:
+    """Load the C matrix-multiply kernels, compiling them first if the library is missing"""
+    path = path or os.environ.get("MATMUL_LIB", LIB_PATH)
+    if not os.path.exists(path):
+        print(f"[MatMul] Building {path}")
+        build(path)
+    lib = ctypes.CDLL(path)
+
+    matrix = np.ctypeslib.ndpointer(dtype=np.float64, ndim=2, flags="C_CONTIGUOUS")
+    for name in ("matmul_naive", "matmul_reordered"):
+        getattr(lib, name).argtypes = [matrix, matrix, matrix, ctypes.c_int]
+        getattr(lib, name).restype = None
+    lib.matmul_blocked.argtypes = [matrix, matrix, matrix, ctypes.c_int, ctypes.c_int]
+    lib.matmul_blocked.restype = None
+    return lib
+
+
+class MatMul:
+    """Single-threaded C matrix multiplication, free of BLAS"""
+
+    KERNELS = ("naive", "blocked", "reordered")
+
+    def __init__(self, matrix_size: int = 512, block_size: int = 32, kernels=KERNELS,
+                 lib_path: str = None):
+        unknown = [kernel for kernel in kernels if kernel not in self.KERNELS]
+        if unknown:
+            raise ValueError(f"Unknown kernel(s) {unknown}, expected some of {self.KERNELS}")
+        if block_size < 1:
+            # The blocked kernel steps by block_size; 0 or less would never finish
+            raise ValueError(f"block_size must be at least 1, got {block_size}")
+        self.matrix_size = matrix_size
+        self.block_size = block_size
+        self.kernels = tuple(kernels)
+        self.lib = load_library(lib_path)
+        self.benchmark_count = 0
+
+        rng = np.random.default_rng()
+        self.A = rng.random((matrix_size, matrix_size))
+        self.B = rng.random((matrix_size, matrix_size))
+        self.C = np.empty((matrix_size, matrix_size))
+        # Reference product for checking the kernels (computed once, untimed)
+        self.expected = self.A @ self.B
+
+    def multiply(self, kernel: str):
+        """C = A @ B with one of the C kernels; ctypes drops the GIL for the call"""
+        n = self.matrix_size
+        if kernel == "blocked":
+            self.lib.matmul_blocked(self.A, self.B, self.C, n, self.block_size)
+        else:
+            getattr(self.lib, f"matmul_{kernel}")(self.A, self.B, self.C, n)
+        return self.C
+
+    def run_benchmark(self) -> Dict[str, Any]:
+        """Time every kernel once"""
+        self.benchmark_count += 1
+        flops = 2.0 * self.matrix_size ** 3
+        result = {"benchmark_id": self.benchmark_count, "matrix_size": self.matrix_size,
+                  "block_size": self.block_size}
+
+        for kernel in self.kernels:
+            start = time.perf_counter_ns()
+            C = self.multiply(kernel)
+            elapsed = time.perf_counter_ns() - start
+            result[f"{kernel}_ns"] = elapsed
+            # flops per ns is GFLOPS
+            result[f"{kernel}_gflops"] = flops / elapsed
+            result[f"{kernel}_max_error"] = float(np.abs(C - self.expected).max())
+        return result
+
+    def run_continuous(self, duration: float = 60.0):
+        """Run continuously for specified duration"""
+        print(f"[MatMul] Starting continuous execution for {duration}s "
+              f"(n={self.matrix_size}, block={self.block_size}, kernels {self.kernels})")
+        start_time = time.time()
+        iterations = 0
+        total_gflops = dict.fromkeys(self.kernels, 0.0)
+
+        while time.time() - start_time < duration:
+            result = self.run_benchmark()
+            iterations += 1
+            for kernel in self.kernels:
+                total_gflops[kernel] += result[f"{kernel}_gflops"]
+
+            if iterations % 5 == 0:
+                elapsed = time.time() - start_time
+                print(f"[MatMul] Completed {iterations} benchmarks in {elapsed:.2f}s")
+
+        total_time = time.time() - start_time
+        averages = ", ".join(f"{kernel} {total / iterations:.2f}" if iterations else f"{kernel} n/a"
+                             for kernel, total in total_gflops.items())
+        print(f"[MatMul] Completed {iterations} iterations in {total_time:.2f}s "
+              f"(Average GFLOPS: {averages})")
+        return iterations
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="C matrix multiplication benchmark")
+    parser.add_argument("--duration", type=float, default=60.0,
+                        help="Benchmark duration in seconds")
+    parser.add_argument("--size", type=int, default=512, help="Matrix order")
+    parser.add_argument("--block-size", type=int, default=32, help="Tile size of the blocked kernel")
+    parser.add_argument("--kernels", nargs="+", default=list(MatMul.KERNELS), choices=MatMul.KERNELS)
+    parser.add_argument("--lib", default=None, help="Path to libmatmul.so (default: c/libmatmul.so)")
+    args = parser.parse_args()
+
+    matmul = MatMul(matrix_size=args.size, block_size=args.block_size, kernels=args.kernels,
+                    lib_path=args.lib)
+    matmul.run_continuous(duration=args.duration)
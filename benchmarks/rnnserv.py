@@ -11,6 +11,7 @@ import base64
 from datetime import datetime
 from typing import Dict, Any
 import sys
+import argparse
 
 
 # ============================================================================
@@ -19,9 +20,10 @@ import sys
 class RnnSrv:
     """Simulates RNN inference with sequential matrix operations"""
     
-    def __init__(self, seq_length: int = 100, hidden_size: int = 128):
+    def __init__(self, seq_length: int = 100, hidden_size: int = 128, batch_size: int = 1):
         self.seq_length = seq_length
         self.hidden_size = hidden_size
+        self.batch_size = batch_size
         self.vocab_size = 1000
         self.inference_count = 0
         
@@ -30,63 +32,95 @@ class RnnSrv:
         self.Whh = np.random.randn(hidden_size, hidden_size) * 0.01
         self.Why = np.random.randn(self.vocab_size, hidden_size) * 0.01
     
-    def forward_pass(self, inputs: np.ndarray) -> np.ndarray:
-        """Simulate RNN forward pass"""
-        h = np.zeros((self.hidden_size, 1))
-        outputs = []
+    def forward_pass(self, token_ids: np.ndarray) -> np.ndarray:
+        """Simulate RNN forward pass over a (seq_length, batch) array of token ids
         
-        for x in inputs:
-            # RNN cell computation
-            h = np.tanh(np.dot(self.Wxh, x) + np.dot(self.Whh, h))
-            y = np.dot(self.Why, h)
-            outputs.append(y)
+        Returns logits of shape (seq_length, vocab_size, batch).
+        """
+        seq_length, batch = token_ids.shape
         
-        return np.array(outputs)
+        # Hidden states laid out (hidden, seq, batch) so the output projection
+        # below is a single contiguous GEMM
+        states = np.empty((self.hidden_size, seq_length, batch))
+        embedded = np.empty((self.hidden_size, batch))
+        h = np.zeros((self.hidden_size, batch))
+        
+        for t in range(seq_length):
+            # RNN cell computation; Wxh @ one_hot(x) is just column x of Wxh
+            np.take(self.Wxh, token_ids[t], axis=1, out=embedded)
+            embedded += np.dot(self.Whh, h)
+            h = np.tanh(embedded, out=states[:, t, :])
+        
+        outputs = np.dot(self.Why, states.reshape(self.hidden_size, -1))
+        return outputs.reshape(self.vocab_size, seq_length, batch).transpose(1, 0, 2)
     
-    def inference(self) -> Dict[str, Any]:
-        """Run RNN inference"""
+    def inference(self, token_ids: np.ndarray = None) -> Dict[str, Any]:
+        """Run RNN inference on a batch of sequences"""
         self.inference_count += 1
         
-        # Generate input sequence (one-hot encoded)
-        inputs = []
-        for _ in range(self.seq_length):
-            x = np.zeros((self.vocab_size, 1))
-            x[np.random.randint(0, self.vocab_size)] = 1
-            inputs.append(x)
+        # Generate input sequences as integer token ids
+        if token_ids is None:
+            token_ids = np.random.randint(0, self.vocab_size,
+                                          (self.seq_length, self.batch_size))
+        elif token_ids.ndim == 1:
+            token_ids = token_ids.reshape(-1, 1)
+        batch = token_ids.shape[1]
         
         # Forward pass
-        outputs = self.forward_pass(inputs)
+        start = time.perf_counter()
+        outputs = self.forward_pass(token_ids)
+        latency = time.perf_counter() - start
         
         # Get predictions
         predictions = np.argmax(outputs, axis=1)
         
         return {
             "inference_id": self.inference_count,
-            "sequence_length": self.seq_length,
+            "sequence_length": token_ids.shape[0],
+            "batch_size": batch,
             "output_shape": outputs.shape,
-            "sample_predictions": predictions[:5].tolist()
+            "sample_predictions": predictions[:5, 0].tolist(),
+            # Every request in the batch completes when the batch does
+            "request_latency": latency,
+            # None (JSON null) rather than inf, which json writes as invalid Infinity
+            "throughput": batch / latency if latency > 0 else None
         }
     
     def run_continuous(self, duration: float = 60.0):
         """Run continuously for specified duration"""
-        print(f"[RnnSrv] Starting continuous execution for {duration}s")
+        print(f"[RnnSrv] Starting continuous execution for {duration}s "
+              f"(batch size: {self.batch_size})")
         start_time = time.time()
         iterations = 0
+        latencies = []
         
         while time.time() - start_time < duration:
             result = self.inference()
             iterations += 1
+            latencies.append(result["request_latency"])
             
             if iterations % 5 == 0:
                 elapsed = time.time() - start_time
                 print(f"[RnnSrv] Completed {iterations} inferences in {elapsed:.2f}s "
-                      f"({iterations/elapsed:.2f} inf/s)")
+                      f"({iterations/elapsed:.2f} inf/s, "
+                      f"{iterations * self.batch_size / elapsed:.2f} seq/s)")
         
         total_time = time.time() - start_time
         print(f"[RnnSrv] Completed {iterations} iterations in {total_time:.2f}s")
+        if latencies:
+            mean_latency = float(np.mean(latencies))
+            print(f"[RnnSrv] Request latency: mean {1000 * mean_latency:.3f} ms, "
+                  f"p99 {1000 * float(np.percentile(latencies, 99)):.3f} ms; "
+                  f"batch throughput {self.batch_size / mean_latency:.2f} seq/s")
         return iterations
     
 if __name__ == '__main__':
-    rnnserv = RnnSrv(seq_length=200, hidden_size=128)
-    rnnserv.run_continuous(duration=60)
-    
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="RNN inference benchmark")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Sequences processed per forward pass")
+    parser.add_argument("--duration", type=float, default=60.0,
+                        help="Benchmark duration in seconds")
+    args = parser.parse_args()
+    
+    rnnserv = RnnSrv(seq_length=200, hidden_size=128, batch_size=args.batch_size)
+    rnnserv.run_continuous(duration=args.duration)
@@ -0,0 +1,31 @@
+"""
+Peak resident-set measurement for the benchmarks that report memory use.
+
+The kernel's high-water mark (VmHWM) can be reset between measurements by
+writing 5 to /proc/self/clear_refs; where that is unavailable the reading
+falls back to ru_maxrss, the peak over the whole process lifetime.
+"""
+
+import resource
+
+
+def reset_peak_rss():
+    """Reset the kernel's resident-set high-water mark for this process"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def read_peak_rss_mb() -> float:
+    """Peak RSS in MB since the last reset_peak_rss() call"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    # ru_maxrss is in KB on Linux and cannot be reset
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
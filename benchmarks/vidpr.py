@@ -10,7 +10,13 @@ import hashlib
 import base64
 from datetime import datetime
 from typing import Dict, Any
+import os
 import sys
+import shutil
+import tempfile
+import tracemalloc
+import argparse
+import kernels
 
 # ============================================================================
 # 7. VidPr - Video Processing (Frame-by-Frame Operations)
@@ -18,53 +24,168 @@ import sys
 class VidPr:
     """Simulates video processing with frame operations"""
     
-    def __init__(self, frame_size: tuple = (480, 640, 3), fps: int = 30):
+    LAPLACIAN = np.array([[0, -1, 0], [-1, 4, -1], [0, -1, 0]])
+    MOTION_BLUR = np.ones(5) / 5
+    GAIN = 1.2
+    SOURCES = ("generate", "replay")
+    MOTION_BLOCK_ROWS = 32
+    
+    def __init__(self, frame_size: tuple = (480, 640, 3), fps: int = 30,
+                 precision: str = "float32", source: str = "generate",
+                 clip_frames: int = None, trace_allocations: bool = False):
+        if precision not in kernels.PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', "
+                             f"expected one of {kernels.PRECISIONS}")
+        if source not in self.SOURCES:
+            raise ValueError(f"Unknown source '{source}', expected one of {self.SOURCES}")
         self.frame_size = frame_size
         self.fps = fps
+        self.precision = precision
+        self.source = source
+        self.clip_frames = clip_frames or fps
+        self.trace_allocations = trace_allocations
         self.processed_videos = 0
+        self.rng = np.random.default_rng()
+        
+        # Working buffers: float32 throughout, or int16 pixels with a uint16 blur
+        if precision == "fixed":
+            pixel_dtype, blur_dtype = np.int16, np.uint16
+        else:
+            pixel_dtype = blur_dtype = np.float32
+        self._corrected = np.empty(frame_size, dtype=pixel_dtype)
+        self._sharpened = np.empty(frame_size, dtype=pixel_dtype)
+        self._blurred = np.empty(frame_size, dtype=blur_dtype)
+        # The Laplacian is applied per channel
+        self._laplacian = self.LAPLACIAN[:, :, None]
+        # Q6 gain keeps 255 * gain inside int16 on the fixed path
+        if precision == "fixed":
+            self._gain = kernels.fixed_point(self.GAIN, frac_bits=6)
+        else:
+            self._gain = (self.GAIN, 0)
+        
+        # Frame source: two generated frames alternate so the previous one stays
+        # valid for motion scoring, or frames are views of a memory-mapped clip
+        self._noise = np.empty(frame_size, dtype=np.float32)
+        self._frames = np.empty((2, *frame_size), dtype=np.uint8)
+        self._frame_index = 0
+        self._clip = None
+        self._clip_dir = None
+        self._prev = None
+        self._motion_block = np.empty((self.MOTION_BLOCK_ROWS, *frame_size[1:]), dtype=np.int16)
+        
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+    
+    def generate_frame(self, out: np.ndarray) -> np.ndarray:
+        """Fill out with uniform uint8 pixels: float32 noise scaled and cast in place"""
+        self.rng.random(out=self._noise, dtype=np.float32)
+        self._noise *= 256
+        np.copyto(out, self._noise, casting='unsafe')
+        return out
+    
+    def open_clip(self):
+        """Write clip_frames generated frames to disk and map them for replay"""
+        if self._clip is not None:
+            return
+        self._clip_dir = tempfile.mkdtemp(prefix="vidpr-")
+        path = os.path.join(self._clip_dir, "clip.u8")
+        with open(path, "wb") as f:
+            for _ in range(self.clip_frames):
+                self.generate_frame(self._frames[0]).tofile(f)
+        self._clip = np.memmap(path, dtype=np.uint8, mode="r",
+                               shape=(self.clip_frames, *self.frame_size))
     
-    def process_frame(self, frame: np.ndarray) -> np.ndarray:
+    def close(self):
+        """Unmap and delete the replay clip, if any"""
+        self._clip = None
+        self._prev = None
+        if self._clip_dir is not None:
+            shutil.rmtree(self._clip_dir, ignore_errors=True)
+            self._clip_dir = None
+    
+    def next_frame(self) -> np.ndarray:
+        """Next frame of the stream, without allocating a new array"""
+        if self.source == "replay":
+            self.open_clip()
+            frame = self._clip[self._frame_index % self.clip_frames]
+        else:
+            frame = self.generate_frame(self._frames[self._frame_index % 2])
+        self._frame_index += 1
+        return frame
+    
+    def motion_score(self, frame: np.ndarray, prev: np.ndarray) -> float:
+        """Mean absolute difference to prev, accumulated over int16 row blocks"""
+        total = 0
+        for r0 in range(0, frame.shape[0], self.MOTION_BLOCK_ROWS):
+            r1 = min(r0 + self.MOTION_BLOCK_ROWS, frame.shape[0])
+            block = self._motion_block[:r1 - r0]
+            np.subtract(frame[r0:r1], prev[r0:r1], out=block, dtype=np.int16)
+            np.abs(block, out=block)
+            total += int(block.sum(dtype=np.int64))
+        return total / frame.size
+    
+    def process_frame(self, frame: np.ndarray) -> tuple:
         """Process a single video frame"""
         # Color correction
-        corrected = frame * 1.2
-        corrected = np.clip(corrected, 0, 255)
+        corrected = self._corrected
+        gain, shift = self._gain
+        np.multiply(frame, gain, out=corrected, dtype=corrected.dtype, casting='unsafe')
+        kernels.descale(corrected, shift)
+        np.minimum(corrected, 255, out=corrected)
         
-        # Edge enhancement
-        laplacian = np.array([[0, -1, 0], [-1, 4, -1], [0, -1, 0]])
+        # Edge enhancement (Laplacian sharpening)
+        sharpened = kernels.correlate(corrected, self._laplacian, out=self._sharpened)
+        sharpened += corrected
+        np.clip(sharpened, 0, 255, out=sharpened)
         
         # Motion blur simulation
-        kernel_size = 5
-        motion_kernel = np.zeros((kernel_size, kernel_size))
-        motion_kernel[kernel_size // 2, :] = 1
-        motion_kernel /= kernel_size
+        blurred = kernels.correlate1d(sharpened, self.MOTION_BLUR, axis=1, out=self._blurred)
         
-        # Frame differencing (for motion detection)
-        diff = np.abs(np.diff(frame, axis=0))
-        motion_score = np.mean(diff)
+        # Frame differencing against the previous frame (None for the first)
+        motion_score = self.motion_score(frame, self._prev) if self._prev is not None else None
+        self._prev = frame
         
-        return corrected, motion_score
+        return blurred, motion_score
     
     def process_video(self, duration_seconds: float = 1.0) -> Dict[str, Any]:
         """Process a video segment"""
         self.processed_videos += 1
         
         num_frames = int(duration_seconds * self.fps)
-        motion_scores = []
+        motion_total, motion_max, scored = 0.0, 0.0, 0
+        alloc_total, alloc_max = 0, 0
         
         for frame_idx in range(num_frames):
-            # Generate frame
-            frame = np.random.randint(0, 256, self.frame_size, dtype=np.uint8)
+            if self.trace_allocations:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
             
-            # Process frame
+            frame = self.next_frame()
             processed_frame, motion_score = self.process_frame(frame)
-            motion_scores.append(motion_score)
+            
+            if self.trace_allocations:
+                # Transient bytes above the pre-frame baseline
+                frame_bytes = tracemalloc.get_traced_memory()[1] - baseline
+                alloc_total += frame_bytes
+                alloc_max = max(alloc_max, frame_bytes)
+            if motion_score is not None:
+                motion_total += motion_score
+                motion_max = max(motion_max, motion_score)
+                scored += 1
         
-        return {
+        result = {
             "video_id": self.processed_videos,
             "frames_processed": num_frames,
-            "avg_motion": float(np.mean(motion_scores)),
-            "max_motion": float(np.max(motion_scores))
+            "avg_motion": motion_total / scored if scored else 0.0,
+            "max_motion": motion_max,
+            "precision": self.precision,
+            "kernel_backend": kernels.BACKEND,
+            "source": self.source
         }
+        if self.trace_allocations:
+            result["alloc_bytes_per_frame"] = alloc_total / num_frames if num_frames else 0.0
+            result["alloc_bytes_max"] = alloc_max
+        return result
     
     def run_continuous(self, duration: float = 60.0):
         """Run continuously for specified duration"""
@@ -83,9 +204,27 @@ class VidPr:
         
         total_time = time.time() - start_time
         print(f"[VidPr] Completed {iterations} iterations in {total_time:.2f}s")
+        if iterations and self.trace_allocations:
+            print(f"[VidPr] Allocated {result['alloc_bytes_per_frame']:.0f} B/frame "
+                  f"(max {result['alloc_bytes_max']} B) in the last segment")
+        self.close()
         return iterations
     
 if __name__ == '__main__':
-    vidproc = VidPr(frame_size=(640, 640, 3), fps=40)
-    vidproc.run_continuous(duration=60)
-    
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Video frame processing benchmark")
+    parser.add_argument("--duration", type=float, default=60.0,
+                        help="Benchmark duration in seconds")
+    parser.add_argument("--precision", default="float32", choices=kernels.PRECISIONS,
+                        help="float32 filters or uint8/int16 fixed-point filters")
+    parser.add_argument("--source", default="generate", choices=VidPr.SOURCES,
+                        help="Generate frames into reused buffers or replay a memory-mapped clip")
+    parser.add_argument("--clip-frames", type=int, default=None,
+                        help="Frames in the replay clip (default: one second)")
+    parser.add_argument("--trace-alloc", action="store_true",
+                        help="Report bytes allocated per frame via tracemalloc")
+    args = parser.parse_args()
+    
+    vidproc = VidPr(frame_size=(640, 640, 3), fps=40, precision=args.precision,
+                    source=args.source, clip_frames=args.clip_frames,
+                    trace_allocations=args.trace_alloc)
+    vidproc.run_continuous(duration=args.duration)
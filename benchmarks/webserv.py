@@ -6,6 +6,29 @@ import base64
 from datetime import datetime
 from typing import Dict, Any
 import sys
+import argparse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+def json_backends() -> Dict[str, tuple]:
+    """(dumps -> str, loads) pairs for every importable JSON library"""
+    encoder = json.JSONEncoder()
+    decoder = json.JSONDecoder()
+    backends = {"stdlib": (encoder.encode, decoder.decode)}
+    if orjson is not None:
+        backends["orjson"] = (lambda obj: orjson.dumps(obj).decode(), orjson.loads)
+    if ujson is not None:
+        backends["ujson"] = (ujson.dumps, ujson.loads)
+    return backends
+
 
 # ============================================================================
 # 1. WebSrv - Web Service (JSON Processing + String Operations)
@@ -13,24 +36,61 @@ import sys
 class WebSrv:
     """Simulates web request processing with JSON parsing and response generation"""
     
-    def __init__(self):
+    # Placeholders spliced out of the pre-encoded request template; neither an
+    # md5 hexdigest nor an ISO timestamp needs JSON escaping
+    _USER_ID_SLOT = "\x00user_id\x00"
+    _TIMESTAMP_SLOT = "\x00timestamp\x00"
+    
+    def __init__(self, json_backend: str = "stdlib", use_templates: bool = True):
+        backends = json_backends()
+        if json_backend not in backends:
+            raise ValueError(f"JSON backend '{json_backend}' is not available, "
+                             f"expected one of {tuple(backends)}")
+        self.json_backend = json_backend
+        self.use_templates = use_templates
+        self._dumps, self._loads = backends[json_backend]
+        self._headers = {f"header_{i}": f"value_{i}" for i in range(20)}
+        self._templates = {}
         self.request_count = 0
     
+    def _template(self, payload_size: int) -> tuple:
+        """Request JSON for payload_size, pre-encoded around the per-request fields"""
+        template = self._templates.get(payload_size)
+        if template is None:
+            encoded = self._dumps({
+                "user_id": self._USER_ID_SLOT,
+                "timestamp": self._TIMESTAMP_SLOT,
+                "payload": "x" * payload_size,
+                "headers": self._headers
+            })
+            slot = self._dumps(self._USER_ID_SLOT)[1:-1]
+            head, rest = encoded.split(slot)
+            slot = self._dumps(self._TIMESTAMP_SLOT)[1:-1]
+            middle, tail = rest.split(slot)
+            template = (head, middle, tail)
+            self._templates[payload_size] = template
+        return template
+    
     def process_request(self, payload_size: int = 1000) -> Dict[str, Any]:
         """Process a simulated HTTP request"""
         self.request_count += 1
-        
-        # Simulate request parsing
-        request_data = {
-            "user_id": hashlib.md5(str(self.request_count).encode()).hexdigest(),
-            "timestamp": datetime.now().isoformat(),
-            "payload": "x" * payload_size,
-            "headers": {f"header_{i}": f"value_{i}" for i in range(20)}
-        }
+        user_id = hashlib.md5(str(self.request_count).encode()).hexdigest()
+        timestamp = datetime.now().isoformat()
         
         # JSON serialization/deserialization
-        json_str = json.dumps(request_data)
-        parsed = json.loads(json_str)
+        if self.use_templates:
+            head, middle, tail = self._template(payload_size)
+            json_str = f"{head}{user_id}{middle}{timestamp}{tail}"
+        else:
+            # Simulate request parsing
+            request_data = {
+                "user_id": user_id,
+                "timestamp": timestamp,
+                "payload": "x" * payload_size,
+                "headers": {f"header_{i}": f"value_{i}" for i in range(20)}
+            }
+            json_str = self._dumps(request_data)
+        parsed = self._loads(json_str)
         
         # String processing
         processed = parsed["payload"].upper()[:100]
@@ -43,25 +103,55 @@ class WebSrv:
             "processed_length": len(processed)
         }
     
-    def run_continuous(self, duration: float = 60.0):
+    def process_batch(self, batch_size: int, payload_size: int = 1000) -> tuple:
+        """Process batch_size requests, returning (responses, per-request latencies in ns)"""
+        responses = []
+        latencies = np.empty(batch_size, dtype=np.int64)
+        for i in range(batch_size):
+            start = time.perf_counter_ns()
+            responses.append(self.process_request(payload_size))
+            latencies[i] = time.perf_counter_ns() - start
+        return responses, latencies
+    
+    def run_continuous(self, duration: float = 60.0, batch_size: int = 100):
         """Run continuously for specified duration"""
-        print(f"[WebSrv] Starting continuous execution for {duration}s")
+        print(f"[WebSrv] Starting continuous execution for {duration}s "
+              f"(json: {self.json_backend}, templates: {self.use_templates}, "
+              f"batch: {batch_size})")
         start_time = time.time()
         iterations = 0
+        batches = []
         
         while time.time() - start_time < duration:
-            result = self.process_request(payload_size=1000)
-            iterations += 1
+            _, latencies = self.process_batch(batch_size, payload_size=1000)
+            batches.append(latencies)
+            iterations += batch_size
             
-            if iterations % 100 == 0:
+            if iterations % 100 < batch_size:
                 elapsed = time.time() - start_time
                 print(f"[WebSrv] Processed {iterations} requests in {elapsed:.2f}s "
                       f"({iterations/elapsed:.2f} req/s)")
         
         total_time = time.time() - start_time
         print(f"[WebSrv] Completed {iterations} iterations in {total_time:.2f}s")
+        if batches:
+            latencies_us = np.concatenate(batches) / 1000.0
+            p50, p99 = np.percentile(latencies_us, [50, 99])
+            print(f"[WebSrv] In-process: {len(latencies_us) / (latencies_us.sum() / 1e6):.2f} req/s, "
+                  f"p50 {p50:.2f} us, p99 {p99:.2f} us")
         return iterations
     
 if __name__ == '__main__':
-    serv = WebSrv()
-    serv.run_continuous(duration=60)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Web request benchmark")
+    parser.add_argument("--json-backend", default="stdlib", choices=tuple(json_backends()),
+                        help="JSON library used for encoding and parsing")
+    parser.add_argument("--no-templates", action="store_true",
+                        help="Rebuild and encode the full request dict on every call")
+    parser.add_argument("--batch-size", type=int, default=100,
+                        help="Requests processed per batch")
+    parser.add_argument("--duration", type=float, default=60.0,
+                        help="Benchmark duration in seconds")
+    args = parser.parse_args()
+    
+    serv = WebSrv(json_backend=args.json_backend, use_templates=not args.no_templates)
+    serv.run_continuous(duration=args.duration, batch_size=args.batch_size)
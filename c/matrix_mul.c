@@ -32,6 +32,74 @@ void multiply(double **A, double **B, double **C, int size)
     return;
 }
 
+/*
+ * Flat row-major kernels exported for the Python benchmarks (ctypes).
+ * Each computes C = A * B for n x n matrices and overwrites C.
+ */
+
+// i-j-k: the inner loop walks B down a column, one cache line per element
+void matmul_naive(const double *A, const double *B, double *C, int n)
+{
+    for (int i = 0; i < n; i++)
+    {
+        for (int j = 0; j < n; j++)
+        {
+            double sum = 0.0;
+            for (int k = 0; k < n; k++)
+            {
+                sum += A[i * n + k] * B[k * n + j];
+            }
+            C[i * n + j] = sum;
+        }
+    }
+}
+
+// i-k-j: the inner loop streams rows of B and C with unit stride
+void matmul_reordered(const double *A, const double *B, double *C, int n)
+{
+    memset(C, 0, (size_t)n * n * sizeof(double));
+    for (int i = 0; i < n; i++)
+    {
+        for (int k = 0; k < n; k++)
+        {
+            double a = A[i * n + k];
+            for (int j = 0; j < n; j++)
+            {
+                C[i * n + j] += a * B[k * n + j];
+            }
+        }
+    }
+}
+
+// i-k-j over block x block tiles so the working tiles of A, B and C stay in cache
+void matmul_blocked(const double *A, const double *B, double *C, int n, int block)
+{
+    memset(C, 0, (size_t)n * n * sizeof(double));
+    for (int ii = 0; ii < n; ii += block)
+    {
+        int i_end = ii + block < n ? ii + block : n;
+        for (int kk = 0; kk < n; kk += block)
+        {
+            int k_end = kk + block < n ? kk + block : n;
+            for (int jj = 0; jj < n; jj += block)
+            {
+                int j_end = jj + block < n ? jj + block : n;
+                for (int i = ii; i < i_end; i++)
+                {
+                    for (int k = kk; k < k_end; k++)
+                    {
+                        double a = A[i * n + k];
+                        for (int j = jj; j < j_end; j++)
+                        {
+                            C[i * n + j] += a * B[k * n + j];
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
+
 int main(int argc, char *argv[])
 {
     double **A, **B, **C;
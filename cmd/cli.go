@@ -14,7 +14,22 @@ func main() {
 	benchmarkFile := flag.String("benchmark-file", "", "Path to the benchmark")
 	procOutputFilePtr := flag.String("proc-output-file", "proc-bench.csv", "Output file for proc metrics.")
 	hardwareOutputFilePtr := flag.String("hardware-output-file", "hw-bench.csv", "Output file for hardware metrics.")
+	daemonPtr := flag.Bool("daemon", false, "Load BPF programs once and serve run requests on -socket.")
+	socketPtr := flag.String("socket", "/run/faas-bench.sock", "Unix socket for daemon mode.")
+	pythonPtr := flag.String("python", "python3", "Python interpreter for daemon mode, a path or a name looked up in PATH.")
 	flag.Parse()
+
+	if *daemonPtr {
+		daemon, err := benchmarks.NewDaemon(*pythonPtr)
+		if err != nil {
+			log.Fatalf("error initializing daemon: %v", err)
+		}
+		if err := daemon.Serve(*socketPtr); err != nil {
+			log.Fatalf("daemon stopped: %v", err)
+		}
+		return
+	}
+
 	runner, err := benchmarks.NewProcBenchmarkRunner(*cgroupPtr, *procOutputFilePtr, *hardwareOutputFilePtr)
 
 	//if err != nil {
@@ -1,6 +1,31 @@
-import pandas as pd
+"""
+Pairwise Mann-Whitney U tests between the latency distributions of each
+benchmark at different CPU frequencies.
+
+Every {benchmark}/{benchmark}{freq}.csv file is parsed once into a numpy
+array; the F x F p-value matrix is then filled from the upper triangle
+(the test is symmetric, the diagonal is trivially p = 1), optionally
+Holm/Bonferroni-corrected per benchmark. Benchmarks run in a process pool.
+Writes a tidy summary CSV and, with matplotlib, one heatmap per benchmark.
+"""
+
+import argparse
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
 from scipy.stats import mannwhitneyu
+from online_stats import LATENCY_COLUMN
+
+try:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+except ImportError:
+    plt = None
+
 directories = [
     "imagepr",
     "linpack",
@@ -10,28 +35,134 @@ directories = [
     "webserv",
     "wordcnt"
 ]
-import csv 
-
-summary_file = open('summary.csv', 'w+')
-
-writer = csv.writer(summary_file)
-
-writer.writerow(['benchmark', 'freq0', 'freq1', 'p-value'])
-
-for dir in directories:
-    benchmark = dir
-    file_paths = []
-    freq = []
-    for file in os.listdir(dir):
-        f = file[:-4][len(benchmark):]
-        print(f)
-        freq.append(f)
-        file_path = os.path.join(dir, file)
-        file_paths.append(file_path)
-    
-    for sfile, sfreq in zip(file_paths, freq):
-        for dfile, dfreq in zip(file_paths, freq):
-            sdf = pd.read_csv(sfile)
-            ddf = pd.read_csv(dfile)
-            u, p = mannwhitneyu(sdf.pid, ddf.pid, alternative='two-sided')
-            writer.writerow([benchmark, sfreq, dfreq, p])
\ No newline at end of file
+
+SUMMARY_COLUMNS = ['benchmark', 'freq0', 'freq1', 'n0', 'n1', 'u', 'p-value', 'p-adjusted', 'significant']
+
+
+def freq_key(freq):
+    """Sort '1.25ghz' after '1ghz' and before '10ghz'"""
+    match = re.search(r"\d+(\.\d+)?", freq)
+    return (float(match.group()) if match else float("inf"), freq)
+
+
+def load_latencies(directory, benchmark):
+    """{freq: latency array} for one benchmark, each file parsed once"""
+    samples = {}
+    for file in os.listdir(directory):
+        if not file.endswith(".csv"):
+            continue
+        freq = file[:-4][len(benchmark):]
+        # Latency is the second field of each row whatever the header says;
+        # the one-field energy rows come back as NaN and are dropped
+        column = pd.read_csv(os.path.join(directory, file), usecols=[LATENCY_COLUMN]).iloc[:, 0]
+        samples[freq] = pd.to_numeric(column, errors="coerce").dropna().to_numpy(dtype=np.float64)
+    return dict(sorted(samples.items(), key=lambda item: freq_key(item[0])))
+
+
+def adjust(p, method):
+    """Family-wise correction of a flat array of p-values"""
+    m = len(p)
+    if method == "none" or m == 0:
+        return p.copy()
+    if method == "bonferroni":
+        return np.minimum(p * m, 1.0)
+    # Holm step-down: scale the k-th smallest by (m - k), keep the result monotone
+    order = np.argsort(p)
+    scaled = np.maximum.accumulate(p[order] * (m - np.arange(m)))
+    adjusted = np.empty_like(p)
+    adjusted[order] = np.minimum(scaled, 1.0)
+    return adjusted
+
+
+def pairwise_mwu(samples, correction="holm"):
+    """U, p and adjusted p matrices over every pair of samples (upper triangle computed)"""
+    arrays = list(samples.values())
+    n = len(arrays)
+    u = np.full((n, n), np.nan)
+    p = np.ones((n, n))
+    rows, cols = np.triu_indices(n, k=1)
+    for i, j in zip(rows, cols):
+        if len(arrays[i]) == 0 or len(arrays[j]) == 0:
+            p[i, j] = np.nan
+            continue
+        u[i, j], p[i, j] = mannwhitneyu(arrays[i], arrays[j], alternative='two-sided')
+        # U of the reversed comparison
+        u[j, i] = len(arrays[i]) * len(arrays[j]) - u[i, j]
+    p[cols, rows] = p[rows, cols]
+
+    p_adj = np.ones((n, n))
+    tested = ~np.isnan(p[rows, cols])
+    flat = np.full(len(rows), np.nan)
+    flat[tested] = adjust(p[rows, cols][tested], correction)
+    p_adj[rows, cols] = flat
+    p_adj[cols, rows] = flat
+    return u, p, p_adj
+
+
+def analyze(benchmark, root=".", correction="holm"):
+    samples = load_latencies(os.path.join(root, benchmark), benchmark)
+    u, p, p_adj = pairwise_mwu(samples, correction)
+    sizes = [len(values) for values in samples.values()]
+    return benchmark, list(samples), sizes, u, p, p_adj
+
+
+def summary_rows(benchmark, freqs, sizes, u, p, p_adj, alpha):
+    rows, cols = np.triu_indices(len(freqs), k=1)
+    for i, j in zip(rows, cols):
+        yield [benchmark, freqs[i], freqs[j], sizes[i], sizes[j], u[i, j], p[i, j], p_adj[i, j],
+               bool(p_adj[i, j] < alpha)]
+
+
+def plot_heatmap(path, benchmark, freqs, p_adj, alpha):
+    fig, ax = plt.subplots(figsize=(1 + 0.5 * len(freqs), 0.5 * len(freqs)))
+    with np.errstate(divide="ignore"):
+        image = ax.imshow(-np.log10(p_adj), cmap="viridis", vmin=0)
+    ax.set_xticks(range(len(freqs)), freqs, rotation=90)
+    ax.set_yticks(range(len(freqs)), freqs)
+    ax.set_title(f"{benchmark}: -log10 adjusted p (alpha {alpha} at {-np.log10(alpha):.1f})")
+    fig.colorbar(image, ax=ax)
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pairwise Mann-Whitney U tests across frequencies")
+    parser.add_argument("benchmarks", nargs="*", default=directories,
+                        help="Benchmark directories, each holding {benchmark}{freq}.csv files")
+    parser.add_argument("--root", default=".", help="Directory containing the benchmark directories")
+    parser.add_argument("--correction", choices=["holm", "bonferroni", "none"], default="holm",
+                        help="Multiple-comparison correction within each benchmark")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Benchmarks analyzed in parallel")
+    parser.add_argument("--output", default="summary.csv")
+    parser.add_argument("--heatmap-dir", default="mwu-heatmaps",
+                        help="Where to save the per-benchmark heatmaps (needs matplotlib)")
+    parser.add_argument("--no-heatmap", action="store_true")
+    args = parser.parse_args()
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        results = list(pool.map(analyze, args.benchmarks, [args.root] * len(args.benchmarks),
+                                [args.correction] * len(args.benchmarks)))
+
+    summary = pd.DataFrame(
+        [row for benchmark, freqs, sizes, u, p, p_adj in results
+         for row in summary_rows(benchmark, freqs, sizes, u, p, p_adj, args.alpha)],
+        columns=SUMMARY_COLUMNS,
+    )
+    summary.to_csv(args.output, index=False)
+    print(f"[MWU] {len(summary)} pairs over {len(results)} benchmarks, "
+          f"{int(summary['significant'].sum())} significant at alpha {args.alpha} -> {args.output}")
+
+    if args.no_heatmap:
+        return
+    if plt is None:
+        print("[MWU] matplotlib is not installed; skipping heatmaps")
+        return
+    os.makedirs(args.heatmap_dir, exist_ok=True)
+    for benchmark, freqs, sizes, u, p, p_adj in results:
+        plot_heatmap(os.path.join(args.heatmap_dir, f"{benchmark}_mwu.png"), benchmark, freqs, p_adj, args.alpha)
+
+
+if __name__ == "__main__":
+    main()
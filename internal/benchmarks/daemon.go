@@ -0,0 +1,409 @@
+package benchmarks
+
+import (
+	"encoding/csv"
+	"encoding/json"
+	"errors"
+	"faas-migration/internal/container"
+	"faas-migration/internal/cpu"
+	"faas-migration/internal/energy"
+	"faas-migration/internal/kernel"
+	"fmt"
+	"io"
+	"log"
+	"net"
+	"os"
+	"os/exec"
+	"os/signal"
+	"strconv"
+	"sync"
+	"syscall"
+	"time"
+
+	"github.com/cilium/ebpf/ringbuf"
+)
+
+// RunRequest describes one benchmark run; the fields mirror the CLI flags.
+type RunRequest struct {
+	CgroupName         string `json:"cgroup_name"`
+	CPUSet             string `json:"cpuset"`
+	CPUFreq            uint64 `json:"cpu_freq"`
+	Memory             string `json:"memory"`
+	BenchmarkFile      string `json:"benchmark_file"`
+	ProcOutputFile     string `json:"proc_output_file"`
+	HardwareOutputFile string `json:"hardware_output_file"`
+}
+
+// RunResponse reports one run back to the client.
+type RunResponse struct {
+	OK        bool   `json:"ok"`
+	Error     string `json:"error,omitempty"`
+	Pid       uint32 `json:"pid"`
+	LatencyNs uint64 `json:"latency_ns"`
+	Energy    uint64 `json:"energy"`
+	ExitCode  int    `json:"exit_code"`
+	// Wall time the daemon spent on the request, run included
+	ElapsedNs int64 `json:"elapsed_ns"`
+}
+
+// How long to wait for the exit event once the benchmark process is reaped
+const eventGracePeriod = time.Second
+
+type daemonCgroup struct {
+	mu         sync.Mutex // One run per cgroup at a time
+	manager    *container.CgroupManager
+	clone3Exec *container.Clone3Executor
+	events     chan kernel.ProcEvent
+}
+
+type daemonOutput struct {
+	mu     sync.Mutex
+	file   *os.File
+	writer *csv.Writer
+}
+
+// Daemon keeps the BPF programs, perf events, cgroups and output files of
+// the proc benchmark open across runs and serves run requests on a Unix socket.
+// Every run is a cold start (a fresh interpreter exec'd into the cgroup): the
+// proc monitor times runs from execve, so benchmarks/benchmark.py's warm
+// zygote starts are not offered here.
+type Daemon struct {
+	frequencyMgr *cpu.CPUFrequencyManager
+	procMonitor  *kernel.ProcRuntimeMonitor
+	hwMonitor    *kernel.HardwareMetricsMonitor
+	msrManager   *energy.MSRManager
+	// Interpreter the benchmarks run under, resolved once at startup
+	python string
+
+	mu      sync.Mutex
+	cgroups map[string]*daemonCgroup
+	byId    map[uint32]*daemonCgroup
+	outputs map[string]*daemonOutput
+}
+
+// NewDaemon sets up the monitors; python is the interpreter to run the
+// benchmarks with, a path or a name looked up in PATH.
+func NewDaemon(python string) (*Daemon, error) {
+	pythonPath, err := exec.LookPath(python)
+	if err != nil {
+		return nil, fmt.Errorf("error while resolving python interpreter %q: %w", python, err)
+	}
+
+	procMonitor, err := kernel.NewProcRuntimeMonitor("")
+	if err != nil {
+		return nil, fmt.Errorf("error while initializing proc runtime monitor: %v", err)
+	}
+
+	hwMonitor, err := kernel.NewHardwareMetricsMonitor("")
+	if err != nil {
+		return nil, fmt.Errorf("error while initializing hardware metrics monitor: %v", err)
+	}
+
+	if err := procMonitor.Attach(); err != nil {
+		return nil, fmt.Errorf("error while attaching proc monitor events: %w", err)
+	}
+
+	if err := hwMonitor.AttachHardwareEvents(); err != nil {
+		return nil, fmt.Errorf("error while attaching hardware monitor events: %w", err)
+	}
+
+	cpuFreqManager, err := cpu.NewCPUFreqManager()
+	if err != nil {
+		log.Printf("warning: could not initialize CPU frequency manager: %v", err)
+	}
+
+	d := &Daemon{
+		frequencyMgr: cpuFreqManager,
+		procMonitor:  procMonitor,
+		hwMonitor:    hwMonitor,
+		msrManager:   energy.NewMSRManager(),
+		python:       pythonPath,
+		cgroups:      make(map[string]*daemonCgroup),
+		byId:         make(map[uint32]*daemonCgroup),
+		outputs:      make(map[string]*daemonOutput),
+	}
+
+	go d.dispatchEvents()
+
+	log.Printf("running benchmarks with %s", pythonPath)
+	return d, nil
+}
+
+// dispatchEvents routes every exit event from the ring buffer to its cgroup.
+func (d *Daemon) dispatchEvents() {
+	for {
+		event, err := d.procMonitor.ReadEvent()
+		if err != nil {
+			if errors.Is(err, ringbuf.ErrClosed) {
+				return
+			}
+			log.Printf("warning: %v", err)
+			continue
+		}
+
+		d.mu.Lock()
+		cg := d.byId[event.CgroupId]
+		d.mu.Unlock()
+		if cg == nil {
+			continue
+		}
+
+		select {
+		case cg.events <- event:
+		default:
+			// Nobody is draining this cgroup; the run that wants an event clears stale ones
+		}
+	}
+}
+
+// cgroup returns the cgroup for name, creating and registering it on first use.
+func (d *Daemon) cgroup(name string) (*daemonCgroup, error) {
+	d.mu.Lock()
+	defer d.mu.Unlock()
+
+	if cg, ok := d.cgroups[name]; ok {
+		return cg, nil
+	}
+
+	cgroupManager, err := container.NewCgroupManager(name)
+	if err != nil {
+		return nil, fmt.Errorf("error while initializing cgroup manager %v", err)
+	}
+
+	clone3Exec, err := container.NewClone3Executor(cgroupManager.CgroupPath)
+	if err != nil {
+		return nil, fmt.Errorf("error while initializing clone3 executor %v", err)
+	}
+
+	cgId := cgroupManager.GetCgroupId()
+	if err := d.procMonitor.UpdateContainerCgroupId(cgId); err != nil {
+		return nil, err
+	}
+	if err := d.hwMonitor.UpdateContainerCgroupId(cgId); err != nil {
+		return nil, err
+	}
+
+	cg := &daemonCgroup{
+		manager:    cgroupManager,
+		clone3Exec: clone3Exec,
+		events:     make(chan kernel.ProcEvent, 16),
+	}
+	d.cgroups[name] = cg
+	d.byId[cgId] = cg
+	return cg, nil
+}
+
+// output returns the cached appender for path, opening it on first use.
+func (d *Daemon) output(path string, header []string) (*daemonOutput, error) {
+	d.mu.Lock()
+	defer d.mu.Unlock()
+
+	if out, ok := d.outputs[path]; ok {
+		return out, nil
+	}
+
+	file, writer, err := kernel.OpenCSV(path, header)
+	if err != nil {
+		return nil, err
+	}
+
+	out := &daemonOutput{file: file, writer: writer}
+	d.outputs[path] = out
+	return out, nil
+}
+
+// Run executes one benchmark like RunProcBenchmark, reusing everything already set up.
+func (d *Daemon) Run(req RunRequest) (RunResponse, error) {
+	start := time.Now()
+
+	currCPU, err := strconv.Atoi(req.CPUSet)
+	if err != nil {
+		return RunResponse{}, fmt.Errorf("invalid CPU set: %w", err)
+	}
+
+	cg, err := d.cgroup(req.CgroupName)
+	if err != nil {
+		return RunResponse{}, err
+	}
+
+	cg.mu.Lock()
+	defer cg.mu.Unlock()
+
+	if err := cg.manager.SetCPUSet(req.CPUSet); err != nil {
+		log.Printf("warning: could not pin cgroup %s: %v", req.CgroupName, err)
+	}
+	if req.Memory != "" {
+		if err := cg.manager.SetMemory(req.Memory); err != nil {
+			log.Printf("warning: could not limit memory of cgroup %s: %v", req.CgroupName, err)
+		}
+	}
+
+	if d.frequencyMgr != nil {
+		if err := d.frequencyMgr.SetFrequency(currCPU, req.CPUFreq); err != nil {
+			return RunResponse{}, fmt.Errorf("failed to set CPU frequency: %w", err)
+		}
+	}
+
+	procOutput, err := d.output(req.ProcOutputFile, kernel.ProcCSVHeader)
+	if err != nil {
+		return RunResponse{}, err
+	}
+	if req.HardwareOutputFile != "" {
+		if _, err := d.output(req.HardwareOutputFile, kernel.HardwareCSVHeader); err != nil {
+			return RunResponse{}, err
+		}
+	}
+
+	// Events from earlier runs in this cgroup are not ours
+	for len(cg.events) > 0 {
+		<-cg.events
+	}
+
+	energy1, err := d.msrManager.ReadCPUCoreEnergy(currCPU)
+	if err != nil {
+		return RunResponse{}, fmt.Errorf("error while reading current energy: %v", err)
+	}
+
+	childPid, err := cg.clone3Exec.StartInCgroup(d.python, req.BenchmarkFile)
+	if err != nil {
+		return RunResponse{}, err
+	}
+	pid := uint32(childPid)
+
+	exited := make(chan syscall.WaitStatus, 1)
+	go func() {
+		var status syscall.WaitStatus
+		syscall.Wait4(childPid, &status, 0, nil)
+		exited <- status
+	}()
+
+	// The benchmark's own exit event; worker processes it forked report too
+	var event kernel.ProcEvent
+	var status syscall.WaitStatus
+	reaped := false
+	var grace <-chan time.Time
+wait:
+	for {
+		select {
+		case event = <-cg.events:
+			if event.Pid == pid {
+				break wait
+			}
+		case status = <-exited:
+			reaped = true
+			grace = time.After(eventGracePeriod)
+		case <-grace:
+			return RunResponse{}, fmt.Errorf("no exit event for PID %d", pid)
+		}
+	}
+	if !reaped {
+		status = <-exited
+	}
+
+	energy2, err := d.msrManager.ReadCPUCoreEnergy(currCPU)
+	if err != nil {
+		return RunResponse{}, fmt.Errorf("error while reading cpu core energy: %v", err)
+	}
+	energyDiff := energy2 - energy1
+
+	procOutput.mu.Lock()
+	kernel.WriteProcEvent(procOutput.writer, event)
+	procOutput.writer.Write([]string{
+		strconv.FormatUint(energyDiff, 10),
+	})
+	procOutput.writer.Flush()
+	procOutput.mu.Unlock()
+
+	return RunResponse{
+		OK:        true,
+		Pid:       pid,
+		LatencyNs: event.Latency,
+		Energy:    energyDiff,
+		ExitCode:  status.ExitStatus(),
+		ElapsedNs: time.Since(start).Nanoseconds(),
+	}, nil
+}
+
+// Serve accepts connections on socketPath, each carrying newline-delimited
+// JSON RunRequests answered in order with RunResponses, until SIGINT/SIGTERM.
+func (d *Daemon) Serve(socketPath string) error {
+	os.Remove(socketPath)
+	listener, err := net.Listen("unix", socketPath)
+	if err != nil {
+		return fmt.Errorf("failed to listen on %s: %w", socketPath, err)
+	}
+
+	// Requests run arbitrary scripts as root: only the invoking user may connect
+	if err := os.Chmod(socketPath, 0600); err != nil {
+		return fmt.Errorf("failed to chmod %s: %w", socketPath, err)
+	}
+	if uid, err := strconv.Atoi(os.Getenv("SUDO_UID")); err == nil {
+		gid, _ := strconv.Atoi(os.Getenv("SUDO_GID"))
+		if err := os.Chown(socketPath, uid, gid); err != nil {
+			return fmt.Errorf("failed to chown %s: %w", socketPath, err)
+		}
+	}
+
+	sig := make(chan os.Signal, 1)
+	signal.Notify(sig, syscall.SIGINT, syscall.SIGTERM)
+	go func() {
+		<-sig
+		listener.Close()
+	}()
+
+	log.Printf("daemon listening on %s", socketPath)
+	for {
+		conn, err := listener.Accept()
+		if err != nil {
+			if errors.Is(err, net.ErrClosed) {
+				os.Remove(socketPath)
+				return d.Close()
+			}
+			return fmt.Errorf("accept: %w", err)
+		}
+		go d.handle(conn)
+	}
+}
+
+func (d *Daemon) handle(conn net.Conn) {
+	defer conn.Close()
+
+	decoder := json.NewDecoder(conn)
+	encoder := json.NewEncoder(conn)
+	for {
+		var req RunRequest
+		if err := decoder.Decode(&req); err != nil {
+			if err != io.EOF {
+				log.Printf("warning: bad request: %v", err)
+			}
+			return
+		}
+
+		resp, err := d.Run(req)
+		if err != nil {
+			resp = RunResponse{Error: err.Error()}
+		}
+		if err := encoder.Encode(resp); err != nil {
+			log.Printf("warning: could not send response: %v", err)
+			return
+		}
+	}
+}
+
+func (d *Daemon) Close() error {
+	d.mu.Lock()
+	defer d.mu.Unlock()
+
+	for _, cg := range d.cgroups {
+		cg.clone3Exec.Close()
+	}
+	for _, out := range d.outputs {
+		out.writer.Flush()
+		out.file.Close()
+	}
+
+	if err := d.hwMonitor.Close(); err != nil {
+		return err
+	}
+	return d.procMonitor.Close()
+}
@@ -78,6 +78,27 @@ func (e *Clone3Executor) CloneIntoCgroup(pythonScript string) uint32 {
 	return uint32(pid)
 }
 
+// StartInCgroup runs pythonScript with the interpreter at python directly
+// inside the cgroup and returns its PID; the caller reaps it. Unlike CloneIntoCgroup it goes through
+// the runtime's fork/exec (clone3 with CLONE_INTO_CGROUP under the hood), so it
+// is safe in a long-lived multithreaded process and reports failures instead
+// of exiting.
+func (e *Clone3Executor) StartInCgroup(python, pythonScript string) (int, error) {
+	argv := []string{"python3", pythonScript}
+	pid, err := syscall.ForkExec(python, argv, &syscall.ProcAttr{
+		Env:   os.Environ(),
+		Files: []uintptr{os.Stdin.Fd(), os.Stdout.Fd(), os.Stderr.Fd()},
+		Sys: &syscall.SysProcAttr{
+			UseCgroupFD: true,
+			CgroupFD:    e.cgroupFd,
+		},
+	})
+	if err != nil {
+		return 0, fmt.Errorf("failed to start %s in cgroup %s: %w", pythonScript, e.cgroupPath, err)
+	}
+	return pid, nil
+}
+
 func (e *Clone3Executor) Close() error {
 	if e.cgroupFd > 0 {
 		return syscall.Close(e.cgroupFd)
@@ -37,44 +37,16 @@ func NewHardwareMetricsMonitor(outputFilePath string) (*HardwareMetricsMonitor,
 		return nil, fmt.Errorf("error while loading hardware objects: %w", err)
 	}
 
-	outputFile, err := os.OpenFile(outputFilePath, os.O_CREATE|os.O_APPEND|os.O_WRONLY, 0644)
-
-	if err != nil {
-		return nil, fmt.Errorf("failed to open output file: %w", err)
-	}
-
-	outputFileWriter := csv.NewWriter(outputFile)
-
-	outputFileInfo, err := os.Stat(outputFilePath)
-	if err != nil {
-		return nil, fmt.Errorf("failed to stat output file: %w", err)
+	// Daemon mode opens output files per run instead
+	var outputFileWriter *csv.Writer
+	if outputFilePath != "" {
+		var err error
+		_, outputFileWriter, err = OpenCSV(outputFilePath, HardwareCSVHeader)
+		if err != nil {
+			return nil, err
+		}
 	}
 
-	if outputFileInfo.Size() == 0 {
-		outputFileWriter.Write([]string{
-			"cycles",
-			"instructions",
-			"ref_cycles",
-			"cache_references",
-			"cache_misses",
-			"branches",
-			"branch_misses",
-			"l1d_loads",
-			"l1d_stores",
-			"llc_loads",
-			"llc_load_misses",
-			"llc_stores",
-			"llc_store_misses",
-			"dtlb_loads",
-			"dtlb_load_misses",
-			"dtlb_stores",
-			"dtlb_store_misses",
-			"bpu_loads",
-			"bpu_load_misses",
-			"energy_uj",
-		})
-		outputFileWriter.Flush()
-	}
 	return &HardwareMetricsMonitor{
 		links:            make([]link.Link, 0),
 		outputFileWriter: outputFileWriter, // Placeholder
@@ -0,0 +1,81 @@
+package kernel
+
+import (
+	"encoding/csv"
+	"fmt"
+	"os"
+)
+
+// ProcCSVHeader is written once to each new proc output file.
+var ProcCSVHeader = []string{
+	"cgroup_id",
+	"pid",
+	"start_timestamp",
+	"end_timestamp",
+	"latency",
+	"cycles",
+	"instructions",
+	"ref_cycles",
+	"cache_references",
+	"cache_misses",
+	"branches",
+	"branch_misses",
+	"l1d_loads",
+	"l1d_stores",
+	"llc_loads",
+	"llc_load_misses",
+	"llc_stores",
+	"llc_store_misses",
+	"dtlb_loads",
+	"dtlb_load_misses",
+	"dtlb_stores",
+	"dtlb_store_misses",
+	"bpu_loads",
+	"bpu_load_misses",
+}
+
+// HardwareCSVHeader is written once to each new hardware output file.
+var HardwareCSVHeader = []string{
+	"cycles",
+	"instructions",
+	"ref_cycles",
+	"cache_references",
+	"cache_misses",
+	"branches",
+	"branch_misses",
+	"l1d_loads",
+	"l1d_stores",
+	"llc_loads",
+	"llc_load_misses",
+	"llc_stores",
+	"llc_store_misses",
+	"dtlb_loads",
+	"dtlb_load_misses",
+	"dtlb_stores",
+	"dtlb_store_misses",
+	"bpu_loads",
+	"bpu_load_misses",
+	"energy_uj",
+}
+
+// OpenCSV opens path for appending and writes header if the file is new.
+func OpenCSV(path string, header []string) (*os.File, *csv.Writer, error) {
+	outputFile, err := os.OpenFile(path, os.O_CREATE|os.O_APPEND|os.O_WRONLY, 0644)
+	if err != nil {
+		return nil, nil, fmt.Errorf("failed to open output file: %w", err)
+	}
+
+	outputFileWriter := csv.NewWriter(outputFile)
+
+	outputFileInfo, err := outputFile.Stat()
+	if err != nil {
+		outputFile.Close()
+		return nil, nil, fmt.Errorf("failed to stat output file: %w", err)
+	}
+
+	if outputFileInfo.Size() == 0 {
+		outputFileWriter.Write(header)
+		outputFileWriter.Flush()
+	}
+	return outputFile, outputFileWriter, nil
+}
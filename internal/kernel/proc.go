@@ -7,7 +7,6 @@ import (
 	"errors"
 	"faas-migration/internal/energy"
 	"fmt"
-	"os"
 	"strconv"
 
 	"github.com/cilium/ebpf"
@@ -36,49 +35,16 @@ func NewProcRuntimeMonitor(outputFilePath string) (*ProcRuntimeMonitor, error) {
 		return nil, fmt.Errorf("failed to load BPF objects: %w", err)
 	}
 
-	outputFile, err := os.OpenFile(outputFilePath, os.O_CREATE|os.O_APPEND|os.O_WRONLY, 0644)
-
-	if err != nil {
-		return nil, fmt.Errorf("failed to open output file: %w", err)
-	}
-
 	msrManager := energy.NewMSRManager()
 
-	outputFileWriter := csv.NewWriter(outputFile)
-
-	outputFileInfo, err := os.Stat(outputFilePath)
-	if err != nil {
-		return nil, fmt.Errorf("failed to stat output file: %w", err)
-	}
-
-	if outputFileInfo.Size() == 0 {
-		outputFileWriter.Write([]string{
-			"cgroup_id",
-			"pid",
-			"start_timestamp",
-			"end_timestamp",
-			"latency",
-			"cycles",
-			"instructions",
-			"ref_cycles",
-			"cache_references",
-			"cache_misses",
-			"branches",
-			"branch_misses",
-			"l1d_loads",
-			"l1d_stores",
-			"llc_loads",
-			"llc_load_misses",
-			"llc_stores",
-			"llc_store_misses",
-			"dtlb_loads",
-			"dtlb_load_misses",
-			"dtlb_stores",
-			"dtlb_store_misses",
-			"bpu_loads",
-			"bpu_load_misses",
-		})
-		outputFileWriter.Flush()
+	// Daemon mode writes each run's events to its own file instead
+	var outputFileWriter *csv.Writer
+	if outputFilePath != "" {
+		var err error
+		_, outputFileWriter, err = OpenCSV(outputFilePath, ProcCSVHeader)
+		if err != nil {
+			return nil, err
+		}
 	}
 
 	return &ProcRuntimeMonitor{
@@ -118,20 +84,40 @@ func (p *ProcRuntimeMonitor) Attach() error {
 }
 
 func (p *ProcRuntimeMonitor) ReadEvents(done chan struct{}) error {
-	record, err := p.reader.Read()
+	event, err := p.ReadEvent()
 	if err != nil {
 		if errors.Is(err, ringbuf.ErrClosed) {
 			return nil
 		}
-		return fmt.Errorf("reading from ringbuf: %w", err)
+		return err
 	}
+
+	WriteProcEvent(p.outputFileWriter, event)
+	close(done)
+	return nil
+}
+
+// ReadEvent blocks until the next process exit event from the ring buffer.
+func (p *ProcRuntimeMonitor) ReadEvent() (ProcEvent, error) {
 	var event ProcEvent
 
+	record, err := p.reader.Read()
+	if err != nil {
+		if errors.Is(err, ringbuf.ErrClosed) {
+			return event, err
+		}
+		return event, fmt.Errorf("reading from ringbuf: %w", err)
+	}
+
 	if err := binary.Read(bytes.NewReader(record.RawSample), binary.LittleEndian, &event); err != nil {
-		return fmt.Errorf("failed to parse event: %v", err)
+		return event, fmt.Errorf("failed to parse event: %v", err)
 	}
+	return event, nil
+}
 
-	p.outputFileWriter.Write([]string{
+// WriteProcEvent appends one event as a CSV row and flushes it.
+func WriteProcEvent(w *csv.Writer, event ProcEvent) {
+	w.Write([]string{
 		strconv.FormatUint(uint64(event.CgroupId), 10),
 		strconv.FormatUint(uint64(event.Latency), 10),
 		strconv.FormatUint(uint64(event.Pid), 10),
@@ -158,9 +144,7 @@ func (p *ProcRuntimeMonitor) ReadEvents(done chan struct{}) error {
 		strconv.FormatUint(event.HwStats.BpuLoadMisses, 10),
 	})
 
-	p.outputFileWriter.Flush()
-	close(done)
-	return nil
+	w.Flush()
 }
 
 func (p *ProcRuntimeMonitor) UpdateContainerCgroupId(cgroupId uint32) error {
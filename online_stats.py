@@ -0,0 +1,300 @@
+"""
+Online statistics for the sweep runners: Welford mean/variance over latencies
+streamed from the CLI's CSV output, a confidence-interval stopping rule
+that ends a config's repetitions once its mean is known precisely enough,
+and mergeable quantile sketches for comparing latency distributions
+(approximate Mann-Whitney U) while a sweep is still running.
+"""
+
+import math
+import os
+import random
+import threading
+from statistics import NormalDist
+
+import numpy as np
+
+try:
+    from scipy.stats import t as student_t
+except ImportError:
+    student_t = None
+
+# The CLI writes latency (ns) second in both its proc and migration CSVs; in
+# the proc CSV that column sits under the "pid" header
+LATENCY_COLUMN = 1
+
+
+class Welford:
+    """Running count, mean and variance in one pass"""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, x: float):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def variance(self) -> float:
+        """Sample variance (n - 1 denominator)"""
+        return self.m2 / (self.n - 1) if self.n > 1 else math.inf
+
+    def ci_halfwidth(self, confidence: float = 0.95) -> float:
+        """Half-width of the confidence interval for the mean"""
+        if self.n < 2:
+            return math.inf
+        q = 0.5 + confidence / 2
+        # Student's t for small samples; the normal quantile when scipy is absent
+        crit = student_t.ppf(q, self.n - 1) if student_t is not None else NormalDist().inv_cdf(q)
+        return crit * math.sqrt(self.variance / self.n)
+
+
+class CsvTail:
+    """Follow a CSV file the CLI appends to, yielding latencies from new complete rows"""
+
+    def __init__(self, path: str, column: int = LATENCY_COLUMN):
+        self.path = path
+        self.column = column
+        self.offset = 0
+
+    def rows(self):
+        """New complete rows, split into fields"""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        # A partly flushed last line is picked up on the next read
+        end = data.rfind(b"\n") + 1
+        self.offset += end
+        return [line.split(",") for line in data[:end].decode().splitlines()]
+
+    def read(self):
+        return row_latencies(self.rows(), self.column)
+
+
+def row_latencies(rows, column: int = LATENCY_COLUMN):
+    """Latencies from CSV rows, skipping the header and rows without the column"""
+    values = []
+    for fields in rows:
+        try:
+            values.append(float(fields[column]))
+        except (IndexError, ValueError):
+            # Header row, energy row or a malformed line
+            continue
+    return values
+
+
+class StopRule:
+    """Stop once the CI width is below ci_target times the mean, or after max_runs runs"""
+
+    def __init__(self, ci_target: float = 0.02, min_runs: int = 5, max_runs: int = 25,
+                 confidence: float = 0.95):
+        self.ci_target = ci_target
+        self.min_runs = min_runs
+        self.max_runs = max_runs
+        self.confidence = confidence
+
+    def relative_width(self, stats: Welford) -> float:
+        if stats.mean == 0:
+            return math.inf
+        return 2 * stats.ci_halfwidth(self.confidence) / abs(stats.mean)
+
+    def done(self, stats: Welford, runs: int) -> bool:
+        """runs counts attempted runs; stats holds the latencies that were recorded"""
+        if runs >= self.max_runs:
+            return True
+        if self.ci_target <= 0 or stats.n < self.min_runs:
+            return False
+        return self.relative_width(stats) < self.ci_target
+
+
+# Sketch size: about 3 * SKETCH_K values are held per sketch, with rank
+# errors around n / SKETCH_K
+SKETCH_K = 1024
+SKETCH_MIN_CAPACITY = 64
+
+
+class QuantileSketch:
+    """Mergeable KLL-style quantile sketch over a stream of values
+
+    Exact (every value kept) until it holds about k values; after that,
+    full levels are compacted by keeping every other sorted value at twice
+    the weight, so memory stays O(k) however many values arrive and rank
+    errors stay around n / k. k=None never compacts.
+
+    A compaction at weight w shifts the rank of every value by 0 or w,
+    with a sign set by its random offset: the rank errors are a sum of
+    independent zero-mean terms whose variance is at most rank_variance
+    (the sum of w**2 over compactions).
+    """
+
+    def __init__(self, k: int = SKETCH_K, seed=None):
+        self.k = k
+        self.n = 0
+        self.rank_variance = 0.0
+        self.levels = [[]]
+        self.rng = random.Random(seed)
+        self._sorted = None
+
+    def capacity(self, level: int) -> int:
+        # Lower levels get geometrically less room than the top one
+        depth = len(self.levels) - level - 1
+        return max(SKETCH_MIN_CAPACITY, int(self.k * (2 / 3) ** depth))
+
+    def update(self, x: float):
+        self.levels[0].append(x)
+        self.n += 1
+        self._sorted = None
+        if self.k is not None and len(self.levels[0]) > self.capacity(0):
+            self._compress()
+
+    def extend(self, values):
+        """update() for each value, compacting between chunks rather than per value"""
+        values = list(values)
+        if self.k is None:
+            chunks = [values]
+        else:
+            step = max(1, self.capacity(0) - len(self.levels[0]))
+            chunks = [values[:step]] + [values[i:i + SKETCH_MIN_CAPACITY]
+                                        for i in range(step, len(values), SKETCH_MIN_CAPACITY)]
+        for chunk in chunks:
+            self.levels[0].extend(chunk)
+            self.n += len(chunk)
+            self._sorted = None
+            if self.k is not None and len(self.levels[0]) > self.capacity(0):
+                self._compress()
+
+    def merge(self, other: "QuantileSketch"):
+        """Fold other into this sketch (e.g. per-worker sketches of one config)"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.n += other.n
+        self.rank_variance += other.rank_variance
+        self._sorted = None
+        if self.k is not None:
+            self._compress()
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self.capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                items = sorted(self.levels[level])
+                # An odd item out stays behind at full weight
+                self.levels[level] = [items.pop()] if len(items) % 2 else []
+                self.levels[level + 1].extend(items[self.rng.randrange(2)::2])
+                self.rank_variance += 4.0 ** level
+            level += 1
+
+    @property
+    def exact(self) -> bool:
+        """True until the first compaction"""
+        return self.rank_variance == 0
+
+    @property
+    def size(self) -> int:
+        """Values actually held"""
+        return sum(len(items) for items in self.levels)
+
+    def weighted(self):
+        """Sorted held values with their weights (cumulative weight sums to n)"""
+        if self._sorted is None:
+            values = np.concatenate([np.asarray(items, dtype=np.float64) for items in self.levels])
+            weights = np.concatenate([np.full(len(items), 2.0 ** level)
+                                      for level, items in enumerate(self.levels)])
+            order = np.argsort(values, kind="stable")
+            self._sorted = values[order], weights[order]
+        return self._sorted
+
+    def rank(self, x):
+        """Weighted count of values below x, ties counting half; x may be an array"""
+        values, weights = self.weighted()
+        cumulative = np.concatenate([[0.0], np.cumsum(weights)])
+        below = cumulative[np.searchsorted(values, x, side="left")]
+        at_or_below = cumulative[np.searchsorted(values, x, side="right")]
+        return (below + at_or_below) / 2
+
+    def quantile(self, q: float) -> float:
+        values, weights = self.weighted()
+        if len(values) == 0:
+            return math.nan
+        cumulative = np.cumsum(weights)
+        return float(values[min(np.searchsorted(cumulative, q * cumulative[-1]), len(values) - 1)])
+
+
+def mann_whitney(a: QuantileSketch, b: QuantileSketch):
+    """Two-sided Mann-Whitney U test of a against b from their sketches
+
+    U counts the pairs where a's value is larger (ties half). While both
+    sketches are exact, U is exact and p is the usual normal approximation
+    (continuity correction, no tie correction). Once either has compacted,
+    the sketched U differs from the true U by a zero-mean error with SD at
+    most u_error = sqrt(n_a**2 * rank_variance(b) + n_b**2 * rank_variance(a)),
+    which is added to the null variance. p then stays a valid (conservative)
+    p-value, but it no longer equals the exact test's, and with millions of
+    samples it can only flag differences in p_superiority = U / (n_a * n_b)
+    of a few u_error / (n_a * n_b).
+    Returns (u, p, p_superiority, u_error).
+    """
+    if a.n == 0 or b.n == 0:
+        return math.nan, math.nan, math.nan, math.nan
+    values, weights = a.weighted()
+    u = float(np.dot(weights, b.rank(values)))
+    n1, n2 = a.n, b.n
+    u_error = math.sqrt(n1 ** 2 * b.rank_variance + n2 ** 2 * a.rank_variance)
+    mean = n1 * n2 / 2
+    sd = math.sqrt(n1 * n2 * (n1 + n2 + 1) / 12 + u_error ** 2)
+    z = (abs(u - mean) - 0.5) / sd if sd > 0 else 0.0
+    p = min(1.0, 2 * (1 - NormalDist().cdf(max(z, 0.0))))
+    return u, p, u / (n1 * n2), u_error
+
+
+class StreamingComparator:
+    """Latency sketches per (benchmark, frequency), compared as rows arrive
+
+    Shared by the sweep's worker threads, hence the lock.
+    """
+
+    def __init__(self, k: int = SKETCH_K):
+        self.k = k
+        self.lock = threading.Lock()
+        self.sketches = {}
+
+    def update(self, key, latencies):
+        with self.lock:
+            sketch = self.sketches.get(key)
+            if sketch is None:
+                sketch = self.sketches[key] = QuantileSketch(self.k)
+            sketch.extend(latencies)
+
+    def compare(self, key_a, key_b) -> dict:
+        with self.lock:
+            a, b = self.sketches.get(key_a), self.sketches.get(key_b)
+            if a is None or b is None:
+                return None
+            u, p, superiority, u_error = mann_whitney(a, b)
+            return {
+                "n_a": a.n,
+                "n_b": b.n,
+                "median_a": a.quantile(0.5),
+                "median_b": b.quantile(0.5),
+                "u": u,
+                "u_error": u_error,
+                "exact": a.exact and b.exact,
+                "p": p,
+                "p_superiority": superiority,
+            }
+
+    def neighbours(self, key):
+        """Keys of the same benchmark (first element) at other frequencies, nearest first"""
+        with self.lock:
+            others = [other for other in self.sketches if other[0] == key[0] and other != key]
+        return sorted(others, key=lambda other: abs(other[1] - key[1]))
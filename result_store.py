@@ -0,0 +1,252 @@
+"""
+Columnar result store for the sweeps.
+
+Every run's rows are appended, tagged with their config (benchmark,
+frequency, cpuset, run id), to one Parquet dataset per kind of CLI output,
+Hive-partitioned by benchmark and frequency. Reads take column lists and
+filters that pyarrow pushes down to the partition directories and row
+groups, so e.g. all cnnserv LLC misses at 3 GHz is a single read:
+
+    store = ResultStore()
+    store.read("proc", columns=["run_id", "llc_load_misses"],
+               benchmark="cnnserv", freq_khz=ghz_to_khz(3.0))
+
+`python result_store.py import` loads the existing CSV trees (bench/,
+process/, hardware/, latency-stats/, cache-stats/) into the store.
+"""
+
+import argparse
+import csv
+import os
+import re
+import shutil
+import uuid
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+    ds = None
+
+STORE_PATH = "results"
+
+COUNTER_COLUMNS = [
+    "cycles",
+    "instructions",
+    "ref_cycles",
+    "cache_references",
+    "cache_misses",
+    "branches",
+    "branch_misses",
+    "l1d_loads",
+    "l1d_stores",
+    "llc_loads",
+    "llc_load_misses",
+    "llc_stores",
+    "llc_store_misses",
+    "dtlb_loads",
+    "dtlb_load_misses",
+    "dtlb_stores",
+    "dtlb_store_misses",
+    "bpu_loads",
+    "bpu_load_misses",
+]
+
+# Column order of the rows the CLI writes, which is not always its header's:
+# proc rows put latency second, and each is followed by a one-field energy row
+METRIC_COLUMNS = {
+    "proc": ["cgroup_id", "latency", "pid", "start_timestamp", "end_timestamp",
+             *COUNTER_COLUMNS, "energy_uj"],
+    "hardware": [*COUNTER_COLUMNS, "energy_uj"],
+    "migration": ["cgroup_id", "latency", "pid", "source_cpu", "target_cpu"],
+    "llc": ["cgroup_id", "pid", "cpu",
+            "read_hits", "read_misses", "read_references",
+            "write_hits", "write_misses", "write_references",
+            "prefetch_hits", "prefetch_misses", "prefetch_references",
+            "total_hits", "total_misses", "total_references"],
+}
+
+# Which kind each CSV tree holds and how its file names encode the config;
+# run_bench.py names files by GHz despite the "khz" suffix
+CSV_TREES = {
+    "bench": ("proc", re.compile(r"(?P<benchmark>[a-z]+)lat(?P<ghz>[\d.]+)ghz\.csv")),
+    "process": ("proc", re.compile(r"(?P<benchmark>\w+?)_(?P<ghz>[\d.]+)khz\.csv")),
+    "hardware": ("hardware", re.compile(r"(?P<benchmark>\w+?)_(?P<ghz>[\d.]+)khz\.csv")),
+    "latency-stats": ("migration", re.compile(r"(?P<benchmark>\w+?)_f(?P<khz>\d+)_(?P<new_khz>\d+)_latency\.csv")),
+    "cache-stats": ("llc", re.compile(r"(?P<benchmark>\w+?)_f(?P<khz>\d+)_(?P<new_khz>\d+)\.csv")),
+}
+
+
+def ghz_to_khz(ghz):
+    """The CLI takes frequencies in kHz"""
+    return int(round(float(ghz) * 1000000))
+
+
+def _schema(kind):
+    return pa.schema(
+        [("benchmark", pa.string()), ("freq_khz", pa.int64()), ("new_freq_khz", pa.int64()),
+         ("cpuset", pa.string()), ("run_id", pa.int64()), ("source", pa.string())]
+        + [(column, pa.uint64()) for column in METRIC_COLUMNS[kind]]
+    )
+
+
+def _partitioning():
+    return ds.partitioning(pa.schema([("benchmark", pa.string()), ("freq_khz", pa.int64())]),
+                           flavor="hive")
+
+
+def parse_rows(kind, rows):
+    """Turn raw CSV rows (lists of fields) into metric records, dropping headers"""
+    columns = METRIC_COLUMNS[kind]
+    records = []
+    for fields in rows:
+        if not fields or not fields[0].isdigit():
+            # Header row or a blank line
+            continue
+        if kind == "proc" and len(fields) == 1:
+            # Energy of the event row before it
+            if records and records[-1]["energy_uj"] is None:
+                records[-1]["energy_uj"] = int(fields[0])
+            continue
+        record = dict.fromkeys(columns)
+        # Older proc files stop after end_timestamp; the counters stay null
+        record.update(zip(columns, map(int, fields)))
+        records.append(record)
+    return records
+
+
+class ResultStore:
+    """Partitioned Parquet datasets under root, one per kind of output"""
+
+    def __init__(self, root=STORE_PATH):
+        if pa is None:
+            raise ImportError("the result store needs pyarrow (pip install pyarrow)")
+        self.root = root
+
+    def path(self, kind):
+        return os.path.join(self.root, kind)
+
+    def append(self, kind, records, benchmark, freq_khz, new_freq_khz=None, cpuset=None,
+               run_id=None, source=None):
+        """Append records from one run (or one imported file) as a new fragment
+
+        run_id may be a list giving each record its own run.
+        """
+        if not records:
+            return 0
+        run_ids = run_id if isinstance(run_id, list) else [run_id] * len(records)
+        config = {
+            "benchmark": [benchmark] * len(records),
+            "freq_khz": [freq_khz] * len(records),
+            "new_freq_khz": [new_freq_khz] * len(records),
+            "cpuset": [None if cpuset is None else str(cpuset)] * len(records),
+            "run_id": run_ids,
+            "source": [source] * len(records),
+        }
+        metrics = {column: [record[column] for record in records] for column in METRIC_COLUMNS[kind]}
+        table = pa.Table.from_pydict({**config, **metrics}, schema=_schema(kind))
+        # A unique basename per call makes each write a new file, so appends
+        # from concurrent workers never collide
+        ds.write_dataset(table, self.path(kind), format="parquet", partitioning=_partitioning(),
+                         basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+                         existing_data_behavior="overwrite_or_ignore")
+        return len(records)
+
+    def dataset(self, kind):
+        return ds.dataset(self.path(kind), format="parquet", schema=_schema(kind),
+                          partitioning=_partitioning())
+
+    def read(self, kind, columns=None, filter=None, **equals):
+        """Read a kind as a pyarrow Table, e.g. read("proc", ["latency"], benchmark="cnnserv")
+
+        Keyword arguments are equality filters ANDed with filter; both are
+        pushed down, so only matching partitions and row groups are scanned.
+        """
+        if not os.path.isdir(self.path(kind)):
+            table = _schema(kind).empty_table()
+            return table if columns is None else table.select(columns)
+        for column, value in equals.items():
+            condition = ds.field(column) == value
+            filter = condition if filter is None else filter & condition
+        return self.dataset(kind).to_table(columns=columns, filter=filter)
+
+    def compact(self, kind):
+        """Rewrite a kind with one file per partition instead of one per append"""
+        if not os.path.isdir(self.path(kind)):
+            return
+        table = self.dataset(kind).to_table()
+        staging = self.path(kind) + ".compact"
+        shutil.rmtree(staging, ignore_errors=True)
+        ds.write_dataset(table, staging, format="parquet", partitioning=_partitioning(),
+                         basename_template="part-{i}.parquet")
+        shutil.rmtree(self.path(kind))
+        os.rename(staging, self.path(kind))
+
+
+def read_csv_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.reader(f))
+
+
+def import_tree(store, tree, directory=None):
+    """Import every CSV in one of the CSV_TREES; returns the number of records stored"""
+    kind, pattern = CSV_TREES[tree]
+    directory = directory or tree
+    total = 0
+    for name in sorted(os.listdir(directory)):
+        match = pattern.fullmatch(name)
+        if match is None:
+            print(f"[import] skipping {os.path.join(directory, name)}: unrecognised name")
+            continue
+        config = match.groupdict()
+        freq_khz = ghz_to_khz(config["ghz"]) if "ghz" in config else int(config["khz"])
+        new_freq_khz = int(config["new_khz"]) if "new_khz" in config else None
+        path = os.path.join(directory, name)
+        records = parse_rows(kind, read_csv_rows(path))
+        # Each proc row is one run, in order; the sampled kinds can't be split by run
+        run_id = list(range(1, len(records) + 1)) if kind == "proc" else None
+        total += store.append(kind, records, config["benchmark"], freq_khz, new_freq_khz,
+                              run_id=run_id, source=path)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parquet result store for the sweeps")
+    parser.add_argument("--store", default=STORE_PATH, help="Root directory of the store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="Load existing CSV trees into the store")
+    importer.add_argument("trees", nargs="*", default=list(CSV_TREES),
+                          help=f"Trees to import (default: those present of {', '.join(CSV_TREES)})")
+
+    compact = commands.add_parser("compact", help="Merge appended fragments, one file per partition")
+    compact.add_argument("kinds", nargs="*", default=list(METRIC_COLUMNS))
+
+    query = commands.add_parser("query", help="Print matching rows")
+    query.add_argument("kind", choices=list(METRIC_COLUMNS))
+    query.add_argument("--benchmark")
+    query.add_argument("--freq-ghz", type=float)
+    query.add_argument("--columns", nargs="+")
+    args = parser.parse_args()
+
+    store = ResultStore(args.store)
+    if args.command == "import":
+        for tree in args.trees:
+            if not os.path.isdir(tree):
+                continue
+            print(f"[import] {tree}: {import_tree(store, tree)} records")
+    elif args.command == "compact":
+        for kind in args.kinds:
+            store.compact(kind)
+    else:
+        equals = {}
+        if args.benchmark:
+            equals["benchmark"] = args.benchmark
+        if args.freq_ghz:
+            equals["freq_khz"] = ghz_to_khz(args.freq_ghz)
+        print(store.read(args.kind, columns=args.columns, **equals).to_pandas().to_string())
+
+
+if __name__ == "__main__":
+    main()
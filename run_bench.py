@@ -1,20 +1,33 @@
 import subprocess
 import os
 import sys
+import time
+import queue
+import sqlite3
+import argparse
+import threading
+import traceback
+from bench_client import DEFAULT_SOCKET, BenchClient, DaemonError, start_daemon, stop_daemon
+from online_stats import SKETCH_K, CsvTail, StopRule, StreamingComparator, Welford, row_latencies
+from result_store import STORE_PATH, ResultStore, ghz_to_khz, parse_rows
 
 # --- Configuration ---
-# The base command to be executed
 
-
-# The number of times to run the command
+# The most times each (benchmark, frequency) config is run; configs stop
+# earlier once the confidence interval of their mean latency is narrow enough
 NUM_RUNS = 25
+MIN_RUNS = 5
+CI_TARGET = 0.02
+
+# Durable job journal; an interrupted sweep resumes from it
+JOURNAL_PATH = "sweep.db"
 
-# --- Helper Function to Execute Command ---
 benchmarks = [
     "cnnserv",
     "imagepr",
     "linpack",
     "lrserv",
+    "matmul",
     "mlinf",
     "rnnserv",
     "thumbnail",
@@ -24,13 +37,8 @@ benchmarks = [
     "wordcnt",
     "compression",
     "graphproc",
-    "thumbnail",
 ]
 
-"""
-
-"""
-
 frequencies = [
     1.0,
     1.25,
@@ -51,82 +59,406 @@ frequencies = [
     5.00,
 ]
 
+CPU_SYSFS = "/sys/devices/system/cpu"
+
+
+def _read_sysfs(path, default=None):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+
+def measurement_cpus(allowed):
+    """One CPU per independent frequency domain and physical core, grouped by socket
+
+    The CLI sets the frequency of the CPU it runs on, so two jobs sharing a
+    cpufreq policy or SMT siblings would perturb each other. With per-CPU
+    policies (e.g. intel_pstate) siblings have separate policies, so both
+    are checked.
+    """
+    sockets, domains, cores = {}, set(), set()
+    for cpu in sorted(allowed):
+        base = os.path.join(CPU_SYSFS, f"cpu{cpu}")
+        socket = _read_sysfs(os.path.join(base, "topology/physical_package_id"), "0")
+        domain = _read_sysfs(os.path.join(base, "cpufreq/related_cpus"), str(cpu))
+        core = _read_sysfs(os.path.join(base, "topology/core_id"), str(cpu))
+        if (socket, domain) in domains or (socket, core) in cores:
+            continue
+        domains.add((socket, domain))
+        cores.add((socket, core))
+        sockets.setdefault(socket, []).append(cpu)
+    return sockets
+
+
+def parse_cpus(spec):
+    """'0,2-5' -> {0, 2, 3, 4, 5}"""
+    cpus = set()
+    for part in spec.split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.update(range(int(first), int(last) + 1))
+        elif part:
+            cpus.add(int(part))
+    return cpus
+
+
+class Journal:
+    """SQLite job journal shared by the worker threads; one row per run"""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " bench TEXT, freq REAL, run INTEGER,"
+            " status TEXT NOT NULL DEFAULT 'pending',"
+            " cpu INTEGER, returncode INTEGER, started REAL, finished REAL, stderr TEXT,"
+            " PRIMARY KEY (bench, freq, run))"
+        )
+        # Runs cut off by an interruption never finished writing their results
+        self.db.execute("UPDATE jobs SET status = 'pending' WHERE status = 'running'")
+        self.db.commit()
+
+    def add(self, configs, num_runs):
+        """Register every run of every config; already journaled runs are kept as they are"""
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO jobs (bench, freq, run) VALUES (?, ?, ?)",
+                [(bench, freq, run) for bench, freq in configs for run in range(1, num_runs + 1)],
+            )
+            self.db.commit()
+
+    def retry_failed(self):
+        with self.lock:
+            self.db.execute("UPDATE jobs SET status = 'pending' WHERE status = 'failed'")
+            self.db.commit()
+
+    def pending(self, bench, freq):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT run FROM jobs WHERE bench = ? AND freq = ? AND status = 'pending' ORDER BY run",
+                (bench, freq),
+            ).fetchall()
+        return [run for (run,) in rows]
+
+    def start(self, bench, freq, run, cpu):
+        with self.lock:
+            self.db.execute(
+                "UPDATE jobs SET status = 'running', cpu = ?, started = ? "
+                "WHERE bench = ? AND freq = ? AND run = ?",
+                (cpu, time.time(), bench, freq, run),
+            )
+            self.db.commit()
+
+    def finish(self, bench, freq, run, returncode, stderr=None):
+        with self.lock:
+            self.db.execute(
+                "UPDATE jobs SET status = ?, returncode = ?, finished = ?, stderr = ? "
+                "WHERE bench = ? AND freq = ? AND run = ?",
+                ("done" if returncode == 0 else "failed", returncode, time.time(), stderr,
+                 bench, freq, run),
+            )
+            self.db.commit()
+
+    def skip(self, bench, freq):
+        """Mark a converged config's remaining runs as not needed"""
+        with self.lock:
+            self.db.execute(
+                "UPDATE jobs SET status = 'skipped' WHERE bench = ? AND freq = ? AND status = 'pending'",
+                (bench, freq),
+            )
+            self.db.commit()
+
+    def counts(self):
+        with self.lock:
+            return dict(self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+
+
+def proc_output_file(bench, freqKHz):
+    return f"process/{bench}_{freqKHz}khz.csv"
+
+
+def run_settings(bench, freqKHz, cpu):
+    """Per-run CLI settings, shared by daemon requests and one-shot commands"""
+    return {
+        # One cgroup per core, so concurrent configs never share one
+        "cgroup_name": f"{bench}-bench-cpu{cpu}",
+        "cpuset": str(cpu),
+        "cpu_freq": int(freqKHz*1000000),
+        "memory": "256M",
+        "benchmark_file": f"serverless-benchmarks/{bench}.py",
+        "proc_output_file": proc_output_file(bench, freqKHz),
+        "hardware_output_file": f"hardware/{bench}_{freqKHz}khz.csv",
+    }
+
+
+def run_command(bench, run_number, freqKHz, cpu, client=None):
+    """
+    Executes one run pinned to cpu and returns (returncode, stderr).
+
+    With a daemon client the run is a request to the long-lived CLI;
+    otherwise a fresh `sudo ./bin/cli` is spawned for it.
+    """
+    settings = run_settings(bench, freqKHz, cpu)
+    print(f"--- Starting {bench} @ {freqKHz} GHz, run {run_number}/{NUM_RUNS} on CPU {cpu} ---")
+
+    if client is not None:
+        try:
+            response = client.run(**settings)
+        except DaemonError as e:
+            print(f"\n!!! ERROR: {bench} @ {freqKHz} GHz run {run_number} failed: {e} !!!", file=sys.stderr)
+            return 1, str(e)
+        if response["exit_code"] != 0:
+            print(
+                f"\n!!! ERROR: {bench} @ {freqKHz} GHz run {run_number} exited with code {response['exit_code']} !!!",
+                file=sys.stderr,
+            )
+            return response["exit_code"], None
+        overhead = response["elapsed_ns"] - response["latency_ns"]
+        print(f"{bench} @ {freqKHz} GHz run {run_number} successful "
+              f"({response['latency_ns'] / 1e9:.3f}s, harness overhead {overhead / 1e6:.1f}ms).")
+        return 0, None
 
-def run_command(bench, run_number, freqKHz):
     BASE_COMMAND = [
         f"sudo",
         f"./bin/cli",
-        f"-cgroup-name={bench}-bench",
+        f"-cgroup-name={settings['cgroup_name']}",
         f"-curr-cpuset",
-        "0",
+        settings["cpuset"],
         f"-curr-cpu-freq",
-        f"{int(freqKHz*1000000)}",
+        str(settings["cpu_freq"]),
         f"-memory",
-        "256M",
+        settings["memory"],
         f"-benchmark-file",
-        f"serverless-benchmarks/{bench}.py",
+        settings["benchmark_file"],
         f"-proc-output-file",
-        f"process/{bench}_{freqKHz}khz.csv",
+        settings["proc_output_file"],
         f"-hardware-output-file",
-        f"hardware/{bench}_{freqKHz}khz.csv",
+        settings["hardware_output_file"],
     ]
-    """
-    Executes the command and handles the output.
-    """
-    print(f"--- Starting Run {run_number}/{NUM_RUNS} ---")
 
-    # We use subprocess.run for simplicity, capturing output and checking for errors
     try:
-        # NOTE: We set check=True to raise an error if the command fails (returns non-zero exit code).
-        # shell=False is generally safer as it avoids shell injection issues.
-        result = subprocess.run(
-            BASE_COMMAND, check=True, text=True, capture_output=True
-        )
-
-        print(f"Run {run_number} successful.")
-        # You can uncomment the lines below if you want to see the command output for debugging
-        # print("Stdout:")
-        # print(result.stdout)
-        # print("Stderr:")
-        # print(result.stderr)
+        # NOTE: check=True raises if the command returns a non-zero exit code.
+        subprocess.run(BASE_COMMAND, check=True, text=True, capture_output=True)
+        print(f"{bench} @ {freqKHz} GHz run {run_number} successful.")
+        return 0, None
 
     except subprocess.CalledProcessError as e:
-        # This block catches errors if the command returns a non-zero exit code
         print(
-            f"\n!!! ERROR: Run {run_number} failed with exit code {e.returncode} !!!",
+            f"\n!!! ERROR: {bench} @ {freqKHz} GHz run {run_number} failed with exit code {e.returncode} !!!",
             file=sys.stderr,
         )
         print("Stderr Output:", e.stderr, file=sys.stderr)
-        # Decide whether to continue or stop on error
-        # sys.exit(1) # Uncomment this to stop the script immediately on the first error
+        return e.returncode, e.stderr
     except FileNotFoundError:
         print(
             f"\n!!! ERROR: Command or script not found. Make sure './bin/cli' exists and is executable.",
             file=sys.stderr,
         )
-        sys.exit(1)
+        raise
+
+
+def store_run(store, bench, freq, cpu, run, proc_rows, hardware_rows):
+    """Append the rows one run added to its CSVs to the result store
+
+    The CSVs are the source of truth, so a failed append is reported and the
+    sweep goes on; `result_store.py import` can rebuild the store later.
+    """
+    config = dict(benchmark=bench, freq_khz=ghz_to_khz(freq), cpuset=cpu, run_id=run)
+    try:
+        store.append("proc", parse_rows("proc", proc_rows), source=proc_output_file(bench, freq), **config)
+        store.append("hardware", parse_rows("hardware", hardware_rows),
+                     source=run_settings(bench, freq, cpu)["hardware_output_file"], **config)
     except Exception as e:
-        print(
-            f"\n!!! An unexpected error occurred during Run {run_number}: {e} !!!",
-            file=sys.stderr,
-        )
-        # sys.exit(1) # Uncomment this to stop the script immediately on the first unexpected error
+        print(f"Could not store {bench} @ {freq} GHz run {run} as Parquet: {e!r}", file=sys.stderr)
 
 
-# --- Main Execution Loop ---
+def report_comparison(comparator, bench, freq):
+    """Compare a finished config's latencies with the nearest frequency seen so far"""
+    neighbours = comparator.neighbours((bench, freq))
+    if not neighbours:
+        return
+    other = neighbours[0][1]
+    result = comparator.compare((bench, freq), (bench, other))
+    if not result["n_a"] or not result["n_b"]:
+        return
+    if result["exact"]:
+        test = f"Mann-Whitney p {result['p']:.3g}"
+    else:
+        # Sketched U: p allows for the sketch error and is not the exact test's p-value
+        margin = result["u_error"] / (result["n_a"] * result["n_b"])
+        test = f"sketch-adjusted p {result['p']:.3g} (P(slower) error SD {margin:.4f})"
+    print(f"{bench} @ {freq} GHz vs {other} GHz: median {result['median_a'] / 1e9:.4f}s vs "
+          f"{result['median_b'] / 1e9:.4f}s, P(slower) {result['p_superiority']:.2f}, "
+          f"{test} (n={result['n_a']}/{result['n_b']})")
+
+
+def worker(cpu, configs, journal, stop, rule, daemon_socket=None, store=None, comparator=None):
+    """Run whole configs on one CPU; runs of a config share output files, so they stay serial"""
+    client = BenchClient(daemon_socket) if daemon_socket else None
+    try:
+        run_configs(cpu, configs, journal, stop, rule, client, store, comparator)
+    finally:
+        if client is not None:
+            client.close()
+
+
+def run_configs(cpu, configs, journal, stop, rule, client, store=None, comparator=None):
+    while not stop.is_set():
+        try:
+            bench, freq = configs.get_nowait()
+        except queue.Empty:
+            return
+        proc_rows = CsvTail(proc_output_file(bench, freq))
+        hardware_rows = CsvTail(run_settings(bench, freq, cpu)["hardware_output_file"])
+        stats = Welford()
+        # Rows of earlier runs (e.g. before an interruption) are already in the files
+        latencies = proc_rows.read()
+        for latency in latencies:
+            stats.update(latency)
+        if comparator is not None:
+            comparator.update((bench, freq), latencies)
+        hardware_rows.rows()
+        pending = journal.pending(bench, freq)
+        runs = rule.max_runs - len(pending)
+        for run in pending:
+            if stop.is_set():
+                return
+            if rule.done(stats, runs):
+                journal.skip(bench, freq)
+                print(f"{bench} @ {freq} GHz converged after {stats.n} runs: "
+                      f"mean {stats.mean / 1e9:.4f}s, CI width {rule.relative_width(stats):.2%}")
+                break
+            journal.start(bench, freq, run, cpu)
+            try:
+                returncode, stderr = run_command(bench=bench, run_number=run, freqKHz=freq, cpu=cpu,
+                                                 client=client)
+            except OSError as e:
+                # ./bin/cli is missing or the daemon went away: nothing else can run either
+                journal.finish(bench, freq, run, -1, str(e))
+                stop.set()
+                return
+            except Exception:
+                # E.g. a malformed daemon reply: fail this run and leave the rest of the
+                # config pending rather than dying with the job stuck in 'running'
+                print(f"\n!!! ERROR: {bench} @ {freq} GHz run {run} raised !!!", file=sys.stderr)
+                journal.finish(bench, freq, run, -1, traceback.format_exc())
+                traceback.print_exc()
+                if client is not None:
+                    # The connection may be out of step with the daemon's replies
+                    client.close()
+                break
+            journal.finish(bench, freq, run, returncode, stderr)
+            runs += 1
+            # Whatever this run appended to the CLI's CSVs belongs to it
+            new_rows = proc_rows.rows()
+            latencies = row_latencies(new_rows)
+            for latency in latencies:
+                stats.update(latency)
+            if comparator is not None:
+                comparator.update((bench, freq), latencies)
+            if store is not None and returncode == 0:
+                store_run(store, bench, freq, cpu, run, new_rows, hardware_rows.rows())
+        if comparator is not None:
+            report_comparison(comparator, bench, freq)
+
+
+# --- Main Execution ---
 
 
 def main():
+    global NUM_RUNS
+    parser = argparse.ArgumentParser(description="Resumable benchmark x frequency sweep")
+    parser.add_argument("--journal", default=JOURNAL_PATH, help="SQLite job journal")
+    parser.add_argument("--runs", type=int, default=NUM_RUNS, help="Most runs per config")
+    parser.add_argument("--min-runs", type=int, default=MIN_RUNS,
+                        help="Runs per config before the stopping rule applies")
+    parser.add_argument("--ci-target", type=float, default=CI_TARGET,
+                        help="Stop a config once its CI width is below this fraction of "
+                             "the mean latency (0 = always run --runs)")
+    parser.add_argument("--confidence", type=float, default=0.95, help="CI confidence level")
+    parser.add_argument("--benchmarks", nargs="+", default=benchmarks)
+    parser.add_argument("--frequencies", type=float, nargs="+", default=frequencies,
+                        help="Frequencies in GHz")
+    parser.add_argument("--cpus", default=None,
+                        help="CPUs jobs may use, e.g. '1-7' (default: this process's affinity)")
+    parser.add_argument("--per-socket", type=int, default=1,
+                        help="Concurrent jobs per socket, each on its own core")
+    parser.add_argument("--retry-failed", action="store_true", help="Re-run failed runs")
+    parser.add_argument("--no-daemon", action="store_true",
+                        help="Spawn ./bin/cli for every run instead of one long-lived daemon")
+    parser.add_argument("--daemon-socket", default=DEFAULT_SOCKET, help="Unix socket of the CLI daemon")
+    parser.add_argument("--attach", action="store_true",
+                        help="Use an already running daemon instead of starting one")
+    parser.add_argument("--store", default=STORE_PATH, help="Parquet result store the runs are appended to")
+    parser.add_argument("--no-store", action="store_true", help="Only write the CLI's CSV files")
+    parser.add_argument("--sketch-k", type=int, default=SKETCH_K,
+                        help="Size of the per-config latency sketches compared as configs finish "
+                             "(0 = keep every latency, -1 = no comparison)")
+    args = parser.parse_args()
+    NUM_RUNS = args.runs
+
+    # dict.fromkeys drops duplicate entries but keeps the order
+    configs = [(bench, freq) for bench in dict.fromkeys(args.benchmarks)
+               for freq in dict.fromkeys(args.frequencies)]
+    rule = StopRule(args.ci_target, args.min_runs, args.runs, args.confidence)
+    journal = Journal(args.journal)
+    journal.add(configs, args.runs)
+    if args.retry_failed:
+        journal.retry_failed()
+
+    allowed = parse_cpus(args.cpus) if args.cpus else os.sched_getaffinity(0)
+    sockets = measurement_cpus(allowed)
+    cpus = [cpu for socket_cpus in sockets.values() for cpu in socket_cpus[:args.per_socket]]
+
+    work = queue.Queue()
+    for config in configs:
+        if journal.pending(*config):
+            work.put(config)
+    print(f"{work.qsize()} configs to run ({journal.counts()}) on CPUs {cpus}")
+
+    # One daemon keeps the BPF programs and cgroups loaded for the whole sweep
+    daemon = None
+    daemon_socket = None if args.no_daemon else args.daemon_socket
+    if daemon_socket and not args.attach and not work.empty():
+        daemon = start_daemon(socket_path=daemon_socket)
+
+    store = None
+    if not args.no_store:
+        try:
+            store = ResultStore(args.store)
+        except ImportError as e:
+            print(f"Not storing results as Parquet: {e}", file=sys.stderr)
+
+    comparator = None
+    if args.sketch_k >= 0:
+        comparator = StreamingComparator(args.sketch_k or None)
+
+    stop = threading.Event()
+    threads = [threading.Thread(target=worker,
+                                args=(cpu, work, journal, stop, rule, daemon_socket, store, comparator),
+                                daemon=True)
+               for cpu in cpus]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=1.0)
+    except KeyboardInterrupt:
+        # In-flight runs stay 'running' and are redone on the next start
+        print("\nInterrupted; rerun to resume from the journal.", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        if daemon is not None:
+            stop_daemon(daemon)
 
-    for bench in benchmarks:
-        for freq in frequencies:
-            for i in range(1, NUM_RUNS + 1):
-                run_command(bench=bench, run_number=i, freqKHz=freq)
     print("-" * 50)
-    print(f"Execution complete. Command was run {NUM_RUNS} times.")
+    print(f"Sweep complete: {journal.counts()}")
 
 
 if __name__ == "__main__":
     # Ensure the script is run from the directory containing ./bin/cli if paths are relative
-    # print(f"Current working directory: {os.getcwd()}")
     main()
@@ -1,7 +1,10 @@
-import subprocess
+import asyncio
+import datetime
 import os
 import itertools
+import signal
 import time
+from online_stats import CsvTail, StopRule, Welford
 
 # --- CONFIGURATION VARIABLES ---
 
@@ -14,6 +17,7 @@ BENCHMARK_FILES = [
     "benchmarks/imagepr.py",
     "benchmarks/linpack.py",
     "benchmarks/lrserv.py",
+    "benchmarks/matmul.py",
     "benchmarks/rnnserv.py",
     "benchmarks/vidpr.py",
     "benchmarks/webserv.py",
@@ -35,8 +39,24 @@ CORE_MIGRATIONS = [
     ("0", "1"),
 ]
 
-# Number of times to repeat the entire configuration loop
+# Most times each configuration is run; a configuration stops early once
+# the CI width of its mean latency is below CI_TARGET times the mean
 RUNS_PER_CONFIG = 100
+MIN_RUNS_PER_CONFIG = 5
+CI_TARGET = 0.02
+
+# Wall-clock budget (seconds) for one run of the Go runner, benchmark included;
+# a run over budget gets SIGTERM, then SIGKILL after KILL_GRACE_SECONDS
+DEFAULT_RUN_TIMEOUT = 300
+RUN_TIMEOUTS = {
+    "cnnserv": 600,
+    "rnnserv": 600,
+    "vidpr": 600,
+    "linpack": 900,
+}
+KILL_GRACE_SECONDS = 10
+# A configuration is abandoned after this many timed-out runs in a row
+MAX_CONSECUTIVE_TIMEOUTS = 3
 
 # Static Cgroup Parameters (usually don't change per run)
 CGROUP_MEMORY_LIMIT = "256M"
@@ -45,18 +65,119 @@ LATENCY_OUTPUT_DIR = "latency-stats"
 CACHE_OUTPUT_DIR = "cache-stats"
 # --- EXECUTION LOGIC ---
 
-def run_single_benchmark(config_id, run_num, benchmark_file, old_freq, new_freq, old_cpuset, new_cpuset):
-    """Constructs and executes the Go command for a single test run."""
-    
-    # Generate unique names for output and cgroup
-    timestamp = int(time.time())
-    
-    # Naming convention: {benchmark_name}_{config_id}_{run_num}.csv
+def latency_output_file(benchmark_file, old_freq, new_freq):
+    # Naming convention: {benchmark_name}_f{old_freq}_{new_freq}_latency.csv
+    benchmark_name = os.path.basename(benchmark_file).split('.')[0]
+    return os.path.join(LATENCY_OUTPUT_DIR, f"{benchmark_name}_f{old_freq}_{new_freq}_latency.csv")
+
+
+class Progress:
+    """Run counts, throughput and ETA for the sweep"""
+
+    def __init__(self, total_configs):
+        self.total_configs = total_configs
+        self.start = time.monotonic()
+        self.runs_done = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.configs_done = 0
+        self.runs_in_done_configs = 0
+
+    def config_finished(self, runs):
+        self.configs_done += 1
+        self.runs_in_done_configs += runs
+
+    def runs_left(self, current_runs):
+        # Configurations stop early, so expect as many runs as finished ones took
+        if self.configs_done:
+            per_config = self.runs_in_done_configs / self.configs_done
+        else:
+            per_config = RUNS_PER_CONFIG
+        left = (self.total_configs - self.configs_done) * per_config - current_runs
+        return max(left, 0)
+
+    def report(self, current_runs):
+        elapsed = time.monotonic() - self.start
+        rate = self.runs_done / elapsed if elapsed > 0 else 0.0
+        if rate > 0:
+            # timedelta keeps the days a multi-day sweep's ETA would otherwise wrap over
+            eta_text = str(datetime.timedelta(seconds=int(self.runs_left(current_runs) / rate)))
+        else:
+            eta_text = "unknown"
+        print(f"Progress: {self.configs_done}/{self.total_configs} configs, {self.runs_done} runs "
+              f"({self.failed} failed, {self.timed_out} timed out), "
+              f"{rate * 60:.1f} runs/min, ETA {eta_text}")
+
+
+def run_timeout(benchmark_file):
     benchmark_name = os.path.basename(benchmark_file).split('.')[0]
-    latency_output_filename = os.path.join(
-        LATENCY_OUTPUT_DIR, 
-        f"{benchmark_name}_f{old_freq}_{new_freq}_latency.csv"
+    return RUN_TIMEOUTS.get(benchmark_name, DEFAULT_RUN_TIMEOUT)
+
+
+async def stream_output(stream, prefix):
+    """Print the child's output as it arrives instead of after it exits"""
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        print(f"{prefix}{line.decode(errors='replace').rstrip()}", flush=True)
+
+
+def signal_group(pgid, sig):
+    try:
+        os.killpg(pgid, sig)
+    except ProcessLookupError:
+        pass
+
+
+async def terminate(proc):
+    """SIGTERM the runner's process group, escalating to SIGKILL after KILL_GRACE_SECONDS"""
+    # The runner leads its own session and the benchmark it clones shares its
+    # process group, so signalling the group reaches both
+    signal_group(proc.pid, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(proc.wait(), KILL_GRACE_SECONDS)
+    except asyncio.TimeoutError:
+        pass
+    # The benchmark may outlive a runner that exited on SIGTERM
+    signal_group(proc.pid, signal.SIGKILL)
+    await proc.wait()
+
+
+async def run_command(command, timeout, prefix):
+    """Run command with a wall-clock budget; returns (returncode, timed_out)"""
+    proc = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        start_new_session=True,
     )
+    reader = asyncio.create_task(stream_output(proc.stdout, prefix))
+    timed_out = False
+    try:
+        await asyncio.wait_for(proc.wait(), timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        await terminate(proc)
+    except asyncio.CancelledError:
+        await terminate(proc)
+        raise
+    try:
+        await asyncio.wait_for(reader, KILL_GRACE_SECONDS)
+    except asyncio.TimeoutError:
+        # Something outside the process group still holds the pipe open
+        pass
+    return proc.returncode, timed_out
+
+
+async def run_single_benchmark(config_id, run_num, benchmark_file, old_freq, new_freq, old_cpuset, new_cpuset):
+    """Constructs and executes the Go command for a single test run.
+
+    Returns "success", "failed" or "timeout".
+    """
+
+    benchmark_name = os.path.basename(benchmark_file).split('.')[0]
+    latency_output_filename = latency_output_file(benchmark_file, old_freq, new_freq)
 
     cache_stats_output_filename = os.path.join(
         CACHE_OUTPUT_DIR,
@@ -76,33 +197,27 @@ def run_single_benchmark(config_id, run_num, benchmark_file, old_freq, new_freq,
         f"-benchmark-file={benchmark_file}",
         f"-new-cpuset={new_cpuset}",
         f"-latency-output-file={latency_output_filename}",
-        f"-cache-stats-output-file={cache_stats_output_filename}"
+        f"-cache-stats-output-file={cache_stats_output_filename}",
         f"-old-cpu-freq={old_freq}",
         f"-new-cpu-freq={new_freq}",
     ]
 
+    timeout = run_timeout(benchmark_file)
     print(f"\n--- Running Config {config_id} (Run {run_num}/{RUNS_PER_CONFIG}) ---")
     print(f"Command: {' '.join(command)}")
-    
-    try:
-        # Execute the command
-        # check=True will raise an exception if the Go program returns a non-zero exit code
-        result = subprocess.run(command, check=True, capture_output=True, text=True)
-        print(f"Status: SUCCESS. Output saved to {latency_output_filename}")
-        print(f"Status: SUCCESS. Output saved to {cache_stats_output_filename}")
-        # Optional: Print Go program's output/errors
-        if result.stdout:
-             print(f"Go Output: {result.stdout.strip()}")
-
-    except subprocess.CalledProcessError as e:
-        print(f"Status: FAILED. Go program returned error code {e.returncode}")
-        print(f"Go Stderr: {e.stderr.strip()}")
-    except FileNotFoundError:
-        print(f"Status: FATAL ERROR. Go executable not found at {GO_BENCHMARK_RUNNER}. Have you compiled it?")
-    except Exception as e:
-        print(f"Status: FATAL ERROR. An unexpected error occurred: {e}")
 
-def main():
+    returncode, timed_out = await run_command(command, timeout, f"[{benchmark_name}] ")
+    if timed_out:
+        print(f"Status: TIMEOUT. Killed after {timeout}s")
+        return "timeout"
+    if returncode != 0:
+        print(f"Status: FAILED. Go program returned error code {returncode}")
+        return "failed"
+    print(f"Status: SUCCESS. Output saved to {latency_output_filename}")
+    print(f"Status: SUCCESS. Output saved to {cache_stats_output_filename}")
+    return "success"
+
+async def run_sweep():
     # Ensure the output directory exists
     os.makedirs(LATENCY_OUTPUT_DIR, exist_ok=True)
     os.makedirs(CACHE_OUTPUT_DIR, exist_ok=True)
@@ -116,29 +231,65 @@ def main():
     total_configs = len(configurations)
     total_runs = total_configs * RUNS_PER_CONFIG
     
-    print(f"Orchestrator starting {total_runs} total runs across {total_configs} unique configurations.")
+    print(f"Orchestrator starting up to {total_runs} total runs across {total_configs} unique configurations.")
 
+    rule = StopRule(CI_TARGET, MIN_RUNS_PER_CONFIG, RUNS_PER_CONFIG)
+    progress = Progress(total_configs)
     config_id = 0
     for benchmark_file, freq_pair, core_pair in configurations:
         config_id += 1
         old_freq, new_freq = freq_pair
         old_cpuset, new_cpuset = core_pair
+
+        # Stream the latencies each run appends; rows already in the file count too
+        latencies = CsvTail(latency_output_file(benchmark_file, old_freq, new_freq))
+        stats = Welford()
+        consecutive_timeouts = 0
+        runs = 0
         
-        # Loop for the required number of repetitions
+        # Repeat until the mean latency is pinned down or the run cap is hit
         for run_num in range(1, RUNS_PER_CONFIG + 1):
-            run_single_benchmark(
-                config_id, 
-                run_num, 
-                benchmark_file, 
-                old_freq, 
-                new_freq, 
-                old_cpuset, 
-                new_cpuset
-            )
+            for latency in latencies.read():
+                stats.update(latency)
+            if rule.done(stats, run_num - 1):
+                print(f"Config {config_id} converged after {stats.n} samples: mean {stats.mean:.0f} ns, "
+                      f"CI width {rule.relative_width(stats):.2%}")
+                break
+            try:
+                status = await run_single_benchmark(
+                    config_id, 
+                    run_num, 
+                    benchmark_file, 
+                    old_freq, 
+                    new_freq, 
+                    old_cpuset, 
+                    new_cpuset
+                )
+            except FileNotFoundError:
+                print(f"Status: FATAL ERROR. Go executable not found at {GO_BENCHMARK_RUNNER}. Have you compiled it?")
+                return
+            runs += 1
+            progress.runs_done += 1
+            if status == "failed":
+                progress.failed += 1
+            if status == "timeout":
+                progress.timed_out += 1
+                consecutive_timeouts += 1
+            else:
+                consecutive_timeouts = 0
+            progress.report(runs)
+            if consecutive_timeouts >= MAX_CONSECUTIVE_TIMEOUTS:
+                print(f"Config {config_id} abandoned after {consecutive_timeouts} timeouts in a row")
+                break
             # Optional: Add a small delay between runs to let the system cool down/settle
-            # time.sleep(1)
+            # await asyncio.sleep(1)
+        progress.config_finished(runs)
 
-    print("\n\n--- ALL BENCHMARK RUNS COMPLETE ---")
+    print(f"\n\n--- ALL BENCHMARK RUNS COMPLETE ({progress.runs_done} of at most {total_runs} runs, "
+          f"{progress.timed_out} timed out) ---")
+
+def main():
+    asyncio.run(run_sweep())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import json
+import resource
+import sys
+import time
+import traceback
+from typing import Dict, Any
+
+
+def _json_default(obj):
+    """Serialize numpy scalars/arrays and other stragglers json can't handle"""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    return str(obj)
+
+
+def reset_peak_rss():
+    """Reset the kernel's resident-set high-water mark for this process"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def read_peak_rss_mb() -> float:
+    """Peak RSS in MB since the last reset_peak_rss() call"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    # ru_maxrss is in KB on Linux and cannot be reset
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class BenchmarkCase:
+    """Base class for serverless benchmarks: setup, timed run, teardown
+
+    Subclasses implement run() and store measurements with record(). Each
+    repetition starts from an empty self.results, and execute() collects them
+    into one report that main() prints as a single JSON object on stdout.
+    Progress output therefore belongs on stderr.
+    """
+
+    name = "benchmark"
+
+    def __init__(self):
+        self.results = {}
+
+    def setup(self):
+        """Prepare inputs; timed separately from run()"""
+
+    def run(self):
+        """One measured repetition of the workload"""
+        raise NotImplementedError
+
+    def teardown(self):
+        """Release resources acquired in setup()"""
+
+    def record(self, label: str, elapsed_ns: int, **metrics):
+        """Store one timed measurement of the current repetition under label"""
+        self.results[label] = {"elapsed_ns": int(elapsed_ns), **metrics}
+
+    def execute(self, warmup: int = 0, repeats: int = 1) -> Dict[str, Any]:
+        """Run setup, warmup and measured repetitions, then teardown"""
+        report = {
+            "benchmark": self.name,
+            "status": "ok",
+            "warmup": warmup,
+            "repeats": repeats,
+            "setup_ns": None,
+            "teardown_ns": None,
+            "runs": [],
+        }
+
+        try:
+            start = time.perf_counter_ns()
+            self.setup()
+            report["setup_ns"] = time.perf_counter_ns() - start
+
+            for _ in range(warmup):
+                self.results = {}
+                self.run()
+
+            for _ in range(repeats):
+                self.results = {}
+                start = time.perf_counter_ns()
+                self.run()
+                elapsed = time.perf_counter_ns() - start
+                report["runs"].append({"run_ns": elapsed, "results": self.results})
+        except Exception as e:
+            report["status"] = "error"
+            report["error"] = f"{type(e).__name__}: {e}"
+            traceback.print_exc(file=sys.stderr)
+        finally:
+            start = time.perf_counter_ns()
+            try:
+                self.teardown()
+            except Exception as e:
+                report["status"] = "error"
+                report.setdefault("error", f"teardown: {type(e).__name__}: {e}")
+                traceback.print_exc(file=sys.stderr)
+            report["teardown_ns"] = time.perf_counter_ns() - start
+
+        return report
+
+    @staticmethod
+    def argument_parser(description: str) -> argparse.ArgumentParser:
+        """Parser with the --warmup/--repeats options every benchmark accepts"""
+        parser = argparse.ArgumentParser(description=description)
+        parser.add_argument("--warmup", type=int, default=0,
+                            help="Unmeasured repetitions run after setup")
+        parser.add_argument("--repeats", type=int, default=1,
+                            help="Measured repetitions")
+        return parser
+
+    def main(self, args: argparse.Namespace) -> int:
+        """Execute, print the JSON report and return a process exit code"""
+        report = self.execute(warmup=args.warmup, repeats=args.repeats)
+        print(json.dumps(report, default=_json_default), flush=True)
+        return 0 if report["status"] == "ok" else 1
@@ -4,84 +4,292 @@ import json
 import hashlib
 from datetime import datetime
 from typing import Dict, Any
+import sys
+from numpy.lib.stride_tricks import sliding_window_view
+from benchmark_case import BenchmarkCase, read_peak_rss_mb, reset_peak_rss
 
 
-class CnnSrv:
+class CnnSrv(BenchmarkCase):
     """Simulates CNN inference with convolutional operations"""
 
-    def __init__(self, input_size: tuple = (224, 224, 3)):
+    name = "cnnserv"
+
+    CONV_BACKENDS = ("loop", "im2col", "einsum")
+    MODES = ("warm", "cold")
+
+    # (name, num_filters, kernel_size, pool_size) of each Conv + ReLU + MaxPool block
+    LAYERS = (("layer1", 32, 3, 2), ("layer2", 64, 3, 2))
+    NUM_CLASSES = 10
+
+    # Upper bound for one im2col patch block; keeps the patch matrix out of
+    # the working set when running under a small memory.max
+    IM2COL_BLOCK_BYTES = 16 * 1024 * 1024
+
+    def __init__(
+        self,
+        input_size: tuple = (224, 224, 3),
+        conv_backend: str = "im2col",
+        mode: str = "warm",
+    ):
+        if conv_backend not in self.CONV_BACKENDS:
+            raise ValueError(
+                f"Unknown conv backend '{conv_backend}', "
+                f"expected one of {self.CONV_BACKENDS}"
+            )
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown mode '{mode}', expected one of {self.MODES}")
+        super().__init__()
         self.input_size = input_size
+        self.conv_backend = conv_backend
+        self.mode = mode
         self.inference_count = 0
+        self.rng = np.random.default_rng()
+        self.weights = {}
+        self._arena = {}
+
+    def setup(self):
+        """Build the model and activation arena (the warm-start state)"""
+        self.reset()
+
+    def reset(self):
+        """Drop the model and arena and build them again, as a cold start would"""
+        self._arena = {}
+        self.weights = self.build_weights()
+        self.build_arena()
+
+    def build_weights(self) -> Dict[str, np.ndarray]:
+        """Draw the conv filters and classifier matrix for the configured input"""
+        weights = {}
+        h, w, c = self.input_size
+        for name, num_filters, kernel_size, pool_size in self.LAYERS:
+            weights[name] = (
+                self.rng.standard_normal((num_filters, kernel_size, kernel_size, c))
+                * 0.01
+            )
+            h = (h - kernel_size + 1) // pool_size
+            w = (w - kernel_size + 1) // pool_size
+            c = num_filters
+        weights["fc"] = self.rng.standard_normal((self.NUM_CLASSES, h * w * c))
+        return weights
+
+    def build_arena(self):
+        """Size every activation slot up front so inference never allocates"""
+        self._buffer("input", self.input_size, np.float32)
+        h, w, c = self.input_size
+        for name, num_filters, kernel_size, pool_size in self.LAYERS:
+            output_h, output_w = h - kernel_size + 1, w - kernel_size + 1
+            block_rows = self._im2col_block_rows(output_h, output_w, kernel_size, c)
+            self._buffer("im2col", (block_rows, output_w, kernel_size, kernel_size, c))
+            self._buffer("conv", (output_h, output_w, num_filters))
+            h, w, c = output_h // pool_size, output_w // pool_size, num_filters
+            self._buffer(f"{name}.pool", (h, w, c))
+
+    def _buffer(self, name: str, shape: tuple, dtype=np.float64) -> np.ndarray:
+        """Return a view of the named arena slot, growing the slot only when too small"""
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        slot = self._arena.get(name)
+        if slot is None or slot.nbytes < nbytes:
+            slot = np.empty(nbytes, dtype=np.uint8)
+            self._arena[name] = slot
+        return slot[:nbytes].view(dtype).reshape(shape)
+
+    def _im2col_block_rows(
+        self, output_h: int, output_w: int, kernel_size: int, c: int, itemsize: int = 8
+    ) -> int:
+        """Output rows per im2col block under IM2COL_BLOCK_BYTES"""
+        row_bytes = output_w * kernel_size * kernel_size * c * itemsize
+        return max(1, min(output_h, self.IM2COL_BLOCK_BYTES // row_bytes))
 
     def conv2d(
-        self, input_data: np.ndarray, num_filters: int, kernel_size: int
+        self, input_data: np.ndarray, filters: np.ndarray, out: np.ndarray = None
     ) -> np.ndarray:
         """Simulate 2D convolution"""
-        h, w, c = input_data.shape
-        output_h = h - kernel_size + 1
-        output_w = w - kernel_size + 1
+        h, w, _ = input_data.shape
+        num_filters, kernel_size = filters.shape[0], filters.shape[1]
+        if out is None:
+            out = np.empty((h - kernel_size + 1, w - kernel_size + 1, num_filters))
+
+        if self.conv_backend == "im2col":
+            return self._conv2d_im2col(input_data, filters, out)
+        if self.conv_backend == "einsum":
+            return self._conv2d_einsum(input_data, filters, out)
+        return self._conv2d_loop(input_data, filters, out)
 
-        filters = np.random.randn(num_filters, kernel_size, kernel_size, c) * 0.01
-        output = np.zeros((output_h, output_w, num_filters))
+    def _conv2d_loop(
+        self, input_data: np.ndarray, filters: np.ndarray, out: np.ndarray
+    ) -> np.ndarray:
+        """Reference convolution: one np.sum per output pixel"""
+        num_filters, kernel_size = filters.shape[0], filters.shape[1]
+        output_h, output_w = out.shape[0], out.shape[1]
 
         for f in range(num_filters):
             for i in range(output_h):
                 for j in range(output_w):
                     region = input_data[i : i + kernel_size, j : j + kernel_size, :]
-                    output[i, j, f] = np.sum(region * filters[f])
+                    out[i, j, f] = np.sum(region * filters[f])
+
+        return out
+
+    def _conv2d_im2col(
+        self, input_data: np.ndarray, filters: np.ndarray, out: np.ndarray
+    ) -> np.ndarray:
+        """Convolution as a GEMM over row blocks of an im2col patch matrix"""
+        num_filters, kernel_size = filters.shape[0], filters.shape[1]
+        c = input_data.shape[2]
+        output_h, output_w = out.shape[0], out.shape[1]
+        weights = filters.reshape(num_filters, -1).T
 
-        return output
+        block_rows = self._im2col_block_rows(
+            output_h, output_w, kernel_size, c, filters.itemsize
+        )
+        # Patch layout (rows, ow, kh, kw, c) matches the (f, kh, kw, c) filter layout
+        patches = self._buffer(
+            "im2col",
+            (block_rows, output_w, kernel_size, kernel_size, c),
+            filters.dtype,
+        )
 
-    def relu(self, x: np.ndarray) -> np.ndarray:
-        """ReLU activation"""
-        return np.maximum(0, x)
+        for r0 in range(0, output_h, block_rows):
+            rows = min(block_rows, output_h - r0)
+            block = patches[:rows]
+            for di in range(kernel_size):
+                for dj in range(kernel_size):
+                    block[:, :, di, dj, :] = input_data[
+                        r0 + di : r0 + di + rows, dj : dj + output_w, :
+                    ]
+            np.matmul(
+                block.reshape(rows * output_w, -1),
+                weights,
+                out=out[r0 : r0 + rows].reshape(rows * output_w, num_filters),
+            )
+
+        return out
+
+    def _conv2d_einsum(
+        self, input_data: np.ndarray, filters: np.ndarray, out: np.ndarray
+    ) -> np.ndarray:
+        """Convolution as an einsum contraction over a strided window view"""
+        kernel_size = filters.shape[1]
+        # View shape: (oh, ow, c, kh, kw), no copy
+        windows = sliding_window_view(
+            input_data, (kernel_size, kernel_size), axis=(0, 1)
+        )
+        return np.einsum("hwcij,fijc->hwf", windows, filters, optimize=True, out=out)
 
-    def max_pool(self, input_data: np.ndarray, pool_size: int = 2) -> np.ndarray:
-        """Max pooling operation"""
+    def relu(self, x: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """ReLU activation (in place when out is x)"""
+        return np.maximum(x, 0, out=out)
+
+    def max_pool(
+        self, input_data: np.ndarray, pool_size: int = 2, out: np.ndarray = None
+    ) -> np.ndarray:
+        """Max pooling as a single reduction over a (oh, p, ow, p, c) reshape"""
         h, w, c = input_data.shape
         output_h = h // pool_size
         output_w = w // pool_size
-        output = np.zeros((output_h, output_w, c))
-
-        for i in range(output_h):
-            for j in range(output_w):
-                for k in range(c):
-                    region = input_data[
-                        i * pool_size : (i + 1) * pool_size,
-                        j * pool_size : (j + 1) * pool_size,
-                        k,
-                    ]
-                    output[i, j, k] = np.max(region)
 
-        return output
+        # Odd trailing rows/cols are dropped, as with floor-division pooling
+        cropped = input_data[: output_h * pool_size, : output_w * pool_size, :]
+        blocks = cropped.reshape(output_h, pool_size, output_w, pool_size, c)
+        return blocks.max(axis=(1, 3), out=out)
+
+    def conv_relu_pool(
+        self,
+        input_data: np.ndarray,
+        name: str,
+        pool_size: int,
+        layer_times: Dict[str, float],
+    ) -> np.ndarray:
+        """Fused Conv + ReLU + MaxPool layer writing into arena buffers"""
+        filters = self.weights[name]
+        num_filters, kernel_size = filters.shape[0], filters.shape[1]
+        h, w, _ = input_data.shape
+        conv_shape = (h - kernel_size + 1, w - kernel_size + 1, num_filters)
+        pool_shape = (
+            conv_shape[0] // pool_size,
+            conv_shape[1] // pool_size,
+            num_filters,
+        )
+
+        # The conv activation is dead once pooled, so every layer shares one slot
+        conv_out = self._buffer("conv", conv_shape)
+        pool_out = self._buffer(f"{name}.pool", pool_shape)
+
+        start = time.perf_counter()
+        self.conv2d(input_data, filters, out=conv_out)
+        layer_times[f"{name}.conv"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.relu(conv_out, out=conv_out)
+        layer_times[f"{name}.relu"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.max_pool(conv_out, pool_size, out=pool_out)
+        layer_times[f"{name}.pool"] = time.perf_counter() - start
+
+        return pool_out
 
     def inference(self) -> Dict[str, Any]:
         """Run CNN inference"""
         self.inference_count += 1
+        layer_times = {}
+        reset_peak_rss()
 
-        input_img = np.random.randn(*self.input_size).astype(np.float32)
+        # Cold mode pays for weight generation and arena allocation every call
+        if self.mode == "cold":
+            start = time.perf_counter()
+            self.reset()
+            layer_times["init"] = time.perf_counter() - start
 
-        conv1 = self.conv2d(input_img, num_filters=32, kernel_size=3)
-        relu1 = self.relu(conv1)
-        pool1 = self.max_pool(relu1, pool_size=2)
+        input_img = self._buffer("input", self.input_size, np.float32)
+        self.rng.standard_normal(out=input_img, dtype=np.float32)
 
-        conv2 = self.conv2d(pool1, num_filters=64, kernel_size=3)
-        relu2 = self.relu(conv2)
-        pool2 = self.max_pool(relu2, pool_size=2)
+        activation = input_img
+        for name, _, _, pool_size in self.LAYERS:
+            activation = self.conv_relu_pool(activation, name, pool_size, layer_times)
 
-        flattened = pool2.flatten()
-        logits = np.dot(np.random.randn(10, len(flattened)), flattened)
+        start = time.perf_counter()
+        logits = self.weights["fc"] @ activation.ravel()
         prediction = np.argmax(logits)
+        layer_times["fc"] = time.perf_counter() - start
 
         return {
             "inference_id": self.inference_count,
             "input_shape": self.input_size,
-            "final_shape": pool2.shape,
+            "final_shape": activation.shape,
             "prediction": int(prediction),
             "confidence": float(np.max(np.exp(logits) / np.sum(np.exp(logits)))),
+            "conv_backend": self.conv_backend,
+            "mode": self.mode,
+            "layer_times": layer_times,
+            "peak_rss_mb": read_peak_rss_mb(),
         }
 
+    def run(self):
+        """Time one inference"""
+        start = time.perf_counter_ns()
+        result = self.inference()
+        self.record("inference", time.perf_counter_ns() - start, **result)
+
 
 if __name__ == "__main__":
-    cnn = CnnSrv(input_size=(448, 448, 3))
-    result = cnn.inference()
+    parser = BenchmarkCase.argument_parser("CNN inference benchmark")
+    parser.add_argument(
+        "--conv-backend",
+        default="im2col",
+        choices=CnnSrv.CONV_BACKENDS,
+        help="Convolution implementation to benchmark",
+    )
+    parser.add_argument(
+        "--mode",
+        default="warm",
+        choices=CnnSrv.MODES,
+        help="'cold' regenerates weights and buffers on every inference",
+    )
+    args = parser.parse_args()
+
+    cnn = CnnSrv(
+        input_size=(448, 448, 3), conv_backend=args.conv_backend, mode=args.mode
+    )
+    sys.exit(cnn.main(args))
@@ -1,28 +1,92 @@
-import numpy as np 
-import time 
+import numpy as np
+import time
+import bz2
 import gzip
+import lzma
+import zlib
 import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+from benchmark_case import BenchmarkCase
 
-class CompressionBenchmark:
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+
+def codecs() -> Dict[str, tuple]:
+    """(compress(data, level), decompress, (fast, default, max) levels) per available codec"""
+    available = {
+        "zlib": (zlib.compress, zlib.decompress, (1, 6, 9)),
+        "gzip": (lambda data, level: gzip.compress(data, compresslevel=level),
+                 gzip.decompress, (1, 6, 9)),
+        "bz2": (bz2.compress, bz2.decompress, (1, 6, 9)),
+        "lzma": (lambda data, level: lzma.compress(data, preset=level),
+                 lzma.decompress, (0, 6, 9)),
+    }
+    if zstandard is not None:
+        available["zstd"] = (
+            lambda data, level: zstandard.ZstdCompressor(level=level).compress(data),
+            lambda data: zstandard.ZstdDecompressor().decompress(data),
+            (1, 3, 19),
+        )
+    if lz4 is not None:
+        available["lz4"] = (
+            lambda data, level: lz4.frame.compress(data, compression_level=level),
+            lz4.frame.decompress,
+            (0, 9, 16),
+        )
+    return available
+
+
+def _timed(fn, *args):
+    """Call fn(*args) and return (result, elapsed_ns); runs on pool threads"""
+    start = time.perf_counter_ns()
+    result = fn(*args)
+    return result, time.perf_counter_ns() - start
+
+
+class CompressionBenchmark(BenchmarkCase):
     """Benchmark for data compression operations"""
-    
-    def __init__(self, data_size_mb=10):
+
+    name = "compression"
+
+    def __init__(self, data_size_mb=10, codec_names=None, chunk_size=0, threads=1):
+        available = codecs()
+        codec_names = tuple(available) if codec_names is None else tuple(codec_names)
+        missing = [name for name in codec_names if name not in available]
+        if missing:
+            raise ValueError(f"Codec(s) {missing} not available, expected some of {tuple(available)}")
+        if chunk_size == 0 and threads > 1:
+            raise ValueError("threads > 1 needs a chunk size; one-shot mode has a single chunk")
+        super().__init__()
         self.data_size = data_size_mb * 1024 * 1024
+        self.codecs = {name: available[name] for name in codec_names}
+        self.chunk_size = chunk_size
+        self.threads = threads
         self.text_data = None
         self.binary_data = None
         self.json_data = None
-        
+        self._pool = None
+
     def setup(self):
         """Generate test data"""
-        print(f"Generating {self.data_size // (1024*1024)}MB of test data...")
-        
+        print(f"Generating {self.data_size // (1024*1024)}MB of test data...", file=sys.stderr)
+
         # Text data (highly compressible)
         self.text_data = b"Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * (self.data_size // 100)
         self.text_data = self.text_data[:self.data_size]
-        
+
         # Binary data (less compressible)
         self.binary_data = np.random.randint(0, 256, self.data_size, dtype=np.uint8).tobytes()
-        
+
         # JSON data (structured)
         records = []
         for i in range(self.data_size // 200):
@@ -33,51 +97,83 @@ class CompressionBenchmark:
                 'tags': ['tag1', 'tag2', 'tag3']
             })
         self.json_data = json.dumps(records).encode('utf-8')
-    
+
+        # Every codec here releases the GIL on large buffers, so chunks compress in parallel
+        if self.threads > 1:
+            self._pool = ThreadPoolExecutor(max_workers=self.threads)
+
+    def teardown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
     def run(self):
         """Run compression benchmarks"""
-        # Test 1: Gzip compression of text
-        start = time.time()
-        compressed = gzip.compress(self.text_data, compresslevel=6)
-        elapsed = time.time() - start
-        ratio = len(self.text_data) / len(compressed)
-        throughput = (len(self.text_data) / (1024*1024)) / elapsed
-        self.results['Gzip text (level 6)'] = f"{elapsed:.3f}s, {throughput:.1f} MB/s, ratio: {ratio:.1f}x"
-        
-        # Test 2: Gzip compression of binary
-        start = time.time()
-        compressed = gzip.compress(self.binary_data, compresslevel=6)
-        elapsed = time.time() - start
-        ratio = len(self.binary_data) / len(compressed)
-        throughput = (len(self.binary_data) / (1024*1024)) / elapsed
-        self.results['Gzip binary (level 6)'] = f"{elapsed:.3f}s, {throughput:.1f} MB/s, ratio: {ratio:.1f}x"
-        
-        # Test 3: Fast compression
-        start = time.time()
-        compressed = gzip.compress(self.text_data, compresslevel=1)
-        elapsed = time.time() - start
-        ratio = len(self.text_data) / len(compressed)
-        throughput = (len(self.text_data) / (1024*1024)) / elapsed
-        self.results['Gzip text (level 1, fast)'] = f"{elapsed:.3f}s, {throughput:.1f} MB/s, ratio: {ratio:.1f}x"
-        
-        # Test 4: Max compression
-        start = time.time()
-        compressed = gzip.compress(self.text_data, compresslevel=9)
-        elapsed = time.time() - start
-        ratio = len(self.text_data) / len(compressed)
-        throughput = (len(self.text_data) / (1024*1024)) / elapsed
-        self.results['Gzip text (level 9, max)'] = f"{elapsed:.3f}s, {throughput:.1f} MB/s, ratio: {ratio:.1f}x"
-        
-        # Test 5: Decompression
-        compressed = gzip.compress(self.text_data, compresslevel=6)
-        start = time.time()
-        decompressed = gzip.decompress(compressed)
-        elapsed = time.time() - start
-        throughput = (len(decompressed) / (1024*1024)) / elapsed
-        self.results['Gzip decompression'] = f"{elapsed:.3f}s, {throughput:.1f} MB/s"
+        for codec, (compress, decompress, (fast, default, best)) in self.codecs.items():
+            # Test 1: Compression of text
+            self._compress(f'{codec} text (level {default})', compress, self.text_data, default)
+
+            # Test 2: Compression of binary
+            self._compress(f'{codec} binary (level {default})', compress, self.binary_data, default)
+
+            # Test 3: Compression of JSON
+            self._compress(f'{codec} json (level {default})', compress, self.json_data, default)
+
+            # Test 4: Fast compression
+            self._compress(f'{codec} text (level {fast}, fast)', compress, self.text_data, fast)
+
+            # Test 5: Max compression
+            self._compress(f'{codec} text (level {best}, max)', compress, self.text_data, best)
+
+            # Test 6: Decompression
+            compressed, _ = self._map(compress, self._chunks(self.text_data), default)
+            start = time.perf_counter_ns()
+            decompressed, latencies = self._map(decompress, compressed)
+            elapsed = time.perf_counter_ns() - start
+            size = sum(len(chunk) for chunk in decompressed)
+            self._record(f'{codec} decompression', elapsed, size, latencies)
+
+    def _chunks(self, data):
+        """Split data into zero-copy chunk_size views (a single chunk in one-shot mode)"""
+        view = memoryview(data)
+        if self.chunk_size <= 0:
+            return [view]
+        return [view[i:i + self.chunk_size] for i in range(0, len(view), self.chunk_size)]
+
+    def _map(self, fn, chunks, *args):
+        """Apply fn to every chunk, on the thread pool when there is one"""
+        if self._pool is None:
+            timed = [_timed(fn, chunk, *args) for chunk in chunks]
+        else:
+            timed = list(self._pool.map(lambda chunk: _timed(fn, chunk, *args), chunks))
+        return [out for out, _ in timed], np.array([ns for _, ns in timed], dtype=np.int64)
+
+    def _compress(self, label, compress, data, level):
+        """Compress data chunk by chunk and record throughput, ratio and chunk latencies"""
+        chunks = self._chunks(data)
+        start = time.perf_counter_ns()
+        compressed, latencies = self._map(compress, chunks, level)
+        elapsed = time.perf_counter_ns() - start
+        ratio = len(data) / sum(len(chunk) for chunk in compressed)
+        self._record(label, elapsed, len(data), latencies, ratio=ratio)
+
+    def _record(self, label, elapsed, size, latencies, **metrics):
+        throughput = (size / (1024*1024)) / (elapsed / 1e9)
+        p50, p99 = np.percentile(latencies, [50, 99])
+        self.record(label, elapsed, mb_per_s=throughput, chunks=len(latencies),
+                    threads=self.threads, chunk_p50_ns=float(p50), chunk_p99_ns=float(p99),
+                    chunk_max_ns=int(latencies.max()), **metrics)
 
 if __name__ == '__main__':
-    compression = CompressionBenchmark()
-    compression.setup()
-    compression.run()
-    
\ No newline at end of file
+    parser = BenchmarkCase.argument_parser("Compression benchmark")
+    parser.add_argument("--size-mb", type=int, default=10, help="Size of each test buffer")
+    parser.add_argument("--codecs", nargs="+", default=None, choices=tuple(codecs()),
+                        help="Codecs to benchmark (default: every available one)")
+    parser.add_argument("--chunk-size", type=int, default=0,
+                        help="Compress independent chunks of this many bytes (0 = one shot)")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Threads compressing chunks in parallel")
+    args = parser.parse_args()
+    compression = CompressionBenchmark(data_size_mb=args.size_mb, codec_names=args.codecs,
+                                       chunk_size=args.chunk_size, threads=args.threads)
+    sys.exit(compression.main(args))
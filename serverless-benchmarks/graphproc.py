@@ -1,109 +1,165 @@
-import numpy as np 
+import numpy as np
 import time
-from collections import deque, defaultdict
+import sys
+from benchmark_case import BenchmarkCase
 
-class GraphProcessingBenchmark():
+class GraphProcessingBenchmark(BenchmarkCase):
     """Benchmark for graph algorithms (BFS, PageRank)"""
-    
+
+    name = "graphproc"
+
     def __init__(self, n_nodes=10000, edge_probability=0.001):
+        super().__init__()
         self.n_nodes = n_nodes
         self.edge_probability = edge_probability
-        self.graph = None
-        
+        self.rng = np.random.default_rng()
+        # Undirected graph in CSR form: the neighbours of node v are
+        # indices[indptr[v]:indptr[v + 1]]
+        self.indptr = None
+        self.indices = None
+        self.degree = None
+        self._rows = None
+        self._claim = None
+
     def setup(self):
         """Generate random graph"""
-        print(f"Generating random graph with {self.n_nodes} nodes...")
-        self.graph = defaultdict(list)
-        edge_count = 0
-        
-        # Generate random edges
-        for i in range(self.n_nodes):
-            for j in range(i + 1, self.n_nodes):
-                if np.random.random() < self.edge_probability:
-                    self.graph[i].append(j)
-                    self.graph[j].append(i)
-                    edge_count += 1
-        
-        print(f"Generated {edge_count} edges (avg degree: {2*edge_count/self.n_nodes:.1f})")
-    
+        print(f"Generating random graph with {self.n_nodes} nodes...", file=sys.stderr)
+        n = self.n_nodes
+
+        # G(n, p): draw the edge count, then that many endpoint pairs at once.
+        # Self-loops and repeated pairs are dropped, which is negligible for sparse p.
+        n_pairs = n * (n - 1) // 2
+        n_edges = self.rng.binomial(n_pairs, self.edge_probability) if n_pairs else 0
+        src = self.rng.integers(0, n, n_edges)
+        dst = self.rng.integers(0, n, n_edges)
+        keep = src != dst
+        lo = np.minimum(src[keep], dst[keep]).astype(np.int64)
+        hi = np.maximum(src[keep], dst[keep]).astype(np.int64)
+        keys = np.unique(lo * n + hi)
+        lo, hi = keys // n, keys % n
+        edge_count = len(keys)
+
+        # Store both directions and sort by source to get CSR rows
+        rows = np.concatenate([lo, hi])
+        cols = np.concatenate([hi, lo])
+        order = np.argsort(rows, kind='stable')
+        self._rows = rows[order]
+        self.indices = cols[order]
+        self.degree = np.bincount(rows, minlength=n)
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(self.degree, out=self.indptr[1:])
+        self._claim = np.empty(n, dtype=np.int64)
+
+        print(f"Generated {edge_count} edges (avg degree: {2*edge_count/self.n_nodes:.1f})",
+              file=sys.stderr)
+
+    def _neighbors(self, frontier):
+        """Concatenated neighbour lists of every node in frontier"""
+        lengths = self.degree[frontier]
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=self.indices.dtype)
+        # Position of each gathered entry = its row start + offset within the row
+        starts = self.indptr[frontier] - (np.cumsum(lengths) - lengths)
+        return self.indices[np.repeat(starts, lengths) + np.arange(total)]
+
+    def _bfs_mark(self, start_node, visited):
+        """Level-synchronous BFS from start_node, setting visited in place"""
+        visited[start_node] = True
+        frontier = np.array([start_node])
+        reached = 1
+
+        while frontier.size:
+            neighbors = self._neighbors(frontier)
+            neighbors = neighbors[~visited[neighbors]]
+            # Deduplicate without sorting: the last writer of each node keeps it
+            positions = np.arange(neighbors.size)
+            self._claim[neighbors] = positions
+            neighbors = neighbors[self._claim[neighbors] == positions]
+            visited[neighbors] = True
+            reached += neighbors.size
+            frontier = neighbors
+
+        return reached
+
     def bfs(self, start_node):
         """Breadth-first search"""
-        visited = set()
-        queue = deque([start_node])
-        visited.add(start_node)
-        
-        while queue:
-            node = queue.popleft()
-            for neighbor in self.graph[node]:
-                if neighbor not in visited:
-                    visited.add(neighbor)
-                    queue.append(neighbor)
-        
-        return visited
-    
+        visited = np.zeros(self.n_nodes, dtype=bool)
+        self._bfs_mark(start_node, visited)
+        return np.flatnonzero(visited)
+
     def pagerank(self, iterations=20, damping=0.85):
-        """Simple PageRank implementation"""
+        """PageRank as one sparse mat-vec per iteration over the CSR adjacency"""
         n = self.n_nodes
-        ranks = {i: 1.0 / n for i in range(n)}
-        
+        ranks = np.full(n, 1.0 / n)
+        # Nodes without edges contribute nothing, as in the dense formulation
+        inv_degree = np.zeros(n)
+        np.divide(1.0, self.degree, out=inv_degree, where=self.degree > 0)
+
         for _ in range(iterations):
-            new_ranks = {}
-            for node in range(n):
-                rank_sum = 0.0
-                # Find all nodes that link to this node
-                for source in range(n):
-                    if node in self.graph[source]:
-                        out_degree = len(self.graph[source])
-                        if out_degree > 0:
-                            rank_sum += ranks[source] / out_degree
-                
-                new_ranks[node] = (1 - damping) / n + damping * rank_sum
-            
-            ranks = new_ranks
-        
+            contrib = ranks * inv_degree
+            rank_sum = np.bincount(self._rows, weights=contrib[self.indices], minlength=n)
+            ranks = (1 - damping) / n + damping * rank_sum
+
         return ranks
-    
+
+    def connected_components(self):
+        """Count connected components with one BFS per unvisited node"""
+        visited = np.zeros(self.n_nodes, dtype=bool)
+        components = 0
+        # Isolated nodes are components on their own; no need to BFS them
+        isolated = self.degree == 0
+        visited[isolated] = True
+        components += int(isolated.sum())
+
+        for node in np.flatnonzero(~isolated):
+            if not visited[node]:
+                self._bfs_mark(node, visited)
+                components += 1
+
+        return components
+
     def run(self):
         """Run graph processing benchmarks"""
         # Test 1: BFS from single node
-        start = time.time()
+        start = time.perf_counter_ns()
         visited = self.bfs(0)
-        elapsed = time.time() - start
-        self.results['BFS (single source)'] = f"{elapsed:.3f}s, visited {len(visited)} nodes"
-        
+        elapsed = time.perf_counter_ns() - start
+        self.record('BFS (single source)', elapsed, visited=len(visited))
+
         # Test 2: BFS from multiple nodes
-        start = time.time()
+        start = time.perf_counter_ns()
         for start_node in range(0, min(100, self.n_nodes), 10):
             visited = self.bfs(start_node)
-        elapsed = time.time() - start
-        self.results['BFS (10 sources)'] = f"{elapsed:.3f}s"
-        
+        elapsed = time.perf_counter_ns() - start
+        self.record('BFS (10 sources)', elapsed)
+
         # Test 3: PageRank (10 iterations)
-        start = time.time()
+        start = time.perf_counter_ns()
         ranks = self.pagerank(iterations=10)
-        elapsed = time.time() - start
-        top_nodes = sorted(ranks.items(), key=lambda x: x[1], reverse=True)[:5]
-        self.results['PageRank (10 iter)'] = f"{elapsed:.3f}s, top node: {top_nodes[0][0]} ({top_nodes[0][1]:.6f})"
-        
+        elapsed = time.perf_counter_ns() - start
+        top_node = int(np.argmax(ranks))
+        self.record('PageRank (10 iter)', elapsed, top_node=top_node,
+                    top_rank=float(ranks[top_node]))
+
         # Test 4: PageRank (20 iterations)
-        start = time.time()
+        start = time.perf_counter_ns()
         ranks = self.pagerank(iterations=20)
-        elapsed = time.time() - start
-        self.results['PageRank (20 iter)'] = f"{elapsed:.3f}s"
-        
+        elapsed = time.perf_counter_ns() - start
+        self.record('PageRank (20 iter)', elapsed)
+
         # Test 5: Connected components (using BFS)
-        start = time.time()
-        visited_global = set()
-        components = 0
-        for node in range(self.n_nodes):
-            if node not in visited_global:
-                component = self.bfs(node)
-                visited_global.update(component)
-                components += 1
-        elapsed = time.time() - start
-        self.results['Connected components'] = f"{elapsed:.3f}s, found {components} components"
+        start = time.perf_counter_ns()
+        components = self.connected_components()
+        elapsed = time.perf_counter_ns() - start
+        self.record('Connected components', elapsed, components=components)
 
 if __name__ == '__main__':
-    graphproc = GraphProcessingBenchmark()
-    graphproc.setup()
-    graphproc.run()
\ No newline at end of file
+    parser = BenchmarkCase.argument_parser("Graph processing benchmark")
+    parser.add_argument("--nodes", type=int, default=10000, help="Number of graph nodes")
+    parser.add_argument("--edge-probability", type=float, default=0.001,
+                        help="Probability of an edge between any two nodes")
+    args = parser.parse_args()
+
+    graphproc = GraphProcessingBenchmark(n_nodes=args.nodes, edge_probability=args.edge_probability)
+    sys.exit(graphproc.main(args))
@@ -1,64 +1,161 @@
 import time
+import os
 import numpy as np
 import json
 import hashlib
 from datetime import datetime
 from typing import Dict, Any
+import sys
+from benchmark_case import BenchmarkCase
 
-class LrSrv:
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+BLAS_THREAD_VARS = ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def limit_blas_threads(n_threads: int):
+    """Cap BLAS threads in-process with threadpoolctl
+
+    Returns the limiter (keep it alive), or None when threadpoolctl is not
+    installed; BLAS then only honours BLAS_THREAD_VARS set before it loads.
+    """
+    if threadpool_limits is None:
+        return None
+    return threadpool_limits(limits=n_threads, user_api="blas")
+
+
+def reexec_with_blas_threads(n_threads: int):
+    """Restart the interpreter with BLAS_THREAD_VARS set, unless they already are"""
+    value = str(n_threads)
+    if all(os.environ.get(var) == value for var in BLAS_THREAD_VARS):
+        return
+    os.environ.update({var: value for var in BLAS_THREAD_VARS})
+    os.execv(sys.executable, [sys.executable] + sys.argv)
+
+
+class LrSrv(BenchmarkCase):
     """Simulates logistic regression training and inference"""
 
-    def __init__(self, n_features: int = 100, n_samples: int = 1000):
+    name = "lrserv"
+
+    DTYPES = ("float32", "float64")
+
+    def __init__(self, n_features: int = 100, n_samples: int = 1000, n_models: int = 1,
+                 batch_size: int = 0, dtype: str = "float64", learning_rate: float = 0.01):
+        if dtype not in self.DTYPES:
+            raise ValueError(f"Unknown dtype '{dtype}', expected one of {self.DTYPES}")
+        super().__init__()
         self.n_features = n_features
         self.n_samples = n_samples
-        self.weights = np.random.randn(n_features)
-        self.bias = 0.0
+        self.n_models = n_models
+        # 0 trains on the full batch, as before
+        self.batch_size = batch_size if 0 < batch_size < n_samples else n_samples
+        self.dtype = np.dtype(dtype)
+        self.learning_rate = learning_rate
+        self.rng = np.random.default_rng()
+        # K independent models share one GEMM through a (features, K) weight matrix
+        self.weights = self.rng.standard_normal((n_features, n_models)).astype(self.dtype)
+        self.bias = np.zeros(n_models, dtype=self.dtype)
         self.training_count = 0
+        self.X = None
+        self.Y = None
+
+        # Per-batch work buffers
+        shape = (self.batch_size, n_models)
+        self._logits = np.empty(shape, dtype=self.dtype)
+        self._softplus = np.empty(shape, dtype=self.dtype)
+        self._grad = np.empty(shape, dtype=self.dtype)
+        self._dw = np.empty((n_features, n_models), dtype=self.dtype)
 
-    def sigmoid(self, z: np.ndarray) -> np.ndarray:
-        """Sigmoid activation"""
-        return 1 / (1 + np.exp(-np.clip(z, -500, 500)))
+    def make_dataset(self):
+        """Draw X and one label column per model from K hidden weight vectors"""
+        X = self.rng.standard_normal((self.n_samples, self.n_features))
+        true_weights = self.rng.standard_normal((self.n_features, self.n_models))
+        noise = self.rng.standard_normal((self.n_samples, self.n_models)) * 0.1
+        # Samples are i.i.d., so contiguous mini-batches are already shuffled
+        self.X = X.astype(self.dtype)
+        self.Y = (X @ true_weights + noise > 0).astype(self.dtype)
 
-    def train_epoch(self, X: np.ndarray, y: np.ndarray, learning_rate: float = 0.01):
-        """Train for one epoch"""
-        z = np.dot(X, self.weights) + self.bias
-        predictions = self.sigmoid(z)
+    def setup(self):
+        self.make_dataset()
 
-        dw = (1 / self.n_samples) * np.dot(X.T, (predictions - y))
-        db = (1 / self.n_samples) * np.sum(predictions - y)
+    def train_batch(self, X: np.ndarray, Y: np.ndarray, learning_rate: float) -> np.ndarray:
+        """One SGD step on a mini-batch; returns the summed log-loss per model"""
+        n = len(X)
+        logits, softplus, grad = self._logits[:n], self._softplus[:n], self._grad[:n]
 
-        self.weights -= learning_rate * dw
-        self.bias -= learning_rate * db
+        np.matmul(X, self.weights, out=logits)
+        logits += self.bias
 
-        loss = -(1 / self.n_samples) * np.sum(
-            y * np.log(predictions + 1e-8) + (1 - y) * np.log(1 - predictions + 1e-8)
-        )
+        # Log-loss from logits: softplus(z) - y*z, with softplus = log(1 + e^z)
+        # as a log-sum-exp, and sigmoid(z) = exp(z - softplus(z))
+        np.logaddexp(0, logits, out=softplus)
+        np.subtract(logits, softplus, out=grad)
+        np.exp(grad, out=grad)
+        grad -= Y
+        np.multiply(Y, logits, out=logits)
+        softplus -= logits
+        loss = softplus.sum(axis=0)
+
+        np.matmul(X.T, grad, out=self._dw)
+        self._dw *= learning_rate / n
+        self.weights -= self._dw
+        self.bias -= (learning_rate / n) * grad.sum(axis=0)
         return loss
 
+    def train_epoch(self, X: np.ndarray, Y: np.ndarray, learning_rate: float = 0.01) -> np.ndarray:
+        """Train for one epoch of mini-batches; returns the mean log-loss per model"""
+        loss = np.zeros(self.n_models)
+        for start in range(0, len(X), self.batch_size):
+            stop = start + self.batch_size
+            loss += self.train_batch(X[start:stop], Y[start:stop], learning_rate)
+        return loss / len(X)
+
     def train_model(self, epochs: int = 10) -> Dict[str, Any]:
         """Train logistic regression model"""
         self.training_count += 1
+        if self.X is None:
+            self.make_dataset()
 
-        X = np.random.randn(self.n_samples, self.n_features)
-        true_weights = np.random.randn(self.n_features)
-        y = (np.dot(X, true_weights) + np.random.randn(self.n_samples) * 0.1 > 0).astype(float)
-
-        losses = []
         for epoch in range(epochs):
-            loss = self.train_epoch(X, y)
-            losses.append(loss)
+            losses = self.train_epoch(self.X, self.Y, self.learning_rate)
 
-        predictions = self.sigmoid(np.dot(X, self.weights) + self.bias)
-        accuracy = np.mean((predictions > 0.5) == y)
+        accuracy = np.mean((self.X @ self.weights + self.bias > 0) == self.Y, axis=0)
 
         return {
             "training_id": self.training_count,
             "epochs": epochs,
-            "final_loss": losses[-1],
-            "accuracy": float(accuracy),
-            "weight_norm": float(np.linalg.norm(self.weights)),
+            "models": self.n_models,
+            "batch_size": self.batch_size,
+            "dtype": self.dtype.name,
+            "final_loss": float(losses.mean()),
+            "accuracy": float(accuracy.mean()),
+            "weight_norm": float(np.linalg.norm(self.weights, axis=0).mean()),
         }
-    
+
+    def run(self):
+        """Time one 10-epoch training run"""
+        start = time.perf_counter_ns()
+        result = self.train_model(epochs=10)
+        self.record("train_model", time.perf_counter_ns() - start, **result)
+
 if __name__ == '__main__':
-    lr = LrSrv(n_features=100, n_samples=1000)
-    result = lr.train_model(epochs=10)
\ No newline at end of file
+    parser = BenchmarkCase.argument_parser("Logistic regression benchmark")
+    parser.add_argument("--models", type=int, default=1, help="Independent models trained together")
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="SGD mini-batch size (0 = full batch)")
+    parser.add_argument("--dtype", default="float64", choices=LrSrv.DTYPES)
+    parser.add_argument("--blas-threads", type=int, default=None,
+                        help="Cap BLAS threads (threadpoolctl, else env vars and a re-exec)")
+    args = parser.parse_args()
+
+    if args.blas_threads:
+        limiter = limit_blas_threads(args.blas_threads)
+        if limiter is None:
+            reexec_with_blas_threads(args.blas_threads)
+    lr = LrSrv(n_features=100, n_samples=1000, n_models=args.models,
+               batch_size=args.batch_size, dtype=args.dtype)
+    sys.exit(lr.main(args))
@@ -1,87 +1,247 @@
 import numpy as np
-import time 
+import time
+import sys
+import os
+import mmap
+import shutil
+import tempfile
+from benchmark_case import BenchmarkCase
 
-class MLInferenceBenchmark:
+class MLInferenceBenchmark(BenchmarkCase):
     """Benchmark for ML inference operations"""
-    
-    def __init__(self, batch_size=32, n_batches=100):
+
+    name = "mlinf"
+
+    SOURCES = ("ring", "memmap")
+    IMAGE_SHAPE = (224, 224, 3)
+    N_CLASSES = 1000
+
+    def __init__(self, batch_size=32, n_batches=100, working_set_mb=160, source="ring",
+                 scratch_dir=None):
+        if source not in self.SOURCES:
+            raise ValueError(f"Unknown source '{source}', expected one of {self.SOURCES}")
+        super().__init__()
         self.batch_size = batch_size
         self.n_batches = n_batches
+        self.working_set_mb = working_set_mb
+        self.source = source
+        self.scratch_dir = scratch_dir
+        self.n_features = int(np.prod(self.IMAGE_SHAPE))
+        self.rng = np.random.default_rng()
         self.models = {}
         self.data = None
-        
+        self._tmpdir = None
+        self._maps = {}
+        self._plan_buffers()
+
+    def _plan_buffers(self):
+        """Split the working set between input batches, scratch and weight blocks"""
+        batch_bytes = self.batch_size * self.n_features * 4
+        # One float32 scratch batch shared by every op, plus the dropout mask
+        fixed = batch_bytes + self.batch_size * self.n_features
+        # The weight matrix lives on disk; GEMM pulls it in row blocks
+        remaining = self.working_set_mb * 1024 * 1024 - fixed - batch_bytes
+        if remaining < 0:
+            raise ValueError(
+                f"working set of {self.working_set_mb} MB cannot hold a batch of "
+                f"{self.batch_size} ({batch_bytes / 2**20:.1f} MB each); "
+                f"lower the batch size"
+            )
+        row_bytes = self.N_CLASSES * 4
+        self.weight_block_rows = int(np.clip(remaining // 2 // row_bytes, 1, self.n_features))
+        remaining -= self.weight_block_rows * row_bytes
+        self.ring_slots = int(min(self.n_batches, 1 + remaining // batch_bytes))
+
     def setup(self):
-        """Setup simple ML models and data"""
-        print(f"Setting up ML models and {self.n_batches} batches of size {self.batch_size}...")
-        
-        # Generate synthetic input data (image-like)
-        self.data = [
-            np.random.randn(self.batch_size, 224, 224, 3).astype(np.float32)
-            for _ in range(self.n_batches)
-        ]
-        
-        # Simple linear model (matrix multiplication)
+        """Setup simple ML models, data source and reusable buffers"""
+        print(f"Setting up ML models and {self.n_batches} batches of size {self.batch_size} "
+              f"({self.source} source, {self.working_set_mb} MB working set: "
+              f"{self.ring_slots} resident batches, {self.weight_block_rows} weight rows/block)...",
+              file=sys.stderr)
+        self._tmpdir = tempfile.mkdtemp(prefix="mlinf-", dir=self.scratch_dir)
+        batch_shape = (self.batch_size,) + self.IMAGE_SHAPE
+
+        # Output buffers reused by every op
+        self._scratch = np.empty(batch_shape, dtype=np.float32)
+        self._mask = np.empty(batch_shape, dtype=bool)
+        self._logits = np.empty((self.batch_size, self.N_CLASSES), dtype=np.float32)
+        self._partial = np.empty_like(self._logits)
+        self._row_stat = np.empty((self.batch_size, 1), dtype=np.float32)
+        self._mean = np.empty((1,) + self.IMAGE_SHAPE, dtype=np.float32)
+        self._var = np.empty_like(self._mean)
+
+        # Simple linear model (matrix multiplication); the 600 MB weight matrix
+        # is written to disk one block at a time and memory-mapped back
+        block = np.empty((self.weight_block_rows, self.N_CLASSES), dtype=np.float32)
+        with open(os.path.join(self._tmpdir, "weights.bin"), "wb") as f:
+            for k0 in range(0, self.n_features, self.weight_block_rows):
+                rows = block[:self.n_features - k0]
+                self.rng.standard_normal(out=rows, dtype=np.float32)
+                rows.tofile(f)
+        del block
         self.models['linear'] = {
-            'weights': np.random.randn(224*224*3, 1000).astype(np.float32),
-            'bias': np.random.randn(1000).astype(np.float32)
+            'weights': self._map_file("weights.bin", (self.n_features, self.N_CLASSES)),
+            'bias': self.rng.standard_normal(self.N_CLASSES, dtype=np.float32)
         }
-        
+
         # Simple conv-like operation weights
         self.models['conv'] = {
-            'kernel': np.random.randn(3, 3, 3, 64).astype(np.float32)
+            'kernel': self.rng.standard_normal((3, 3, 3, 64), dtype=np.float32)
         }
-    
+
+        # Synthetic input data (image-like): a ring of resident batches that the
+        # n_batches requests cycle through, or every batch memory-mapped from disk
+        if self.source == "memmap":
+            with open(os.path.join(self._tmpdir, "data.bin"), "wb") as f:
+                for _ in range(self.n_batches):
+                    self.rng.standard_normal(out=self._scratch, dtype=np.float32)
+                    self._scratch.tofile(f)
+            self.data = self._map_file("data.bin", (self.n_batches,) + batch_shape)
+        else:
+            self.data = np.empty((self.ring_slots,) + batch_shape, dtype=np.float32)
+            for batch in self.data:
+                self.rng.standard_normal(out=batch, dtype=np.float32)
+
+    def _map_file(self, filename, shape):
+        """Map a raw float32 file read-only as an array of the given shape"""
+        with open(os.path.join(self._tmpdir, filename), "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        array = np.frombuffer(mm, dtype=np.float32).reshape(shape)
+        self._maps[id(array)] = (array, mm)
+        return array
+
+    def _release(self, root, view):
+        """Unmap the pages behind a contiguous view of a file-backed array
+
+        The page cache keeps the data, so this only drops it from our RSS;
+        reading the view again faults it back in.
+        """
+        entry = self._maps.get(id(root))
+        if entry is None or not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        start = view.ctypes.data - root.ctypes.data
+        aligned = start - start % mmap.PAGESIZE
+        entry[1].madvise(mmap.MADV_DONTNEED, aligned, start + view.nbytes - aligned)
+
+    def teardown(self):
+        """Drop the memory maps and their backing files"""
+        self.models = {}
+        self.data = None
+        self._maps = {}
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+    def batches(self, n=None):
+        """Yield n input batches from the data source"""
+        n = self.n_batches if n is None else min(n, self.n_batches)
+        for i in range(n):
+            batch = self.data[i % len(self.data)]
+            yield batch
+            self._release(self.data, batch)
+
+    def linear(self, batch):
+        """Dense layer as a GEMM accumulated over blocks of weight rows"""
+        weights = self.models['linear']['weights']
+        flat = batch.reshape(self.batch_size, -1)
+        step = self.weight_block_rows
+        for k0 in range(0, self.n_features, step):
+            block = weights[k0:k0 + step]
+            out = self._logits if k0 == 0 else self._partial
+            np.matmul(flat[:, k0:k0 + step], block, out=out)
+            if k0:
+                self._logits += self._partial
+            self._release(weights, block)
+        self._logits += self.models['linear']['bias']
+        return self._logits
+
+    def relu(self, batch):
+        return np.maximum(batch, 0, out=self._scratch)
+
+    def softmax(self, batch):
+        """Row-wise softmax over the flattened batch"""
+        flat = batch.reshape(self.batch_size, -1)
+        out = self._scratch.reshape(self.batch_size, -1)
+        np.max(flat, axis=1, keepdims=True, out=self._row_stat)
+        np.subtract(flat, self._row_stat, out=out)
+        np.exp(out, out=out)
+        np.sum(out, axis=1, keepdims=True, out=self._row_stat)
+        return np.divide(out, self._row_stat, out=out)
+
+    def batch_norm(self, batch, eps=1e-5):
+        """Normalize over the batch axis without batch-sized temporaries"""
+        out = self._scratch
+        np.mean(batch, axis=0, keepdims=True, out=self._mean)
+        np.subtract(batch, self._mean, out=out)
+        centered = out.reshape(self.batch_size, -1)
+        np.einsum('ij,ij->j', centered, centered, out=self._var.reshape(-1))
+        self._var /= self.batch_size
+        self._var += eps
+        np.sqrt(self._var, out=self._var)
+        return np.divide(out, self._var, out=out)
+
+    def dropout(self, batch, keep=0.8):
+        self.rng.random(out=self._scratch, dtype=np.float32)
+        np.less(self._scratch, keep, out=self._mask)
+        return np.multiply(batch, self._mask, out=self._scratch)
+
     def run(self):
         """Run ML inference benchmarks"""
         # Test 1: Linear layer inference
-        start = time.time()
-        for batch in self.data:
-            flat = batch.reshape(self.batch_size, -1)
-            output = np.dot(flat, self.models['linear']['weights']) + self.models['linear']['bias']
-        elapsed = time.time() - start
-        throughput = (self.n_batches * self.batch_size) / elapsed
-        self.results['Linear layer'] = f"{elapsed:.3f}s ({throughput:.1f} samples/sec)"
-        
+        start = time.perf_counter_ns()
+        for batch in self.batches():
+            output = self.linear(batch)
+        elapsed = time.perf_counter_ns() - start
+        self.record('Linear layer', elapsed,
+                    samples_per_s=(self.n_batches * self.batch_size) / (elapsed / 1e9))
+
         # Test 2: ReLU activation
-        start = time.time()
-        for batch in self.data:
-            output = np.maximum(0, batch)
-        elapsed = time.time() - start
-        throughput = (self.n_batches * self.batch_size) / elapsed
-        self.results['ReLU activation'] = f"{elapsed:.3f}s ({throughput:.1f} samples/sec)"
-        
+        start = time.perf_counter_ns()
+        for batch in self.batches():
+            output = self.relu(batch)
+        elapsed = time.perf_counter_ns() - start
+        self.record('ReLU activation', elapsed,
+                    samples_per_s=(self.n_batches * self.batch_size) / (elapsed / 1e9))
+
         # Test 3: Softmax
-        start = time.time()
-        for batch in self.data[:20]:  # Subset for expensive operation
-            flat = batch.reshape(self.batch_size, -1)
-            exp_x = np.exp(flat - np.max(flat, axis=1, keepdims=True))
-            output = exp_x / np.sum(exp_x, axis=1, keepdims=True)
-        elapsed = time.time() - start
-        throughput = (20 * self.batch_size) / elapsed
-        self.results['Softmax (sample)'] = f"{elapsed:.3f}s ({throughput:.1f} samples/sec)"
-        
+        n_sample = min(20, self.n_batches)  # Subset for expensive operation
+        start = time.perf_counter_ns()
+        for batch in self.batches(n_sample):
+            output = self.softmax(batch)
+        elapsed = time.perf_counter_ns() - start
+        self.record('Softmax (sample)', elapsed,
+                    samples_per_s=(n_sample * self.batch_size) / (elapsed / 1e9))
+
         # Test 4: Batch normalization
-        start = time.time()
-        for batch in self.data:
-            mean = np.mean(batch, axis=0, keepdims=True)
-            var = np.var(batch, axis=0, keepdims=True)
-            output = (batch - mean) / np.sqrt(var + 1e-5)
-        elapsed = time.time() - start
-        throughput = (self.n_batches * self.batch_size) / elapsed
-        self.results['Batch normalization'] = f"{elapsed:.3f}s ({throughput:.1f} samples/sec)"
-        
+        start = time.perf_counter_ns()
+        for batch in self.batches():
+            output = self.batch_norm(batch)
+        elapsed = time.perf_counter_ns() - start
+        self.record('Batch normalization', elapsed,
+                    samples_per_s=(self.n_batches * self.batch_size) / (elapsed / 1e9))
+
         # Test 5: Dropout (inference mode - just pass through with mask)
-        start = time.time()
-        for batch in self.data:
-            mask = np.random.binomial(1, 0.8, batch.shape)
-            output = batch * mask
-        elapsed = time.time() - start
-        throughput = (self.n_batches * self.batch_size) / elapsed
-        self.results['Dropout application'] = f"{elapsed:.3f}s ({throughput:.1f} samples/sec)"
+        start = time.perf_counter_ns()
+        for batch in self.batches():
+            output = self.dropout(batch)
+        elapsed = time.perf_counter_ns() - start
+        self.record('Dropout application', elapsed,
+                    samples_per_s=(self.n_batches * self.batch_size) / (elapsed / 1e9))
 
 
 if __name__ == '__main__':
-    mlinf = MLInferenceBenchmark()
-    mlinf.setup()
-    mlinf.run()
-    
\ No newline at end of file
+    parser = BenchmarkCase.argument_parser("ML inference benchmark")
+    parser.add_argument("--batch-size", type=int, default=32, help="Samples per batch")
+    parser.add_argument("--batches", type=int, default=100, help="Number of input batches")
+    parser.add_argument("--working-set-mb", type=int, default=160,
+                        help="Budget for resident batches, scratch buffers and weight blocks")
+    parser.add_argument("--source", default="ring", choices=MLInferenceBenchmark.SOURCES,
+                        help="'ring' cycles resident batches, 'memmap' maps every batch from disk")
+    parser.add_argument("--scratch-dir", default=None,
+                        help="Directory for the memory-mapped weights and data")
+    args = parser.parse_args()
+
+    mlinf = MLInferenceBenchmark(batch_size=args.batch_size, n_batches=args.batches,
+                                 working_set_mb=args.working_set_mb, source=args.source,
+                                 scratch_dir=args.scratch_dir)
+    sys.exit(mlinf.main(args))
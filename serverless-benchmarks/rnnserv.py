@@ -4,13 +4,19 @@ import json
 import hashlib
 from datetime import datetime
 from typing import Dict, Any
+import sys
+from benchmark_case import BenchmarkCase
 
-class RnnSrv:
+class RnnSrv(BenchmarkCase):
     """Simulates RNN inference with sequential matrix operations"""
     
-    def __init__(self, seq_length: int = 100, hidden_size: int = 128):
+    name = "rnnserv"
+    
+    def __init__(self, seq_length: int = 100, hidden_size: int = 128, batch_size: int = 1):
+        super().__init__()
         self.seq_length = seq_length
         self.hidden_size = hidden_size
+        self.batch_size = batch_size
         self.vocab_size = 1000
         self.inference_count = 0
         
@@ -18,38 +24,67 @@ class RnnSrv:
         self.Whh = np.random.randn(hidden_size, hidden_size) * 0.01
         self.Why = np.random.randn(self.vocab_size, hidden_size) * 0.01
     
-    def forward_pass(self, inputs: np.ndarray) -> np.ndarray:
-        """Simulate RNN forward pass"""
-        h = np.zeros((self.hidden_size, 1))
-        outputs = []
+    def forward_pass(self, token_ids: np.ndarray) -> np.ndarray:
+        """Simulate RNN forward pass over a (seq_length, batch) array of token ids
+        
+        Returns logits of shape (seq_length, vocab_size, batch).
+        """
+        seq_length, batch = token_ids.shape
+        
+        # Hidden states laid out (hidden, seq, batch) so the output projection
+        # below is a single contiguous GEMM
+        states = np.empty((self.hidden_size, seq_length, batch))
+        embedded = np.empty((self.hidden_size, batch))
+        h = np.zeros((self.hidden_size, batch))
         
-        for x in inputs:
-            h = np.tanh(np.dot(self.Wxh, x) + np.dot(self.Whh, h))
-            y = np.dot(self.Why, h)
-            outputs.append(y)
+        for t in range(seq_length):
+            # Wxh @ one_hot(x) is just column x of Wxh
+            np.take(self.Wxh, token_ids[t], axis=1, out=embedded)
+            embedded += np.dot(self.Whh, h)
+            h = np.tanh(embedded, out=states[:, t, :])
         
-        return np.array(outputs)
+        outputs = np.dot(self.Why, states.reshape(self.hidden_size, -1))
+        return outputs.reshape(self.vocab_size, seq_length, batch).transpose(1, 0, 2)
     
-    def inference(self) -> Dict[str, Any]:
-        """Run RNN inference"""
+    def inference(self, token_ids: np.ndarray = None) -> Dict[str, Any]:
+        """Run RNN inference on a batch of sequences"""
         self.inference_count += 1
         
-        inputs = []
-        for _ in range(self.seq_length):
-            x = np.zeros((self.vocab_size, 1))
-            x[np.random.randint(0, self.vocab_size)] = 1
-            inputs.append(x)
+        if token_ids is None:
+            token_ids = np.random.randint(0, self.vocab_size,
+                                          (self.seq_length, self.batch_size))
+        elif token_ids.ndim == 1:
+            token_ids = token_ids.reshape(-1, 1)
+        batch = token_ids.shape[1]
         
-        outputs = self.forward_pass(inputs)
+        start = time.perf_counter()
+        outputs = self.forward_pass(token_ids)
+        latency = time.perf_counter() - start
         predictions = np.argmax(outputs, axis=1)
         
         return {
             "inference_id": self.inference_count,
-            "sequence_length": self.seq_length,
+            "sequence_length": token_ids.shape[0],
+            "batch_size": batch,
             "output_shape": outputs.shape,
-            "sample_predictions": predictions[:5].tolist()
+            "sample_predictions": predictions[:5, 0].tolist(),
+            # Every request in the batch completes when the batch does
+            "request_latency": latency,
+            # None (JSON null) rather than inf, which json writes as invalid Infinity
+            "throughput": batch / latency if latency > 0 else None
         }
 
+    def run(self):
+        """Time one batched inference"""
+        start = time.perf_counter_ns()
+        result = self.inference()
+        self.record("inference", time.perf_counter_ns() - start, **result)
+
 if __name__ == '__main__':
-    rnn = RnnSrv(seq_length=200, hidden_size=128)
-    result = rnn.inference()
\ No newline at end of file
+    parser = BenchmarkCase.argument_parser("RNN inference benchmark")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Sequences processed per forward pass")
+    args = parser.parse_args()
+    
+    rnn = RnnSrv(seq_length=200, hidden_size=128, batch_size=args.batch_size)
+    sys.exit(rnn.main(args))
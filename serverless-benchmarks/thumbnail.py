@@ -1,71 +1,177 @@
-import time 
+import time
 from PIL import Image
-import numpy as np 
+import numpy as np
 import io
+import os
+import sys
+import shutil
+import tempfile
+import multiprocessing
+from functools import partial
+from benchmark_case import BenchmarkCase, read_peak_rss_mb, reset_peak_rss
 
-class ThumbnailBenchmark():
+
+# Pipeline stages run at module level so pool workers (forked after setup)
+# share the corpus and only receive image indices
+_CORPUS = None
+_CONFIG = None
+
+
+def _init_worker(corpus, config):
+    global _CORPUS, _CONFIG
+    _CORPUS = corpus
+    _CONFIG = config
+
+
+def _open(index):
+    """Lazily open one encoded image; pixels are decoded on first access"""
+    item = _CORPUS[index]
+    return Image.open(item if isinstance(item, str) else io.BytesIO(item))
+
+
+def _thumbnail(img):
+    thumb_size, reducing_gap = _CONFIG["thumb_size"], _CONFIG["reducing_gap"]
+    # With a reducing_gap, thumbnail() asks the JPEG decoder for a DCT-scaled
+    # draft and reduce()s by an integer factor before the LANCZOS pass
+    img.thumbnail(thumb_size, Image.LANCZOS, reducing_gap=reducing_gap)
+    return img
+
+
+def thumbnail_task(stage, index) -> float:
+    """Run one pipeline stage on one corpus image; returns this process's peak RSS"""
+    reset_peak_rss()
+    thumb_size, reducing_gap = _CONFIG["thumb_size"], _CONFIG["reducing_gap"]
+    img = _open(index)
+
+    if stage == "resize":
+        # Full decode, then a single LANCZOS pass
+        img.resize(thumb_size, Image.LANCZOS)
+    elif stage == "thumbnail":
+        _thumbnail(img)
+    elif stage == "enhance":
+        _thumbnail(img).point(_CONFIG["brighten_lut"])
+    elif stage == "encode":
+        _thumbnail(img).save(io.BytesIO(), format='JPEG', quality=85)
+    elif stage == "crop":
+        # Center crop to square; the draft only has to keep the crop above
+        # reducing_gap times the thumbnail size
+        width, height = img.size
+        min_dim = min(width, height)
+        if reducing_gap is not None:
+            needed = max(thumb_size) * reducing_gap
+            img.draft('RGB', (int(width * needed / min_dim), int(height * needed / min_dim)))
+            width, height = img.size
+            min_dim = min(width, height)
+        left = (width - min_dim) // 2
+        top = (height - min_dim) // 2
+        img.resize(thumb_size, Image.LANCZOS, box=(left, top, left + min_dim, top + min_dim),
+                   reducing_gap=reducing_gap)
+    else:
+        raise ValueError(f"Unknown stage '{stage}'")
+
+    img.close()
+    return read_peak_rss_mb()
+
+
+class ThumbnailBenchmark(BenchmarkCase):
     """Benchmark for image thumbnail generation"""
-    
-    def __init__(self, n_images=100, size=(1920, 1080), thumb_size=(200, 150)):
+
+    name = "thumbnail"
+
+    CORPORA = ("memory", "disk")
+    STAGES = (
+        ("Basic resize", "resize"),
+        ("Thumbnail (draft + reduce)", "thumbnail"),
+        ("Resize + enhancement", "enhance"),
+        ("Resize + JPEG encode", "encode"),
+        ("Crop + resize", "crop"),
+    )
+
+    def __init__(self, n_images=100, size=(1920, 1080), thumb_size=(200, 150),
+                 corpus="memory", reducing_gap=2.0, workers=1, scratch_dir=None):
+        if corpus not in self.CORPORA:
+            raise ValueError(f"Unknown corpus '{corpus}', expected one of {self.CORPORA}")
+        super().__init__()
         self.n_images = n_images
         self.size = size
         self.thumb_size = thumb_size
+        self.corpus = corpus
+        self.reducing_gap = reducing_gap
+        self.workers = workers
+        self.scratch_dir = scratch_dir
         self.images = []
-        self.results = {}
-        
+        self._tmpdir = None
+        self._pool = None
+
     def setup(self):
-        """Generate synthetic test images"""
-        print(f"Generating {self.n_images} test images ({self.size[0]}x{self.size[1]})...")
+        """Generate a corpus of encoded synthetic test images"""
+        print(f"Generating {self.n_images} test images ({self.size[0]}x{self.size[1]}, "
+              f"{self.corpus} corpus)...", file=sys.stderr)
+        rng = np.random.default_rng()
+        if self.corpus == "disk":
+            self._tmpdir = tempfile.mkdtemp(prefix="thumbnail-", dir=self.scratch_dir)
+
         for i in range(self.n_images):
-            arr = np.random.randint(0, 255, (self.size[1], self.size[0], 3), dtype=np.uint8)
-            self.images.append(Image.fromarray(arr))
-    
+            # Upscaled noise gives photo-like JPEG sizes; only the encoded bytes are kept
+            small = rng.integers(0, 255, (self.size[1] // 16, self.size[0] // 16, 3), dtype=np.uint8)
+            img = Image.fromarray(small).resize(self.size, Image.BICUBIC)
+            if self.corpus == "disk":
+                path = os.path.join(self._tmpdir, f"{i:05d}.jpg")
+                img.save(path, format='JPEG', quality=90)
+                self.images.append(path)
+            else:
+                buffer = io.BytesIO()
+                img.save(buffer, format='JPEG', quality=90)
+                self.images.append(buffer.getvalue())
+
+        config = {
+            "thumb_size": self.thumb_size,
+            "reducing_gap": self.reducing_gap,
+            # Same truncating 1.2x brightness as the old float round-trip, as a LUT per band
+            "brighten_lut": [min(255, int(v * 1.2)) for v in range(256)] * 3,
+        }
+        _init_worker(self.images, config)
+        if self.workers > 1:
+            self._pool = multiprocessing.Pool(self.workers, initializer=_init_worker,
+                                              initargs=(self.images, config))
+
+    def teardown(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
     def run(self):
         """Run thumbnail generation benchmarks"""
-        # Test 1: Basic resize
-        start = time.time()
-        thumbnails = []
-        for img in self.images:
-            thumb = img.resize(self.thumb_size, Image.LANCZOS)
-            thumbnails.append(thumb)
-        elapsed = time.time() - start
-        self.results['Basic resize'] = f"{elapsed:.3f}s ({self.n_images/elapsed:.1f} imgs/sec)"
-        
-        # Test 2: Resize + enhancement
-        start = time.time()
-        for img in self.images:
-            thumb = img.resize(self.thumb_size, Image.LANCZOS)
-            thumb = thumb.convert('RGB')
-            enhancer = np.array(thumb)
-            enhancer = np.clip(enhancer * 1.2, 0, 255).astype(np.uint8)
-            thumb = Image.fromarray(enhancer)
-        elapsed = time.time() - start
-        self.results['Resize + enhancement'] = f"{elapsed:.3f}s ({self.n_images/elapsed:.1f} imgs/sec)"
-        
-        # Test 3: Resize + save to buffer
-        start = time.time()
-        for img in self.images:
-            thumb = img.resize(self.thumb_size, Image.LANCZOS)
-            buffer = io.BytesIO()
-            thumb.save(buffer, format='JPEG', quality=85)
-        elapsed = time.time() - start
-        self.results['Resize + JPEG encode'] = f"{elapsed:.3f}s ({self.n_images/elapsed:.1f} imgs/sec)"
-        
-        # Test 4: Batch processing with cropping
-        start = time.time()
-        for img in self.images:
-            # Center crop to square
-            width, height = img.size
-            min_dim = min(width, height)
-            left = (width - min_dim) // 2
-            top = (height - min_dim) // 2
-            img_cropped = img.crop((left, top, left + min_dim, top + min_dim))
-            thumb = img_cropped.resize(self.thumb_size, Image.LANCZOS)
-        elapsed = time.time() - start
-        self.results['Crop + resize'] = f"{elapsed:.3f}s ({self.n_images/elapsed:.1f} imgs/sec)"
+        for label, stage in self.STAGES:
+            task = partial(thumbnail_task, stage)
+            indices = range(self.n_images)
+            start = time.perf_counter_ns()
+            if self._pool is None:
+                peaks = [task(i) for i in indices]
+            else:
+                peaks = self._pool.map(task, indices)
+            elapsed = time.perf_counter_ns() - start
+            self.record(label, elapsed, imgs_per_s=self.n_images / (elapsed / 1e9),
+                        peak_rss_mb=max(peaks), workers=self.workers)
 
 
 if __name__ == '__main__':
-    t = ThumbnailBenchmark()
-    t.setup()
-    t.run()
+    parser = BenchmarkCase.argument_parser("Thumbnail generation benchmark")
+    parser.add_argument("--images", type=int, default=100, help="Number of source images")
+    parser.add_argument("--corpus", default="memory", choices=ThumbnailBenchmark.CORPORA,
+                        help="Keep encoded JPEGs in memory or as files on disk")
+    parser.add_argument("--reducing-gap", type=float, default=2.0,
+                        help="Pillow reducing_gap; 0 disables draft decode and reduce()")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes in the thumbnail pool (1 = in-process)")
+    parser.add_argument("--scratch-dir", default=None, help="Directory for the disk corpus")
+    args = parser.parse_args()
+
+    t = ThumbnailBenchmark(n_images=args.images, corpus=args.corpus,
+                           reducing_gap=args.reducing_gap or None, workers=args.workers,
+                           scratch_dir=args.scratch_dir)
+    sys.exit(t.main(args))
@@ -4,30 +4,97 @@ import json
 import hashlib
 from datetime import datetime
 from typing import Dict, Any
+import sys
+from benchmark_case import BenchmarkCase
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def json_backends() -> Dict[str, tuple]:
+    """(dumps -> str, loads) pairs for every importable JSON library"""
+    encoder = json.JSONEncoder()
+    decoder = json.JSONDecoder()
+    backends = {"stdlib": (encoder.encode, decoder.decode)}
+    if orjson is not None:
+        backends["orjson"] = (lambda obj: orjson.dumps(obj).decode(), orjson.loads)
+    if ujson is not None:
+        backends["ujson"] = (ujson.dumps, ujson.loads)
+    return backends
 
 
 # ============================================================================
 # 1. WebSrv - Web Service (JSON Processing + String Operations)
 # ============================================================================
-class WebSrv:
+class WebSrv(BenchmarkCase):
     """Simulates web request processing with JSON parsing and response generation"""
     
-    def __init__(self):
+    name = "webserv"
+    
+    # Placeholders spliced out of the pre-encoded request template; neither an
+    # md5 hexdigest nor an ISO timestamp needs JSON escaping
+    _USER_ID_SLOT = "\x00user_id\x00"
+    _TIMESTAMP_SLOT = "\x00timestamp\x00"
+    
+    def __init__(self, json_backend: str = "stdlib", use_templates: bool = True,
+                 batch_size: int = 1):
+        backends = json_backends()
+        if json_backend not in backends:
+            raise ValueError(f"JSON backend '{json_backend}' is not available, "
+                             f"expected one of {tuple(backends)}")
+        super().__init__()
+        self.batch_size = batch_size
+        self.json_backend = json_backend
+        self.use_templates = use_templates
+        self._dumps, self._loads = backends[json_backend]
+        self._headers = {f"header_{i}": f"value_{i}" for i in range(20)}
+        self._templates = {}
         self.request_count = 0
     
+    def _template(self, payload_size: int) -> tuple:
+        """Request JSON for payload_size, pre-encoded around the per-request fields"""
+        template = self._templates.get(payload_size)
+        if template is None:
+            encoded = self._dumps({
+                "user_id": self._USER_ID_SLOT,
+                "timestamp": self._TIMESTAMP_SLOT,
+                "payload": "x" * payload_size,
+                "headers": self._headers
+            })
+            slot = self._dumps(self._USER_ID_SLOT)[1:-1]
+            head, rest = encoded.split(slot)
+            slot = self._dumps(self._TIMESTAMP_SLOT)[1:-1]
+            middle, tail = rest.split(slot)
+            template = (head, middle, tail)
+            self._templates[payload_size] = template
+        return template
+    
     def process_request(self, payload_size: int = 1000) -> Dict[str, Any]:
         """Process a simulated HTTP request"""
         self.request_count += 1
+        user_id = hashlib.md5(str(self.request_count).encode()).hexdigest()
+        timestamp = datetime.now().isoformat()
         
-        request_data = {
-            "user_id": hashlib.md5(str(self.request_count).encode()).hexdigest(),
-            "timestamp": datetime.now().isoformat(),
-            "payload": "x" * payload_size,
-            "headers": {f"header_{i}": f"value_{i}" for i in range(20)}
-        }
+        if self.use_templates:
+            head, middle, tail = self._template(payload_size)
+            json_str = f"{head}{user_id}{middle}{timestamp}{tail}"
+        else:
+            request_data = {
+                "user_id": user_id,
+                "timestamp": timestamp,
+                "payload": "x" * payload_size,
+                "headers": {f"header_{i}": f"value_{i}" for i in range(20)}
+            }
+            json_str = self._dumps(request_data)
+        parsed = self._loads(json_str)
         
-        json_str = json.dumps(request_data)
-        parsed = json.loads(json_str)
         processed = parsed["payload"].upper()[:100]
         hash_val = hashlib.sha256(processed.encode()).hexdigest()
         
@@ -37,7 +104,38 @@ class WebSrv:
             "hash": hash_val,
             "processed_length": len(processed)
         }
+    
+    def process_batch(self, batch_size: int, payload_size: int = 1000) -> tuple:
+        """Process batch_size requests, returning (responses, per-request latencies in ns)"""
+        responses = []
+        latencies = np.empty(batch_size, dtype=np.int64)
+        for i in range(batch_size):
+            start = time.perf_counter_ns()
+            responses.append(self.process_request(payload_size))
+            latencies[i] = time.perf_counter_ns() - start
+        return responses, latencies
+
+    def run(self):
+        """Time one batch and record in-process req/s and latency percentiles"""
+        start = time.perf_counter_ns()
+        responses, latencies = self.process_batch(self.batch_size, payload_size=1000)
+        elapsed = time.perf_counter_ns() - start
+        p50, p99 = np.percentile(latencies, [50, 99])
+        self.record("process_batch", elapsed,
+                    requests=len(responses),
+                    req_per_s=len(responses) / (latencies.sum() / 1e9),
+                    p50_ns=float(p50), p99_ns=float(p99))
 
 if __name__ == '__main__':
-    web = WebSrv()
-    result = web.process_request(payload_size=1000)
\ No newline at end of file
+    parser = BenchmarkCase.argument_parser("Web request benchmark")
+    parser.add_argument("--json-backend", default="stdlib", choices=tuple(json_backends()),
+                        help="JSON library used for encoding and parsing")
+    parser.add_argument("--no-templates", action="store_true",
+                        help="Rebuild and encode the full request dict on every call")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Requests processed per repetition")
+    args = parser.parse_args()
+    
+    web = WebSrv(json_backend=args.json_backend, use_templates=not args.no_templates,
+                 batch_size=args.batch_size)
+    sys.exit(web.main(args))
@@ -3,48 +3,177 @@ import numpy as np
 import json
 import hashlib
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Iterator
+import sys
+import multiprocessing
+from collections import Counter
+from functools import partial
+from benchmark_case import BenchmarkCase
 
-class WordCnt:
+WORDS = ["the", "be", "to", "of", "and", "a", "in", "that", "have", "I",
+         "it", "for", "not", "on", "with", "he", "as", "you", "do", "at"]
+
+
+# Map-phase functions live at module level so a multiprocessing pool can pickle them
+def count_words_dict(document: str) -> Dict[str, int]:
+    """Count words in a str document one word at a time"""
+    words = document.lower().split()
+    word_freq = {}
+    for word in words:
+        word_freq[word] = word_freq.get(word, 0) + 1
+    return word_freq
+
+
+# Byte lookup tables: bytes.split() separators (space, \t, \n, \v, \f, \r)
+# and bytes.lower()
+IS_SPACE = np.zeros(256, dtype=bool)
+IS_SPACE[[32, 9, 10, 11, 12, 13]] = True
+TO_LOWER = np.arange(256, dtype=np.uint8)
+TO_LOWER[65:91] += 32
+
+
+def count_words_bytes(document: bytes) -> Dict[str, int]:
+    """Count words in a bytes document with a single sort over a uint8 view"""
+    text = TO_LOWER[np.frombuffer(document, dtype=np.uint8)]
+
+    # Token boundaries are the edges of the runs of non-whitespace bytes
+    edges = np.diff(np.concatenate(([False], ~IS_SPACE[text], [False])).astype(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    lengths = np.flatnonzero(edges == -1) - starts
+    if starts.size == 0:
+        return {}
+
+    # One zero-padded key per token, filled a byte column at a time and read
+    # as 8-byte words so tokens sort as integers
+    width = int(lengths.max())
+    keys = np.zeros((starts.size, -(-width // 8) * 8), dtype=np.uint8)
+    last = len(text) - 1
+    for j in range(width):
+        keys[:, j] = np.where(lengths > j, text[np.minimum(starts + j, last)], 0)
+    words = keys.view(np.uint64)
+
+    if words.shape[1] == 1:
+        unique, counts = np.unique(words.ravel(), return_counts=True)
+    else:
+        # Longer words: group equal rows after a lexicographic sort
+        words = words[np.lexsort(words.T[::-1])]
+        heads = np.flatnonzero(np.concatenate(([True], (words[1:] != words[:-1]).any(axis=1))))
+        counts = np.diff(np.append(heads, len(words)))
+        unique = words[heads]
+    unique = unique.reshape(len(counts), -1).view(np.uint8)
+    return {bytes(row).rstrip(b"\0").decode(): int(count) for row, count in zip(unique, counts)}
+
+
+def count_token_ids(token_ids: np.ndarray, vocabulary: tuple) -> Dict[str, int]:
+    """Count a document of vocabulary indices with np.bincount"""
+    counts = np.bincount(token_ids, minlength=len(vocabulary))
+    return {vocabulary[i]: int(counts[i]) for i in np.flatnonzero(counts)}
+
+
+class WordCnt(BenchmarkCase):
     """Simulates distributed word count processing"""
 
-    def __init__(self):
+    name = "wordcnt"
+    ENGINES = ("dict", "bytes", "ids")
+
+    def __init__(self, engine: str = "bytes", workers: int = 1, stream_words: int = 0):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {self.ENGINES}")
+        super().__init__()
+        self.stream_words = stream_words
+        self.engine = engine
+        self.workers = workers
         self.total_words = 0
         self.total_docs = 0
+        self.rng = np.random.default_rng()
+        self._pool = None
+
+        # Vocabulary index: id -> lowercased word, plus a space-terminated,
+        # zero-padded byte table so documents can be rendered without a join
+        self.vocabulary = tuple(word.lower() for word in WORDS)
+        encoded = [word.encode() + b" " for word in self.vocabulary]
+        width = max(len(word) for word in encoded)
+        self._word_table = np.zeros((len(encoded), width), dtype=np.uint8)
+        for i, word in enumerate(encoded):
+            self._word_table[i, :len(word)] = np.frombuffer(word, dtype=np.uint8)
+        self._word_lengths = np.array([len(word) for word in encoded])
 
     def generate_document(self, num_words: int = 1000) -> str:
         """Generate synthetic document"""
-        words = ["the", "be", "to", "of", "and", "a", "in", "that", "have", "I",
-                 "it", "for", "not", "on", "with", "he", "as", "you", "do", "at"]
-        return " ".join(np.random.choice(words, num_words))
+        return " ".join(np.random.choice(WORDS, num_words))
+
+    def generate_token_ids(self, num_words: int = 1000) -> np.ndarray:
+        """Generate a synthetic document as vocabulary indices"""
+        return self.rng.integers(0, len(self.vocabulary), num_words, dtype=np.intp)
+
+    def generate_document_bytes(self, num_words: int = 1000) -> bytes:
+        """Generate a synthetic space-separated document directly as bytes"""
+        token_ids = self.generate_token_ids(num_words)
+        rows = self._word_table[token_ids]
+        mask = np.arange(rows.shape[1]) < self._word_lengths[token_ids][:, None]
+        return rows[mask].tobytes()
+
+    def stream_document(self, num_words: int, chunk_words: int = 65536) -> Iterator[bytes]:
+        """Yield a document of num_words as bytes chunks of whole words"""
+        remaining = num_words
+        while remaining > 0:
+            n = min(chunk_words, remaining)
+            yield self.generate_document_bytes(n)
+            remaining -= n
 
     def word_count(self, document: str) -> Dict[str, int]:
         """Count words in document"""
-        words = document.lower().split()
-        word_freq = {}
-        for word in words:
-            word_freq[word] = word_freq.get(word, 0) + 1
-        return word_freq
+        return count_words_dict(document)
+
+    def word_count_stream(self, chunks: Iterable[bytes]) -> Counter:
+        """Count words over an iterable of bytes chunks in bounded memory"""
+        counts = Counter()
+        for chunk in chunks:
+            counts.update(count_words_bytes(chunk))
+        return counts
+
+    def _make_document(self, num_words: int):
+        if self.engine == "ids":
+            return self.generate_token_ids(num_words)
+        if self.engine == "bytes":
+            return self.generate_document_bytes(num_words)
+        return self.generate_document(num_words)
+
+    def _map_function(self):
+        if self.engine == "ids":
+            return partial(count_token_ids, vocabulary=self.vocabulary)
+        if self.engine == "bytes":
+            return count_words_bytes
+        return count_words_dict
+
+    def _map(self, documents: list) -> list:
+        """Map phase, fanned out to the worker pool from setup() when workers > 1"""
+        fn = self._map_function()
+        if self.workers <= 1:
+            return [fn(doc) for doc in documents]
+        return self._pool.map(fn, documents)
+
+    def close(self):
+        """Shut down the map-phase worker pool, if any"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
 
     def process(self) -> Dict[str, Any]:
         """Process a batch of documents"""
         self.total_docs += 1
-        
-        documents = [self.generate_document(1000) for _ in range(10)]
-        
-        all_counts = []
-        for doc in documents:
-            counts = self.word_count(doc)
-            all_counts.append(counts)
-        
-        total_counts = {}
+
+        documents = [self._make_document(1000) for _ in range(10)]
+        all_counts = self._map(documents)
+
+        total_counts = Counter()
         for counts in all_counts:
-            for word, count in counts.items():
-                total_counts[word] = total_counts.get(word, 0) + count
-        
-        sorted_words = sorted(total_counts.items(), key=lambda x: x[1], reverse=True)
+            total_counts.update(counts)
+
+        sorted_words = total_counts.most_common()
         self.total_words += sum(total_counts.values())
-        
+
         return {
             "batch_id": self.total_docs,
             "total_words": sum(total_counts.values()),
@@ -52,6 +181,47 @@ class WordCnt:
             "top_5_words": sorted_words[:5],
         }
 
+    def process_stream(self, num_words: int, chunk_words: int = 65536) -> Dict[str, Any]:
+        """Count one large document generated and consumed chunk by chunk"""
+        self.total_docs += 1
+
+        total_counts = self.word_count_stream(self.stream_document(num_words, chunk_words))
+        self.total_words += sum(total_counts.values())
+
+        return {
+            "batch_id": self.total_docs,
+            "total_words": sum(total_counts.values()),
+            "unique_words": len(total_counts),
+            "top_5_words": total_counts.most_common(5),
+        }
+
+    def setup(self):
+        """Start the map-phase worker pool, so its processes aren't timed"""
+        if self.workers > 1:
+            self._pool = multiprocessing.Pool(self.workers)
+
+    def run(self):
+        """Time one batch, or one streamed document when stream_words is set"""
+        start = time.perf_counter_ns()
+        if self.stream_words > 0:
+            result = self.process_stream(self.stream_words)
+        else:
+            result = self.process()
+        self.record("process", time.perf_counter_ns() - start, **result)
+
+    def teardown(self):
+        """Shut down the worker pool started in setup()"""
+        self.close()
+
 if __name__ == '__main__':
-    wc = WordCnt()
-    result = wc.process()
\ No newline at end of file
+    parser = BenchmarkCase.argument_parser("Word count benchmark")
+    parser.add_argument("--engine", default="bytes", choices=WordCnt.ENGINES,
+                        help="Document representation and counting strategy")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes in the map phase (1 = in-process)")
+    parser.add_argument("--stream-words", type=int, default=0,
+                        help="Count one streamed document of this many words instead")
+    args = parser.parse_args()
+
+    wc = WordCnt(engine=args.engine, workers=args.workers, stream_words=args.stream_words)
+    sys.exit(wc.main(args))
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from online_stats import QuantileSketch, mann_whitney  # noqa: E402
+
+
+def sketch(values, k, seed):
+    s = QuantileSketch(k, seed=seed)
+    s.extend(values.tolist())
+    return s
+
+
+def test_exact_sketches_match_scipy():
+    scipy_stats = pytest.importorskip("scipy.stats")
+    rng = np.random.default_rng(0)
+    a, b = rng.lognormal(0, 0.3, 150), rng.lognormal(0.05, 0.3, 180)
+    u, p, _, u_error = mann_whitney(sketch(a, None, 0), sketch(b, None, 1))
+    expected = scipy_stats.mannwhitneyu(a, b, alternative="two-sided", method="asymptotic")
+    assert u == expected.statistic
+    assert p == pytest.approx(expected.pvalue)
+    assert u_error == 0
+
+
+def test_false_positive_rate_after_compaction():
+    # Small sketches over many samples: every comparison is heavily compacted
+    rng = np.random.default_rng(1)
+    trials, alpha = 100, 0.05
+    false_positives = 0
+    for trial in range(trials):
+        a = sketch(rng.lognormal(0, 0.3, 20000), 64, 2 * trial)
+        b = sketch(rng.lognormal(0, 0.3, 20000), 64, 2 * trial + 1)
+        assert not a.exact and not b.exact
+        false_positives += mann_whitney(a, b)[1] < alpha
+    assert false_positives / trials <= 2 * alpha
+
+
+def test_compacted_sketches_detect_a_real_shift():
+    rng = np.random.default_rng(2)
+    a = sketch(rng.lognormal(0, 0.3, 200000), 1024, 0)
+    b = sketch(rng.lognormal(0.05, 0.3, 150000), 1024, 1)
+    _, p, superiority, _ = mann_whitney(a, b)
+    assert p < 1e-6
+    assert superiority < 0.5